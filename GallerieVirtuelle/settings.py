@@ -24,6 +24,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "galerie.middleware.ServerTimingMiddleware",
+    "galerie.middleware.MetriquesMiddleware",
+    "galerie.middleware.SQLStatsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -31,13 +34,15 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "galerie.middleware.ProfilageMiddleware",
+    "galerie.middleware.ServerTimingVueMiddleware",
 ]
 
 ROOT_URLCONF = "GallerieVirtuelle.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        "BACKEND": "galerie.chronometrage.TemplatesChronometres",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -68,6 +73,16 @@ STATIC_ROOT = BASE_DIR / "staticfiles"
 MEDIA_URL = "/media/"
 MEDIA_ROOT = BASE_DIR / "media"
 
+# Médias nommés par empreinte SHA-256 : un même fichier n'est stocké qu'une fois
+STORAGES = {
+    "default": {
+        "BACKEND": "galerie.storage.ContentAddressedStorage",
+    },
+    "staticfiles": {
+        "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage",
+    },
+}
+
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "UTC"
 USE_I18N = True
@@ -79,6 +94,56 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 STRIPE_PUBLIC_KEY = "pk_test_51QxU3IB9WXO5yyKDUZ5lQX9zQNqK1ZqQ0YzFxmXxLqXxLqXxLqXxLqXx"
 STRIPE_SECRET_KEY = "sk_test_51QxU3IB9WXO5yyKDUZ5lQX9zQNqK1ZqQ0YzFxmXxLqXxLqXxLqXxLqXx"
 
+# ===== PROFILAGE DES REQUÊTES (galerie.middleware.ProfilageMiddleware) =====
+PROFILAGE_TAUX = 0.0  # fraction des requêtes profilées (0 : uniquement sur en-tête)
+PROFILAGE_ENTETE = "X-Profile"  # profile la requête d'un compte staff qui envoie cet en-tête
+PROFILAGE_DOSSIER = BASE_DIR / "profils"
+PROFILAGE_MAX = 200  # profils conservés sur disque (tampon circulaire)
+
+# ===== STATISTIQUES SQL (galerie.middleware.SQLStatsMiddleware) =====
+SQL_STATS_ACTIF = True
+SQL_STATS_DOSSIER = BASE_DIR / "sql_stats"  # un fichier par processus, fusionnés à la lecture
+SQL_STATS_INTERVALLE = 10  # secondes entre deux écritures d'un processus
+
+# manage.py test : profils, statistiques SQL et métriques dans un dossier temporaire
+TEST_RUNNER = "galerie.test_runner.GalerieTestRunner"
+
+# ===== EN-TÊTE SERVER-TIMING (galerie.middleware.ServerTimingMiddleware) =====
+SERVER_TIMING_ACTIF = True
+SERVER_TIMING_STAFF = True  # False : en-tête pour tous, expose les temps internes (debug seulement)
+
+# ===== MÉTRIQUES PROMETHEUS (/metrics) =====
+METRIQUES_DOSSIER = BASE_DIR / "metriques"  # un fichier par worker, fusionnés par /metrics
+METRIQUES_INTERVALLE = 5  # secondes entre deux publications d'un worker
+# Clients autorisés sans jeton : vide par défaut, derrière un proxy inverse sur
+# la même machine toutes les requêtes publiques viennent de 127.0.0.1
+METRIQUES_IPS = []
+METRIQUES_JETON = os.environ.get("METRIQUES_JETON", "")  # en-tête "Authorization: Bearer <jeton>"
+
+# ===== CACHE APPLICATIF (galerie.cache.memoiser) =====
+# Versions des espaces de cache (galerie.cache) : partagées par tous les workers.
+# CACHE_VERSIONS_URL=redis://... (paquet redis) ; à défaut, une table en base
+# créée par la migration galerie 0020 (ou "python manage.py createcachetable")
+CACHE_VERSIONS_URL = os.environ.get("CACHE_VERSIONS_URL", "")
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",  # un cache par worker
+        "LOCATION": "galerie",
+    },
+    "versions": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": CACHE_VERSIONS_URL,
+    } if CACHE_VERSIONS_URL else {
+        "BACKEND": "django.core.cache.backends.db.DatabaseCache",
+        "LOCATION": "galerie_cache_versions",
+        "OPTIONS": {"MAX_ENTRIES": 100000},  # une version par exposition : pas d'éviction à 300
+    },
+}
+# Clés versionnées par les signaux (galerie.cache.cle_versionnee) : le TTL n'est
+# qu'un filet de sécurité (agrégats journaliers, écritures en masse sans signaux)
+DASHBOARD_CACHE_TTL = 300  # secondes : statistiques du tableau de bord admin
+EXPOSITION_CACHE_TTL = 600  # secondes : page exposition des visiteurs anonymes
+
 # ===== SECURITY SETTINGS =====
 SECURE_SSL_REDIRECT = False
 SESSION_COOKIE_SECURE = False
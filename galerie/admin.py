@@ -1,17 +1,63 @@
-from django.contrib import admin
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Count, DecimalField, F, Sum
+from django.db.models.functions import Coalesce
+from django.utils.functional import cached_property
+
+from . import moderation
 from .models import (
     Utilisateur, Artiste, Categorie, Oeuvre, 
     Lieu, Exposition, Commande, LigneCommande, Paiement,
-    Panier, PanierItem, Notification
+    Panier, PanierItem, Notification, FichierMedia
 )
 
+# ============================================
+# 0. CHANGELISTS : COMPTAGE ET PAGINATION
+# ============================================
+
+SEUIL_ESTIMATION = 100_000  # en dessous, le COUNT(*) exact reste bon marché
+
+
+class PaginateurEstime(Paginator):
+    """
+    Sur PostgreSQL, le COUNT(*) d'une table entière (changelist sans filtre
+    ni recherche) est remplacé par l'estimation du planificateur
+    (pg_class.reltuples) dès qu'elle dépasse SEUIL_ESTIMATION lignes.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        connexion = connections[getattr(queryset, "db", "default")]
+        if connexion.vendor == "postgresql" and hasattr(queryset, "query") and not queryset.query.where:
+            with connexion.cursor() as curseur:
+                curseur.execute(
+                    "SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass",
+                    [queryset.model._meta.db_table],
+                )
+                ligne = curseur.fetchone()
+            if ligne and ligne[0] >= SEUIL_ESTIMATION:
+                return ligne[0]
+        return super().count
+
+
+class ChangelistRapide(admin.ModelAdmin):
+    """Nombre de requêtes fixe par page, quelle que soit la taille de la table"""
+
+    paginator = PaginateurEstime
+    show_full_result_count = False  # évite un second COUNT(*) sans filtre
+    list_per_page = 50
+    list_max_show_all = 500
+
+
 # ============================================
 # 1. ADMIN UTILISATEUR
 # ============================================
 
 @admin.register(Utilisateur)
-class UtilisateurAdmin(UserAdmin):
+class UtilisateurAdmin(ChangelistRapide, UserAdmin):
     list_display = ['username', 'email', 'role', 'first_name', 'last_name', 'is_active']
     list_filter = ['role', 'is_active', 'date_inscription']
     search_fields = ['username', 'email', 'first_name', 'last_name']
@@ -28,14 +74,13 @@ class UtilisateurAdmin(UserAdmin):
 # ============================================
 
 @admin.register(Artiste)
-class ArtisteAdmin(admin.ModelAdmin):
-    list_display = ['user', 'nationalite', 'get_nombre_oeuvres']
-    search_fields = ['utilisateur__username', 'utilisateur__first_name', 'utilisateur__last_name']
+class ArtisteAdmin(ChangelistRapide):
+    # Compteurs dénormalisés : triables sans recompter les œuvres à chaque ligne
+    list_display = ['user', 'nationalite', 'nb_oeuvres', 'nb_oeuvres_validees', 'unites_vendues', 'chiffre_affaires']
+    search_fields = ['nom', 'user__username', 'user__first_name', 'user__last_name']
     list_filter = ["nationalite",]
-    
-    def get_nombre_oeuvres(self, obj):
-        return obj.oeuvres.count()
-    get_nombre_oeuvres.short_description = 'Nombre d\'œuvres'
+    list_select_related = ['user']
+    autocomplete_fields = ['user']
 
 
     
@@ -48,13 +93,9 @@ class ArtisteAdmin(admin.ModelAdmin):
 # ============================================
 
 @admin.register(Categorie)
-class CategorieAdmin(admin.ModelAdmin):
-    list_display = ['nom_categorie', 'get_nombre_oeuvres']
+class CategorieAdmin(ChangelistRapide):
+    list_display = ['nom_categorie', 'nb_oeuvres', 'nb_oeuvres_validees', 'unites_vendues', 'chiffre_affaires']
     search_fields = ['nom_categorie']
-    
-    def get_nombre_oeuvres(self, obj):
-        return obj.oeuvres.count()
-    get_nombre_oeuvres.short_description = 'Nombre d\'œuvres'
 
 
 # ============================================
@@ -62,11 +103,33 @@ class CategorieAdmin(admin.ModelAdmin):
 # ============================================
 
 @admin.register(Oeuvre)
-class OeuvreAdmin(admin.ModelAdmin):
+class OeuvreAdmin(ChangelistRapide):
     list_display = ['titre', 'artiste', 'categorie', 'prix', 'statut', 'stock', 'date_soumission']
     list_filter = ['statut', 'categorie', 'date_soumission']
-    search_fields = ['titre', 'artiste__utilisateur__username']
+    search_fields = ['titre', 'artiste__nom', 'artiste__user__username']
     list_editable = ['statut', 'prix', 'stock']
+    list_select_related = ['artiste', 'categorie']
+    autocomplete_fields = ['artiste', 'categorie']
+    actions = ['valider_selection', 'refuser_selection']
+
+    def _moderer(self, request, queryset, decision):
+        ids = list(queryset.filter(statut=Oeuvre.Statut.EN_ATTENTE).values_list('pk', flat=True))
+        moderees = 0
+        for depart in range(0, len(ids), moderation.MAX_LOT):
+            moderees += len(moderation.moderer(ids[depart:depart + moderation.MAX_LOT], decision))
+        ignorees = queryset.count() - moderees
+        message = f"{moderees} œuvre(s) {'validée(s)' if decision == 'valider' else 'refusée(s)'}"
+        if ignorees:
+            message += f", {ignorees} ignorée(s) (pas en attente)"
+        self.message_user(request, message, messages.SUCCESS if moderees else messages.WARNING)
+
+    @admin.action(description="Valider les œuvres sélectionnées (en attente)")
+    def valider_selection(self, request, queryset):
+        self._moderer(request, queryset, "valider")
+
+    @admin.action(description="Refuser les œuvres sélectionnées (en attente)")
+    def refuser_selection(self, request, queryset):
+        self._moderer(request, queryset, "refuser")
     
     fieldsets = (
         ('Informations principales', {
@@ -88,11 +151,13 @@ class OeuvreAdmin(admin.ModelAdmin):
 # ============================================
 
 @admin.register(Exposition)
-class ExpositionAdmin(admin.ModelAdmin):
+class ExpositionAdmin(ChangelistRapide):
     list_display = ['nom_exposition', 'lieu', 'date_debut', 'date_fin', 'est_en_cours']
     list_filter = ['date_debut', 'lieu']
     search_fields = ['nom_exposition']
-    filter_horizontal = ['oeuvres']
+    list_select_related = ['lieu']
+    # Autocomplétion : filter_horizontal chargeait toutes les œuvres dans le formulaire
+    autocomplete_fields = ['lieu', 'oeuvres']
 
 
 # ============================================
@@ -103,13 +168,16 @@ class LigneCommandeInline(admin.TabularInline):
     model = LigneCommande
     extra = 1
     readonly_fields = ['sous_total']
+    autocomplete_fields = ['oeuvre']
 
 @admin.register(Commande)
-class CommandeAdmin(admin.ModelAdmin):
+class CommandeAdmin(ChangelistRapide):
     list_display = ['id', 'utilisateur', 'date_commande', 'montant_total', 'statut']
     list_filter = ['statut', 'date_commande']
     search_fields = ['utilisateur__username', 'id']
     inlines = [LigneCommandeInline]
+    list_select_related = ['utilisateur']
+    autocomplete_fields = ['utilisateur', 'geree_par']
 
 
 # ============================================
@@ -117,11 +185,13 @@ class CommandeAdmin(admin.ModelAdmin):
 # ============================================
 
 @admin.register(Paiement)
-class PaiementAdmin(admin.ModelAdmin):
+class PaiementAdmin(ChangelistRapide):
     list_display = ['commande', 'methode', 'statut', 'montant', 'date_paiement']
     list_filter = ['methode', 'statut', 'date_paiement']
     search_fields = ['commande__id', 'reference']
     readonly_fields = ['date_paiement']
+    list_select_related = ['commande__utilisateur']
+    autocomplete_fields = ['commande']
 
 
 # ============================================
@@ -129,8 +199,8 @@ class PaiementAdmin(admin.ModelAdmin):
 # ============================================
 
 @admin.register(Lieu)
-class LieuAdmin(admin.ModelAdmin):
-    list_display = ['nom_lieu', 'ville', 'pays']
+class LieuAdmin(ChangelistRapide):
+    list_display = ['nom_lieu', 'ville', 'pays', 'latitude', 'longitude']
     search_fields = ['nom_lieu', 'ville', 'pays']
 
 # ============================================
@@ -140,30 +210,48 @@ class LieuAdmin(admin.ModelAdmin):
 class PanierItemInline(admin.TabularInline):
     model = PanierItem
     extra = 1
+    autocomplete_fields = ['oeuvre']
 
 
 @admin.register(Panier)
-class PanierAdmin(admin.ModelAdmin):
+class PanierAdmin(ChangelistRapide):
     list_display = ['id', 'client', 'updated_at', 'nombre_articles', 'total_panier']
     list_filter = ['updated_at']
     search_fields = ['client__username']
     inlines = [PanierItemInline]
     readonly_fields = ['updated_at']
-    
+    list_select_related = ['client']
+    autocomplete_fields = ['client']
+
+    def get_queryset(self, request):
+        # Nombre d'articles et total calculés par la requête de la page, pas ligne par ligne
+        return super().get_queryset(request).annotate(
+            nb_articles=Count("items"),
+            total_items=Coalesce(
+                Sum(F("items__quantite") * F("items__oeuvre__prix"), output_field=DecimalField(max_digits=12, decimal_places=2)),
+                0,
+                output_field=DecimalField(max_digits=12, decimal_places=2),
+            ),
+        )
+
     def nombre_articles(self, obj):
-        return obj.items.count()
+        return obj.nb_articles
     nombre_articles.short_description = 'Nombre d\'articles'
-    
+    nombre_articles.admin_order_field = 'nb_articles'
+
     def total_panier(self, obj):
-        return f"{obj.total():.2f}€"
+        return f"{obj.total_items:.2f}€"
     total_panier.short_description = 'Total'
+    total_panier.admin_order_field = 'total_items'
 
 
 @admin.register(PanierItem)
-class PanierItemAdmin(admin.ModelAdmin):
+class PanierItemAdmin(ChangelistRapide):
     list_display = ['id', 'panier', 'oeuvre', 'quantite', 'get_sous_total']
-    list_filter = ['panier']
+    # Pas de list_filter sur panier : il listerait tous les paniers ; rechercher par client
     search_fields = ['oeuvre__titre', 'panier__client__username']
+    list_select_related = ['panier__client', 'oeuvre__artiste']
+    autocomplete_fields = ['panier', 'oeuvre']
     
     def get_sous_total(self, obj):
         return f"{obj.sous_total:.2f}€"
@@ -175,11 +263,13 @@ class PanierItemAdmin(admin.ModelAdmin):
 # ============================================
 
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(ChangelistRapide):
     list_display = ['titre', 'utilisateur', 'type_notif', 'get_statut_badge', 'date_creation']
     list_filter = ['statut', 'type_notif', 'date_creation']
     search_fields = ['titre', 'utilisateur__username', 'message']
     readonly_fields = ['date_creation', 'date_lecture']
+    list_select_related = ['utilisateur']
+    autocomplete_fields = ['utilisateur', 'exposition']
     
     fieldsets = (
         ('Informations', {
@@ -202,4 +292,15 @@ class NotificationAdmin(admin.ModelAdmin):
         color = colors.get(obj.statut, 'gray')
         return f'<span style="background-color: {color}; color: white; padding: 3px 8px; border-radius: 3px; font-weight: bold;">{obj.get_statut_display()}</span>'
     get_statut_badge.short_description = 'Statut'
-    get_statut_badge.allow_tags = True
\ No newline at end of file
+    get_statut_badge.allow_tags = True
+
+
+# ============================================
+# 11. ADMIN FICHIERS MÉDIAS
+# ============================================
+
+@admin.register(FichierMedia)
+class FichierMediaAdmin(ChangelistRapide):
+    list_display = ['chemin', 'taille', 'references', 'date_creation']
+    search_fields = ['chemin', 'empreinte']
+    readonly_fields = ['chemin', 'empreinte', 'taille', 'references', 'date_creation']
@@ -0,0 +1,154 @@
+"""
+Cache applicatif à TTL court, protégé contre les ruées (cache stampede).
+
+memoiser(cle, ttl, calcul) :
+- valeur fraîche en cache : retournée telle quelle ;
+- valeur périmée (dans le délai de grâce) : un seul appelant recalcule, les
+  autres reçoivent l'ancienne valeur sans attendre ;
+- pas de valeur : un seul appelant calcule, les autres l'attendent puis
+  relisent le cache.
+
+Le "seul appelant" est garanti par un verrou par clé dans le processus et,
+entre processus, par cache.add() sur une clé de verrou (atomique sur
+Memcached/Redis ; avec LocMemCache chaque worker a de toute façon son cache).
+
+cle_versionnee(nom, espaces) : clé qui embarque la version d'espaces de cache
+(ESPACES_CACHE des modèles), changée par signals.py à chaque écriture. Les
+versions vivent dans le cache "versions", partagé par tous les workers.
+"""
+import threading
+import time
+
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils.connection import ConnectionProxy
+
+from .metriques import compter_cache
+
+
+VERROU_TTL = 30  # secondes : au-delà, un calcul planté ne bloque plus les autres
+ATTENTE_MAX = 10  # secondes d'attente d'un calcul fait par un autre processus
+
+_verrous = {}
+_verrous_lock = threading.Lock()
+
+
+def _verrou(cle):
+    with _verrous_lock:
+        return _verrous.setdefault(cle, threading.Lock())
+
+
+def _calculer(cle, ttl, grace, calcul):
+    valeur = calcul()
+    cache.set(cle, (valeur, time.time() + ttl), ttl + grace)
+    return valeur
+
+
+def memoiser(cle, ttl, calcul, grace=None, nom="defaut"):
+    """Retourne calcul() mis en cache ttl secondes (+ grace secondes de valeur périmée servie)"""
+    grace = ttl if grace is None else grace
+    entree = cache.get(cle)
+    if entree is not None and entree[1] > time.time():
+        compter_cache(nom, True)
+        return entree[0]
+
+    verrou_local = _verrou(cle)
+    cle_verrou = f"{cle}:verrou"
+
+    if entree is not None:
+        # Périmée : un seul recalcul, les autres servent l'ancienne valeur
+        if verrou_local.acquire(blocking=False):
+            try:
+                if cache.add(cle_verrou, 1, VERROU_TTL):
+                    try:
+                        compter_cache(nom, False)
+                        return _calculer(cle, ttl, grace, calcul)
+                    finally:
+                        cache.delete(cle_verrou)
+            finally:
+                verrou_local.release()
+        compter_cache(nom, True)
+        return entree[0]
+
+    with verrou_local:
+        entree = cache.get(cle)
+        if entree is not None:
+            compter_cache(nom, True)
+            return entree[0]
+        possede = cache.add(cle_verrou, 1, VERROU_TTL)
+        if not possede:
+            # Un autre processus calcule : on l'attend un peu, puis on calcule nous-mêmes
+            limite = time.monotonic() + ATTENTE_MAX
+            while time.monotonic() < limite:
+                time.sleep(0.05)
+                entree = cache.get(cle)
+                if entree is not None:
+                    compter_cache(nom, True)
+                    return entree[0]
+        try:
+            compter_cache(nom, False)
+            return _calculer(cle, ttl, grace, calcul)
+        finally:
+            if possede:
+                cache.delete(cle_verrou)
+
+
+# ======================
+# Espaces de cache versionnés
+# ======================
+# Chaque modèle déclare dans ESPACES_CACHE les espaces que ses écritures
+# touchent ; signals.py change leur version après chaque écriture validée
+# (pour une sauvegarde partielle, seulement si elle touche ses CHAMPS_CACHE).
+# Une clé qui embarque ces versions n'est donc plus jamais relue après une
+# écriture : pas de suppression à faire, les anciennes entrées expirent.
+# Les versions sont dans le cache "versions" (settings.CACHES), commun à tous
+# les workers : dans le cache local de chacun, un changement ne serait vu que
+# par le worker qui écrit. Les valeurs mises en cache, elles, peuvent rester
+# locales : une clé périmée n'est simplement plus relue.
+stock_versions = ConnectionProxy(caches, "versions")
+
+
+def _cle_version(espace):
+    return f"galerie:version:{espace}"
+
+
+def versions(espaces):
+    """{espace: version} ; une version absente (jamais lue ou évincée) est créée"""
+    cles = {_cle_version(espace): espace for espace in espaces}
+    trouvees = stock_versions.get_many(cles)
+    manquantes = cles.keys() - trouvees.keys()
+    if manquantes:
+        # Horodatage en ns : une version évincée puis recréée repart au-delà
+        # de toutes les valeurs déjà utilisées. add() ne fait rien si un
+        # autre appelant l'a créée entre-temps : on relit la version retenue.
+        for cle in manquantes:
+            stock_versions.add(cle, time.time_ns(), None)
+        trouvees.update(stock_versions.get_many(manquantes))
+    return {espace: trouvees[cle] for cle, espace in cles.items()}
+
+
+def cle_versionnee(nom, espaces, *parties):
+    """'galerie:<nom>:<parties>:<espace>@<version>...' : change dès qu'un des espaces est invalidé"""
+    courantes = versions(espaces)
+    return ":".join(["galerie", nom, *map(str, parties), *(f"{espace}@{courantes[espace]}" for espace in espaces)])
+
+
+def espaces_de(instance):
+    """ESPACES_CACHE du modèle, {pk} et {champ} remplacés par les valeurs de l'instance"""
+    return [
+        espace.format(pk=instance.pk, **instance.__dict__)
+        for espace in getattr(type(instance), "ESPACES_CACHE", ())
+    ]
+
+
+def _renouveler(espaces):
+    # Nouvel horodatage plutôt que incr() : DatabaseCache.incr() n'est pas
+    # atomique, deux écritures concurrentes pourraient donner la même version
+    stock_versions.set_many({_cle_version(espace): time.time_ns() for espace in espaces}, None)
+
+
+def invalider(espaces):
+    """Change la version des espaces une fois la transaction validée"""
+    espaces = set(espaces)
+    if espaces:
+        transaction.on_commit(lambda: _renouveler(espaces))
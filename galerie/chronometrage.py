@@ -0,0 +1,116 @@
+"""
+Décomposition du temps d'une requête pour l'en-tête Server-Timing.
+
+Le chronomètre de la requête courante (ServerTimingMiddleware) est une pile :
+entrer dans une catégorie met en pause la catégorie parente, chaque durée
+est donc exclusive (le SQL exécuté pendant le rendu d'un template compte en
+"db", pas en "tpl"). Les points de mesure :
+- db  : le collecteur SQL de la requête (instrumentation.collecte_sql) ;
+- tpl : rendu des templates (backend TemplatesChronometres) ;
+- ctx : context processors ;
+- vue : code de la vue (ServerTimingVueMiddleware, dernier middleware) ;
+- mw  : le reste (middlewares, résolution d'URL...).
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.template import TemplateDoesNotExist
+from django.template.backends.django import DjangoTemplates, Template, reraise
+
+
+CATEGORIES = {
+    "db": "SQL",
+    "tpl": "Templates",
+    "ctx": "Context processors",
+    "vue": "Vue",
+    "mw": "Middlewares",
+}
+
+chronometre_courant = ContextVar("chronometre_courant", default=None)
+
+# Clé de session : compte staff au moment de la connexion (signals.memoriser_staff).
+# ServerTimingMiddleware la lit sans recharger l'utilisateur
+SESSION_STAFF = "galerie_staff"
+
+
+class Chronometre:
+    def __init__(self):
+        self.debut = self.depuis = time.perf_counter()
+        self.pile = ["mw"]
+        self.durees = dict.fromkeys(CATEGORIES, 0.0)
+
+    def entrer(self, categorie):
+        maintenant = time.perf_counter()
+        self.durees[self.pile[-1]] += maintenant - self.depuis
+        self.pile.append(categorie)
+        self.depuis = maintenant
+
+    def sortir(self, categorie):
+        if len(self.pile) < 2 or self.pile[-1] != categorie:
+            return
+        maintenant = time.perf_counter()
+        self.durees[self.pile.pop()] += maintenant - self.depuis
+        self.depuis = maintenant
+
+    def entete(self, nb_sql):
+        maintenant = time.perf_counter()
+        durees = dict(self.durees)
+        durees[self.pile[-1]] += maintenant - self.depuis
+        parties = []
+        for categorie, libelle in CATEGORIES.items():
+            if categorie == "db":
+                libelle = f"{libelle} ({nb_sql})"
+            parties.append(f'{categorie};dur={durees[categorie] * 1000:.1f};desc="{libelle}"')
+        parties.append(f'total;dur={(maintenant - self.debut) * 1000:.1f};desc="Total"')
+        return ", ".join(parties)
+
+
+@contextmanager
+def mesurer(categorie):
+    chronometre = chronometre_courant.get()
+    if chronometre is None:
+        yield
+        return
+    chronometre.entrer(categorie)
+    try:
+        yield
+    finally:
+        chronometre.sortir(categorie)
+
+
+def chronometrer(categorie, fonction):
+    @wraps(fonction)
+    def enveloppe(*args, **kwargs):
+        with mesurer(categorie):
+            return fonction(*args, **kwargs)
+    return enveloppe
+
+
+# ======================
+# Backend de templates instrumenté
+# ======================
+class TemplateChronometre(Template):
+    def render(self, context=None, request=None):
+        with mesurer("tpl"):
+            return super().render(context, request)
+
+
+class TemplatesChronometres(DjangoTemplates):
+    """DjangoTemplates dont les rendus et les context processors sont chronométrés"""
+
+    def __init__(self, params):
+        super().__init__(params)
+        self.engine.template_context_processors = tuple(
+            chronometrer("ctx", processeur) for processeur in self.engine.template_context_processors
+        )
+
+    def from_string(self, template_code):
+        return TemplateChronometre(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return TemplateChronometre(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
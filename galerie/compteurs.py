@@ -0,0 +1,175 @@
+"""
+Compteurs dénormalisés d'Artiste et de Categorie (galerie.models.CompteursOeuvres).
+
+Les changements sont appliqués par UPDATE ... SET champ = champ + delta, dans
+la transaction de l'opération qui les provoque (récepteurs de galerie.signals) :
+création, validation, refus, changement d'artiste ou de catégorie et
+suppression d'une œuvre ; passage d'une commande à payée/validée ou retour
+en arrière. Les deltas d'une même opération sont regroupés : un seul UPDATE
+par modèle touché (CASE sur la clé primaire quand plusieurs lignes diffèrent). La modération par lots, qui passe par
+QuerySet.update(), appelle statuts_modifies() directement.
+
+Ce qui échappe aux signaux (bulk_create, QuerySet.update(), lignes de
+commande modifiées dans l'admin...) est rattrapé par reconcilier(), qui
+recalcule tout depuis les tables sources par lots (commande
+reconcilier_compteurs).
+"""
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+
+from .models import Artiste, Categorie, Commande, LigneCommande, Oeuvre
+
+
+CHAMPS_STATUT = {
+    Oeuvre.Statut.EN_ATTENTE: "nb_oeuvres_en_attente",
+    Oeuvre.Statut.VALIDE: "nb_oeuvres_validees",
+    Oeuvre.Statut.REFUSE: "nb_oeuvres_refusees",
+}
+CHAMPS = ("nb_oeuvres", *CHAMPS_STATUT.values(), "unites_vendues", "chiffre_affaires")
+MONTANT = models.DecimalField(max_digits=12, decimal_places=2)
+
+
+def _ajouter(cumul, modele, pk, deltas):
+    if pk is None:
+        return
+    cible = cumul.setdefault((modele, pk), {})
+    for champ, valeur in deltas.items():
+        cible[champ] = cible.get(champ, 0) + valeur
+
+
+def _delta(modele, champ, par_pk, pks):
+    if len(pks) == 1:
+        return par_pk[next(iter(pks))]
+    sortie = modele._meta.get_field(champ)
+    return Case(
+        *(When(pk=pk, then=Value(valeur, output_field=sortie)) for pk, valeur in par_pk.items()),
+        default=Value(0, output_field=sortie),
+    )
+
+
+def _appliquer(cumul):
+    """Un UPDATE par modèle : champ = champ + CASE pk WHEN ... THEN delta ... ELSE 0 END"""
+    par_modele = {}  # modèle -> champ -> {pk: delta}
+    for (modele, pk), deltas in cumul.items():
+        for champ, valeur in deltas.items():
+            if valeur:
+                par_modele.setdefault(modele, {}).setdefault(champ, {})[pk] = valeur
+    for modele, champs in par_modele.items():
+        pks = {pk for par_pk in champs.values() for pk in par_pk}
+        modele.objects.filter(pk__in=pks).update(
+            **{champ: F(champ) + _delta(modele, champ, par_pk, pks) for champ, par_pk in champs.items()}
+        )
+
+
+def oeuvre_modifiee(avant=None, apres=None):
+    """avant/apres : Oeuvre.etat_compteurs() (None pour une création ou une suppression)"""
+    if avant == apres:
+        return
+    cumul = {}
+    for etat, signe in ((avant, -1), (apres, 1)):
+        if etat is None:
+            continue
+        artiste_id, categorie_id, statut = etat
+        deltas = {"nb_oeuvres": signe, CHAMPS_STATUT[statut]: signe}
+        _ajouter(cumul, Artiste, artiste_id, deltas)
+        _ajouter(cumul, Categorie, categorie_id, deltas)
+    _appliquer(cumul)
+
+
+def statuts_modifies(oeuvres, ancien, nouveau):
+    """Changement de statut fait par QuerySet.update() ; oeuvres = [(artiste_id, categorie_id), ...]"""
+    cumul = {}
+    deltas = {CHAMPS_STATUT[ancien]: -1, CHAMPS_STATUT[nouveau]: 1}
+    for artiste_id, categorie_id in oeuvres:
+        _ajouter(cumul, Artiste, artiste_id, deltas)
+        _ajouter(cumul, Categorie, categorie_id, deltas)
+    _appliquer(cumul)
+
+
+def ventes_modifiees(lignes, signe):
+    """Ajoute (signe=1) ou retire (signe=-1) les ventes d'un ensemble de lignes de commande"""
+    cumul = {}
+    for ligne in (
+        lignes.values("oeuvre__artiste_id", "oeuvre__categorie_id")
+        .annotate(unites=Sum("quantite"), montant=Sum(F("quantite") * F("prix_unitaire"), output_field=MONTANT))
+        .order_by()
+    ):
+        deltas = {"unites_vendues": signe * ligne["unites"], "chiffre_affaires": signe * ligne["montant"]}
+        _ajouter(cumul, Artiste, ligne["oeuvre__artiste_id"], deltas)
+        _ajouter(cumul, Categorie, ligne["oeuvre__categorie_id"], deltas)
+    _appliquer(cumul)
+
+
+def commande_vendue(commande, signe=1):
+    ventes_modifiees(LigneCommande.objects.filter(commande_id=commande.pk), signe)
+
+
+# ======================
+# Réconciliation
+# ======================
+def _attendus(modele, pks):
+    cle = "artiste_id" if modele is Artiste else "categorie_id"
+    attendus = {pk: {champ: 0 for champ in CHAMPS} for pk in pks}
+    for pk in pks:
+        attendus[pk]["chiffre_affaires"] = Decimal("0.00")
+
+    oeuvres = (
+        Oeuvre.objects.filter(**{f"{cle}__in": pks})
+        .values(cle)
+        .annotate(
+            nb_oeuvres=Count("pk"),
+            **{champ: Count("pk", filter=Q(statut=statut)) for statut, champ in CHAMPS_STATUT.items()},
+        )
+        .order_by()
+    )
+    for ligne in oeuvres:
+        attendus[ligne.pop(cle)].update(ligne)
+
+    ventes = (
+        LigneCommande.objects.filter(**{f"oeuvre__{cle}__in": pks}, commande__statut__in=Commande.STATUTS_VENTE)
+        .values(f"oeuvre__{cle}")
+        .annotate(
+            unites_vendues=Sum("quantite"),
+            chiffre_affaires=Sum(F("quantite") * F("prix_unitaire"), output_field=MONTANT),
+        )
+        .order_by()
+    )
+    for ligne in ventes:
+        attendus[ligne.pop(f"oeuvre__{cle}")].update(ligne)
+    return attendus
+
+
+def reconcilier(taille_lot=1000):
+    """
+    Recalcule les compteurs par lots de taille_lot artistes/catégories ;
+    retourne {modèle: nombre de lignes corrigées}. Chaque lot est verrouillé
+    (select_for_update) le temps de son calcul.
+    """
+    corrections = {}
+    for modele in (Artiste, Categorie):
+        corrigees, dernier = 0, 0
+        while True:
+            with transaction.atomic():
+                lot = list(
+                    modele.objects.select_for_update()
+                    .filter(pk__gt=dernier)
+                    .order_by("pk")
+                    .only("pk", *CHAMPS)[:taille_lot]
+                )
+                if not lot:
+                    break
+                dernier = lot[-1].pk
+                attendus = _attendus(modele, [objet.pk for objet in lot])
+                a_corriger = []
+                for objet in lot:
+                    valeurs = attendus[objet.pk]
+                    if any(getattr(objet, champ) != valeur for champ, valeur in valeurs.items()):
+                        for champ, valeur in valeurs.items():
+                            setattr(objet, champ, valeur)
+                        a_corriger.append(objet)
+                modele.objects.bulk_update(a_corriger, CHAMPS)
+            corrigees += len(a_corriger)
+        corrections[modele] = corrigees
+    return corrections
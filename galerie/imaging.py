@@ -0,0 +1,194 @@
+"""
+Analyse et génération d'images des œuvres (NumPy + Pillow).
+
+Les fonctions de ce module ne dépendent pas de Django : elles peuvent tourner
+dans les processus d'un ProcessPoolExecutor (commandes analyser_images et
+generer_images).
+"""
+import io
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+
+# ======================
+# Empreinte perceptuelle (dHash 64 bits)
+# ======================
+TAILLE_DHASH = 8
+
+
+def dhash(image, taille=TAILLE_DHASH):
+    """
+    dHash : on réduit l'image en (taille+1) x taille niveaux de gris puis on
+    compare chaque pixel à son voisin de droite. Deux images presque
+    identiques (recadrage léger, recompression, redimensionnement) donnent
+    des empreintes à faible distance de Hamming.
+    """
+    gris = image.convert("L").resize((taille + 1, taille), Image.Resampling.LANCZOS)
+    pixels = np.asarray(gris, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def vers_signe(valeur):
+    """uint64 -> int64 (BigIntegerField est signé)"""
+    return valeur - (1 << 64) if valeur >= (1 << 63) else valeur
+
+
+def vers_non_signe(valeur):
+    return valeur & ((1 << 64) - 1)
+
+
+# ======================
+# Couleurs dominantes (k-means dans l'espace Lab)
+# ======================
+NB_COULEURS = 3
+TAILLE_ANALYSE = 64
+ITERATIONS_KMEANS = 12
+
+# sRGB (D65) -> XYZ
+_RGB_XYZ = np.array([
+    [0.4124564, 0.3575761, 0.1804375],
+    [0.2126729, 0.7151522, 0.0721750],
+    [0.0193339, 0.1191920, 0.9503041],
+], dtype=np.float32)
+_BLANC_D65 = np.array([0.95047, 1.0, 1.08883], dtype=np.float32)
+
+
+def rgb_vers_lab(rgb):
+    """Tableau (..., 3) de valeurs 0-255 -> Lab (..., 3), entièrement vectorisé"""
+    c = np.asarray(rgb, dtype=np.float32) / 255.0
+    lineaire = np.where(c > 0.04045, ((c + 0.055) / 1.055) ** 2.4, c / 12.92)
+    xyz = (lineaire @ _RGB_XYZ.T) / _BLANC_D65
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    l = 116 * f[..., 1] - 16
+    a = 500 * (f[..., 0] - f[..., 1])
+    b = 200 * (f[..., 1] - f[..., 2])
+    return np.stack([l, a, b], axis=-1)
+
+
+def hex_vers_lab(code):
+    """'#aa3322' -> Lab (3,) ; ValueError si le code est invalide"""
+    code = code.strip().lstrip("#")
+    if len(code) != 6:
+        raise ValueError(code)
+    rgb = [int(code[i:i + 2], 16) for i in (0, 2, 4)]
+    return rgb_vers_lab(np.array(rgb, dtype=np.float32))
+
+
+def kmeans(points, k=NB_COULEURS, iterations=ITERATIONS_KMEANS):
+    """
+    k-means déterministe : centres initiaux pris sur les quantiles de luminance,
+    puis affectation / mise à jour en opérations matricielles.
+    Retourne (centres (k, 3), effectifs (k,)) triés par effectif décroissant.
+    """
+    ordre = np.argsort(points[:, 0], kind="stable")
+    centres = points[ordre[np.linspace(0, len(points) - 1, k).astype(int)]].copy()
+    for _ in range(iterations):
+        distances = ((points[:, np.newaxis, :] - centres[np.newaxis, :, :]) ** 2).sum(axis=2)
+        groupes = distances.argmin(axis=1)
+        effectifs = np.bincount(groupes, minlength=k)
+        sommes = np.zeros_like(centres)
+        np.add.at(sommes, groupes, points)
+        non_vides = effectifs > 0
+        nouveaux = centres.copy()
+        nouveaux[non_vides] = sommes[non_vides] / effectifs[non_vides, np.newaxis]
+        if np.allclose(nouveaux, centres, atol=0.5):
+            centres = nouveaux
+            break
+        centres = nouveaux
+    ordre = np.argsort(-effectifs, kind="stable")
+    return centres[ordre], effectifs[ordre]
+
+
+def couleurs_dominantes(image, k=NB_COULEURS):
+    """Couleurs dominantes en Lab (k, 3), de la plus à la moins représentée"""
+    reduite = image.convert("RGB").resize((TAILLE_ANALYSE, TAILLE_ANALYSE), Image.Resampling.BILINEAR)
+    points = rgb_vers_lab(np.asarray(reduite)).reshape(-1, 3)
+    centres, _ = kmeans(points, k)
+    return centres
+
+
+def encoder_lab(couleurs):
+    """Lab (k, 3) -> k*3 octets (int8 : L 0..100, a/b -128..127)"""
+    return np.clip(np.rint(couleurs), -128, 127).astype(np.int8).tobytes()
+
+
+def decoder_lab(donnees):
+    return np.frombuffer(bytes(donnees), dtype=np.int8).reshape(-1, 3).astype(np.float32)
+
+
+def analyser_image(image):
+    return {
+        "phash": vers_signe(dhash(image)),
+        "couleurs": encoder_lab(couleurs_dominantes(image)),
+    }
+
+
+def analyser_fichier(chemin):
+    """Point d'entrée des processus de la commande analyser_images"""
+    try:
+        with Image.open(chemin) as image:
+            image.draft("RGB", (256, 256))  # décodage JPEG réduit, bien plus rapide
+            return analyser_image(image)
+    except (OSError, ValueError):
+        return None
+
+
+# ======================
+# Images de test (dégradés)
+# ======================
+PALETTES = [
+    ((70, 130, 180), (100, 180, 220)),   # Bleu
+    ((139, 69, 19), (210, 180, 140)),    # Brun-or
+    ((128, 0, 32), (220, 20, 60)),       # Rouge
+    ((75, 0, 130), (138, 43, 226)),      # Violet
+    ((34, 139, 34), (144, 238, 144)),    # Vert
+    ((255, 165, 0), (255, 215, 0)),      # Orange
+    ((220, 20, 60), (255, 105, 180)),    # Rose
+]
+
+
+def degrade(largeur, hauteur, graine):
+    """
+    Dégradé orienté + ondulation basse fréquence, calculé par broadcasting
+    (aucune boucle par pixel). Chaque graine donne une image différente, ce qui
+    évite que le stockage par empreinte fusionne les images générées.
+    """
+    rng = np.random.default_rng(graine)
+    debut, fin = (np.array(c, dtype=np.float32) for c in PALETTES[rng.integers(len(PALETTES))])
+    angle = rng.uniform(0, 2 * np.pi)
+    frequence = rng.uniform(1, 4)
+    phase = rng.uniform(0, 2 * np.pi)
+
+    x = np.linspace(0, 1, largeur, dtype=np.float32)[np.newaxis, :]
+    y = np.linspace(0, 1, hauteur, dtype=np.float32)[:, np.newaxis]
+    t = x * np.cos(angle) + y * np.sin(angle)
+    t = (t - t.min()) / (np.ptp(t) or 1)
+    t = np.clip(t + 0.08 * np.sin(2 * np.pi * frequence * (x + y) + phase), 0, 1)
+
+    pixels = debut + (fin - debut) * t[..., np.newaxis]  # (hauteur, largeur, 3)
+    return Image.fromarray(pixels.astype(np.uint8), "RGB")
+
+
+def generer_image(tache):
+    """
+    Point d'entrée des processus de la commande generer_images.
+    tache = (titre, largeur, hauteur, graine, qualite) -> octets JPEG
+    """
+    titre, largeur, hauteur, graine, qualite = tache
+    image = degrade(largeur, hauteur, graine)
+
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=max(12, largeur // 20))
+    except TypeError:
+        font = ImageFont.load_default()
+    bbox = draw.textbbox((0, 0), titre, font=font)
+    x = (largeur - (bbox[2] - bbox[0])) // 2
+    y = (hauteur - (bbox[3] - bbox[1])) // 2
+    draw.text((x, y), titre, fill=(255, 255, 255), font=font)
+
+    tampon = io.BytesIO()
+    image.save(tampon, "JPEG", quality=qualite)
+    return tampon.getvalue()
@@ -0,0 +1,226 @@
+"""
+Index en mémoire (par processus) construits à partir de la base.
+
+Chaque index se charge à la première requête, se met à jour au fil des
+sauvegardes (signals.py) et se reconstruit après INDEX_TTL secondes pour
+rattraper les écritures faites par les autres workers.
+"""
+import threading
+import time
+
+import numpy as np
+
+from .imaging import NB_COULEURS, decoder_lab, vers_non_signe
+
+
+INDEX_TTL = 300
+
+
+class IndexMemoire:
+    """
+    Tableaux NumPy alignés : self.pks[i] <-> self.valeurs[i]
+
+    Les tableaux publiés ne sont jamais modifiés en place (copie à l'écriture) :
+    un lecteur qui les a pris sous le verrou calcule ensuite sans lui sur un
+    instantané cohérent.
+    """
+
+    dtype = np.float32
+    forme = ()
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._construit_le = None
+        self.pks = np.empty(0, dtype=np.int64)
+        self.valeurs = np.empty((0,) + self.forme, dtype=self.dtype)
+        self.positions = {}
+
+    def charger(self):
+        """Retourne un itérable de (pk, valeur) depuis la base"""
+        raise NotImplementedError
+
+    def convertir(self, valeur):
+        return valeur
+
+    def construire(self):
+        paires = [(pk, self.convertir(v)) for pk, v in self.charger()]
+        pks = np.fromiter((pk for pk, _ in paires), dtype=np.int64, count=len(paires))
+        valeurs = np.array([v for _, v in paires], dtype=self.dtype).reshape((len(paires),) + self.forme)
+        with self._lock:
+            self.pks, self.valeurs = pks, valeurs
+            self.positions = {int(pk): i for i, pk in enumerate(pks)}
+            self._construit_le = time.monotonic()
+
+    def assurer(self):
+        if self._construit_le is None or time.monotonic() - self._construit_le > INDEX_TTL:
+            self.construire()
+
+    def ajouter(self, pk, valeur):
+        self.ajouter_plusieurs([(pk, valeur)])
+
+    def ajouter_plusieurs(self, paires):
+        """(pk, valeur) ajoutées ou remplacées avec une seule copie des tableaux pour tout le lot"""
+        if self._construit_le is None:
+            return  # pas encore chargé : la construction lira la base
+        lot = {
+            int(pk): np.asarray(self.convertir(valeur), dtype=self.dtype).reshape(self.forme)
+            for pk, valeur in paires
+        }
+        if not lot:
+            return
+        with self._lock:
+            pks, valeurs = self.pks, self.valeurs
+            remplacees = {pk: valeur for pk, valeur in lot.items() if pk in self.positions}
+            if remplacees:
+                valeurs = valeurs.copy()
+                for pk, valeur in remplacees.items():
+                    valeurs[self.positions[pk]] = valeur
+            nouvelles = {pk: valeur for pk, valeur in lot.items() if pk not in remplacees}
+            if nouvelles:
+                for i, pk in enumerate(nouvelles, start=len(pks)):
+                    self.positions[pk] = i
+                pks = np.concatenate([pks, np.fromiter(nouvelles, dtype=np.int64, count=len(nouvelles))])
+                valeurs = np.concatenate([valeurs, np.stack(list(nouvelles.values()))])
+            self.pks, self.valeurs = pks, valeurs
+
+    def retirer(self, pk):
+        with self._lock:
+            i = self.positions.pop(pk, None)
+            if i is None:
+                return
+            # Le dernier élément prend la place du retiré, dans de nouveaux tableaux
+            dernier = len(self.pks) - 1
+            pks, valeurs = self.pks[:dernier].copy(), self.valeurs[:dernier].copy()
+            if i != dernier:
+                pks[i] = self.pks[dernier]
+                valeurs[i] = self.valeurs[dernier]
+                self.positions[int(pks[i])] = i
+            self.pks, self.valeurs = pks, valeurs
+
+
+# ======================
+# Empreintes perceptuelles
+# ======================
+DISTANCE_DOUBLON = 10  # bits différents sur 64
+
+
+class IndexEmpreintes(IndexMemoire):
+    """Recherche des quasi-doublons par distance de Hamming, vectorisée sur tout le catalogue"""
+
+    dtype = np.uint64
+
+    def charger(self):
+        from .models import Oeuvre
+        return Oeuvre.objects.exclude(phash=None).values_list("pk", "phash").iterator(chunk_size=10000)
+
+    def convertir(self, valeur):
+        return vers_non_signe(valeur)
+
+    def voisins(self, phash, distance_max=DISTANCE_DOUBLON, exclure=None):
+        """Liste de (pk, distance) triée par distance croissante"""
+        self.assurer()
+        with self._lock:
+            pks, valeurs = self.pks, self.valeurs
+        distances = np.bitwise_count(valeurs ^ np.uint64(vers_non_signe(phash)))
+        trouves = np.flatnonzero(distances <= distance_max)
+        trouves = trouves[np.argsort(distances[trouves], kind="stable")]
+        return [
+            (int(pks[i]), int(distances[i]))
+            for i in trouves
+            if int(pks[i]) != exclure
+        ]
+
+
+empreintes = IndexEmpreintes()
+
+
+# ======================
+# Couleurs dominantes
+# ======================
+DISTANCE_COULEUR = 25  # ΔE (CIE76) au-delà duquel une couleur n'est plus "proche"
+
+
+class IndexCouleurs(IndexMemoire):
+    """Couleurs dominantes Lab (n, NB_COULEURS, 3) des œuvres validées"""
+
+    forme = (NB_COULEURS, 3)
+
+    def charger(self):
+        from .models import Oeuvre
+        return (
+            Oeuvre.objects.filter(statut=Oeuvre.Statut.VALIDE)
+            .exclude(couleurs=None)
+            .values_list("pk", "couleurs")
+            .iterator(chunk_size=10000)
+        )
+
+    def convertir(self, valeur):
+        return decoder_lab(valeur)
+
+    def proches(self, lab, distance_max=DISTANCE_COULEUR, limite=1000):
+        """pks des œuvres dont une couleur dominante est proche de `lab`, de la plus proche à la moins proche"""
+        self.assurer()
+        with self._lock:
+            pks, valeurs = self.pks, self.valeurs
+        if not len(pks):
+            return []
+        ecarts = valeurs - np.asarray(lab, dtype=np.float32)
+        distances = np.einsum("ijk,ijk->ij", ecarts, ecarts).min(axis=1)  # ΔE²
+        trouves = np.flatnonzero(distances <= distance_max ** 2)
+        if len(trouves) > limite:
+            trouves = trouves[np.argpartition(distances[trouves], limite)[:limite]]
+        trouves = trouves[np.argsort(distances[trouves], kind="stable")]
+        return pks[trouves].tolist()
+
+
+couleurs = IndexCouleurs()
+
+
+# ======================
+# Lieux géolocalisés
+# ======================
+RAYON_TERRE_KM = 6371.0088
+
+
+class IndexLieux(IndexMemoire):
+    """(latitude, longitude) en degrés des lieux géocodés"""
+
+    dtype = np.float64
+    forme = (2,)
+
+    def charger(self):
+        from .models import Lieu
+        return (
+            (pk, (latitude, longitude))
+            for pk, latitude, longitude in Lieu.objects.exclude(latitude=None)
+            .exclude(longitude=None)
+            .values_list("pk", "latitude", "longitude")
+            .iterator(chunk_size=10000)
+        )
+
+    def proches(self, latitude, longitude, rayon_km=None, limite=10):
+        """Liste de (pk, distance en km) triée par distance, au plus `limite` lieux (None : tous)"""
+        self.assurer()
+        with self._lock:
+            pks, valeurs = self.pks, self.valeurs
+        if not len(pks):
+            return []
+        candidats = np.arange(len(pks))
+        if rayon_km is not None:
+            # Bande de latitude : seule comparaison faite sur tout l'index
+            ecart = np.degrees(rayon_km / RAYON_TERRE_KM)
+            candidats = np.flatnonzero(np.abs(valeurs[:, 0] - latitude) <= ecart)
+        # Haversine vectorisée sur les candidats, sans extension spatiale côté base
+        phi, lam = np.radians(valeurs[candidats, 0]), np.radians(valeurs[candidats, 1])
+        phi0, lam0 = np.radians(latitude), np.radians(longitude)
+        a = np.sin((phi - phi0) / 2) ** 2 + np.cos(phi0) * np.cos(phi) * np.sin((lam - lam0) / 2) ** 2
+        distances = np.full(len(pks), np.inf)
+        distances[candidats] = 2 * RAYON_TERRE_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+        trouves = candidats[distances[candidats] <= rayon_km] if rayon_km is not None else candidats
+        if limite is not None and len(trouves) > limite:
+            trouves = trouves[np.argpartition(distances[trouves], limite)[:limite]]
+        trouves = trouves[np.argsort(distances[trouves], kind="stable")]
+        return [(int(pks[i]), float(distances[i])) for i in trouves]
+
+
+lieux = IndexLieux()
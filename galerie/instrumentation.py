@@ -0,0 +1,266 @@
+"""
+Statistiques SQL par empreinte de requête et par vue (SQLStatsMiddleware).
+
+Chaque requête SQL est normalisée en une empreinte (littéraux et paramètres
+remplacés par ?, listes IN/VALUES repliées) ; on agrège par (vue, empreinte) :
+nombre, temps total et max, requêtes HTTP concernées, doublons exacts (même
+SQL, mêmes paramètres, dans la même requête HTTP) et nombre max d'exécutions
+dans une seule requête HTTP (signature N+1).
+
+Les workers (gunicorn) ne partagent pas leur mémoire : chaque processus écrit
+son agrégat dans SQL_STATS_DOSSIER/sql-<pid>.json au plus toutes les
+SQL_STATS_INTERVALLE secondes, et la lecture fusionne tous les fichiers.
+"""
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+
+from .chronometrage import mesurer
+
+
+SEUIL_N_PLUS_UN = 5  # exécutions d'une même empreinte dans une requête HTTP
+MAX_EMPREINTES = 5000  # par processus ; au-delà, regroupées sous "autres"
+
+_LITTERAUX = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b\d+(?:\.\d+)?\b"), "?"),
+    (re.compile(r"%s"), "?"),
+    (re.compile(r"\bIN \((?:\?, )*\?\)", re.IGNORECASE), "IN (...)"),
+    (re.compile(r"\bVALUES (\((?:\?, )*\?\))(?:, \((?:\?, )*\?\))+", re.IGNORECASE), r"VALUES \1, ..."),
+    (re.compile(r"\s+"), " "),
+]
+
+
+@lru_cache(maxsize=4096)
+def normaliser(sql):
+    """Retourne (empreinte, sql normalisé) ; mis en cache, Django réutilise les mêmes chaînes SQL"""
+    texte = sql
+    for motif, remplacement in _LITTERAUX:
+        texte = motif.sub(remplacement, texte)
+    texte = texte.strip()
+    return hashlib.blake2b(texte.encode(), digest_size=8).hexdigest(), texte
+
+
+def cle_parametres(params):
+    try:
+        return hash(tuple(params)) if params is not None else 0
+    except TypeError:
+        return hash(repr(params))
+
+
+# ======================
+# Collecte pendant une requête HTTP
+# ======================
+collecteur_courant = ContextVar("collecteur_sql", default=None)
+
+
+class CollecteurRequete:
+    """
+    Unique execute_wrapper d'une requête HTTP (collecte_sql) : SQLStatsMiddleware,
+    ServerTimingMiddleware et MetriquesMiddleware lisent le même relevé.
+    Les empreintes ne sont calculées qu'à la lecture ; aucune écriture partagée.
+    """
+
+    def __init__(self):
+        self.executions = []  # (sql, clé des paramètres, durée)
+        self.total = 0.0
+
+    @property
+    def nombre(self):
+        return len(self.executions)
+
+    def __call__(self, execute, sql, params, many, context):
+        with mesurer("db"):
+            debut = time.perf_counter()
+            try:
+                return execute(sql, params, many, context)
+            finally:
+                duree = time.perf_counter() - debut
+                self.total += duree
+                self.executions.append((sql, cle_parametres(params), duree))
+
+    def empreintes(self):
+        """empreinte -> [nombre, total_s, max_s, sql normalisé]"""
+        resultat = {}
+        for sql, _, duree in self.executions:
+            empreinte, texte = normaliser(sql)
+            ligne = resultat.get(empreinte)
+            if ligne is None:
+                resultat[empreinte] = [1, duree, duree, texte]
+            else:
+                ligne[0] += 1
+                ligne[1] += duree
+                if duree > ligne[2]:
+                    ligne[2] = duree
+        return resultat
+
+    def doublons(self):
+        """empreinte -> exécutions identiques en trop (même SQL, mêmes paramètres)"""
+        resultat = {}
+        for (sql, _), nombre in Counter((sql, cle) for sql, cle, _ in self.executions).items():
+            if nombre > 1:
+                empreinte = normaliser(sql)[0]
+                resultat[empreinte] = resultat.get(empreinte, 0) + nombre - 1
+        return resultat
+
+
+@contextmanager
+def collecte_sql():
+    """
+    Installe le collecteur sur toutes les connexions, une seule fois par
+    requête HTTP : un middleware imbriqué reçoit celui déjà en place.
+    """
+    collecteur = collecteur_courant.get()
+    if collecteur is not None:
+        yield collecteur
+        return
+    collecteur = CollecteurRequete()
+    jeton = collecteur_courant.set(collecteur)
+    try:
+        with ExitStack() as pile:
+            for connexion in connections.all():
+                pile.enter_context(connexion.execute_wrapper(collecteur))
+            yield collecteur
+    finally:
+        collecteur_courant.reset(jeton)
+
+
+# ======================
+# Agrégat du processus
+# ======================
+class StatsSQL:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dernier_ecrit = time.monotonic()
+        self.vues = {}
+        self.empreintes = {}
+
+    def ajouter(self, vue, collecteur, duree_requete):
+        empreintes = collecteur.empreintes()
+        doublons = collecteur.doublons()
+        with self._lock:
+            stats_vue = self.vues.setdefault(vue, {"requetes": 0, "sql": 0, "sql_ms": 0.0, "total_ms": 0.0})
+            stats_vue["requetes"] += 1
+            stats_vue["sql"] += collecteur.nombre
+            stats_vue["sql_ms"] += collecteur.total * 1000
+            stats_vue["total_ms"] += duree_requete * 1000
+
+            for empreinte, (nombre, total, maximum, texte) in empreintes.items():
+                cle = f"{vue}|{empreinte}"
+                ligne = self.empreintes.get(cle)
+                if ligne is None:
+                    if len(self.empreintes) >= MAX_EMPREINTES:
+                        cle, empreinte, texte = f"{vue}|autres", "autres", "(empreintes au-delà de la limite)"
+                        ligne = self.empreintes.get(cle)
+                    if ligne is None:
+                        ligne = self.empreintes[cle] = {
+                            "vue": vue, "empreinte": empreinte, "sql": texte,
+                            "nombre": 0, "total_ms": 0.0, "max_ms": 0.0,
+                            "requetes": 0, "doublons": 0, "max_par_requete": 0,
+                        }
+                ligne["nombre"] += nombre
+                ligne["total_ms"] += total * 1000
+                ligne["max_ms"] = max(ligne["max_ms"], maximum * 1000)
+                ligne["requetes"] += 1
+                ligne["doublons"] += doublons.get(empreinte, 0)
+                ligne["max_par_requete"] = max(ligne["max_par_requete"], nombre)
+
+        if time.monotonic() - self._dernier_ecrit >= getattr(settings, "SQL_STATS_INTERVALLE", 10):
+            self.ecrire()
+
+    def ecrire(self):
+        """Écriture atomique du fichier de ce processus"""
+        with self._lock:
+            contenu = json.dumps({
+                "pid": os.getpid(),
+                "maj": time.time(),
+                "vues": self.vues,
+                "empreintes": self.empreintes,
+            })
+            self._dernier_ecrit = time.monotonic()
+        dossier().mkdir(parents=True, exist_ok=True)
+        cible = dossier() / f"sql-{os.getpid()}.json"
+        temporaire = cible.with_suffix(".tmp")
+        temporaire.write_text(contenu, encoding="utf-8")
+        os.replace(temporaire, cible)
+
+    def vider(self):
+        with self._lock:
+            self.vues, self.empreintes = {}, {}
+
+
+stats = StatsSQL()
+
+
+def dossier():
+    chemin = Path(getattr(settings, "SQL_STATS_DOSSIER", Path(settings.BASE_DIR) / "sql_stats"))
+    return chemin
+
+
+# ======================
+# Lecture (fusion de tous les processus)
+# ======================
+def lire():
+    """Retourne (vues, empreintes) fusionnées sur tous les fichiers de processus"""
+    vues, empreintes = {}, {}
+    for fichier in dossier().glob("sql-*.json"):
+        try:
+            donnees = json.loads(fichier.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        for vue, ligne in donnees["vues"].items():
+            cumul = vues.setdefault(vue, {"vue": vue, "requetes": 0, "sql": 0, "sql_ms": 0.0, "total_ms": 0.0})
+            for champ in ("requetes", "sql", "sql_ms", "total_ms"):
+                cumul[champ] += ligne[champ]
+        for cle, ligne in donnees["empreintes"].items():
+            cumul = empreintes.get(cle)
+            if cumul is None:
+                empreintes[cle] = dict(ligne)
+                continue
+            for champ in ("nombre", "total_ms", "requetes", "doublons"):
+                cumul[champ] += ligne[champ]
+            cumul["max_ms"] = max(cumul["max_ms"], ligne["max_ms"])
+            cumul["max_par_requete"] = max(cumul["max_par_requete"], ligne["max_par_requete"])
+
+    for ligne in vues.values():
+        ligne["sql_par_requete"] = ligne["sql"] / ligne["requetes"] if ligne["requetes"] else 0
+    for ligne in empreintes.values():
+        ligne["moyenne_ms"] = ligne["total_ms"] / ligne["nombre"] if ligne["nombre"] else 0
+        ligne["par_requete"] = ligne["nombre"] / ligne["requetes"] if ligne["requetes"] else 0
+        ligne["n_plus_un"] = ligne["max_par_requete"] >= SEUIL_N_PLUS_UN
+    return vues, empreintes
+
+
+TRIS = {
+    "total": "total_ms",
+    "nombre": "nombre",
+    "max": "max_ms",
+    "doublons": "doublons",
+    "par_requete": "par_requete",
+}
+
+
+def top(limite=20, tri="total", vue=None):
+    """(vues triées par temps SQL, empreintes les plus coûteuses)"""
+    vues, empreintes = lire()
+    lignes = [l for l in empreintes.values() if vue is None or l["vue"] == vue]
+    lignes.sort(key=lambda l: l[TRIS[tri]], reverse=True)
+    vues = sorted(vues.values(), key=lambda l: l["sql_ms"], reverse=True)
+    return vues[:limite], lignes[:limite]
+
+
+def reinitialiser():
+    stats.vider()
+    for fichier in dossier().glob("sql-*.json"):
+        fichier.unlink(missing_ok=True)
@@ -0,0 +1,59 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from galerie.imaging import analyser_fichier
+from galerie.models import Oeuvre
+
+
+class Command(BaseCommand):
+    help = "Calcule l'analyse d'image (empreinte perceptuelle, couleurs dominantes) des œuvres, en parallèle"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Recalcule aussi les œuvres déjà analysées",
+        )
+
+    def handle(self, *args, **options):
+        champs = ["phash", "couleurs"]
+        oeuvres = Oeuvre.objects.exclude(image="")
+        if not options["force"]:
+            oeuvres = oeuvres.filter(Q(phash__isnull=True) | Q(couleurs__isnull=True))
+
+        storage = Oeuvre._meta.get_field("image").storage
+        taches = [
+            (pk, storage.path(nom))
+            for pk, nom in oeuvres.order_by().values_list("pk", "image").iterator(chunk_size=5000)
+        ]
+        self.stdout.write(f"{len(taches)} œuvre(s) à analyser avec {options['workers']} processus...")
+
+        debut = time.perf_counter()
+        a_enregistrer = []
+        erreurs = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            resultats = pool.map(analyser_fichier, [chemin for _, chemin in taches], chunksize=32)
+            for (pk, chemin), resultat in zip(taches, resultats):
+                if resultat is None:
+                    erreurs += 1
+                    self.stdout.write(f"❌ Image illisible: {chemin}")
+                    continue
+                a_enregistrer.append(Oeuvre(pk=pk, **resultat))
+                if len(a_enregistrer) >= options["batch_size"]:
+                    Oeuvre.objects.bulk_update(a_enregistrer, champs)
+                    a_enregistrer = []
+        if a_enregistrer:
+            Oeuvre.objects.bulk_update(a_enregistrer, champs)
+
+        duree = time.perf_counter() - debut
+        traitees = len(taches) - erreurs
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {traitees} œuvre(s) analysée(s) en {duree:.1f}s "
+            f"({traitees / duree if duree else 0:.0f} images/s), {erreurs} erreur(s)"
+        ))
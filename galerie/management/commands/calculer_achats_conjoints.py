@@ -0,0 +1,72 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from galerie.models import Commande, LigneCommande, OeuvreAchatConjoint
+from galerie.recommandations import CompteurPaires
+
+
+class Command(BaseCommand):
+    help = "Calcule les œuvres achetées ensemble (lift) à partir de l'historique des commandes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-n", type=int, default=10)
+        parser.add_argument("--support-min", type=int, default=2)
+        parser.add_argument("--chunk-size", type=int, default=50000, help="Lignes lues par aller-retour")
+        parser.add_argument("--max-panier", type=int, default=50, help="Ignore les paires des paniers plus gros")
+        parser.add_argument("--batch-size", type=int, default=5000)
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        compteur = CompteurPaires(max_panier=options["max_panier"])
+
+        lignes = (
+            LigneCommande.objects
+            .filter(commande__statut__in=[Commande.Statut.PAYEE, Commande.Statut.VALIDEE])
+            .order_by("commande_id")
+            .values_list("commande_id", "oeuvre_id")
+            .iterator(chunk_size=options["chunk_size"])
+        )
+
+        nb_lignes = 0
+        commande_courante, panier = None, []
+        for commande_id, oeuvre_id in lignes:
+            nb_lignes += 1
+            if commande_id != commande_courante:
+                if panier:
+                    compteur.ajouter_panier(panier)
+                commande_courante, panier = commande_id, []
+            panier.append(oeuvre_id)
+            if nb_lignes % options["chunk_size"] == 0:
+                compteur.vider_lot()
+        if panier:
+            compteur.ajouter_panier(panier)
+
+        self.stdout.write(
+            f"{nb_lignes} ligne(s), {compteur.nb_paniers} commande(s) lues en {time.perf_counter() - debut:.1f}s"
+        )
+
+        sources, cibles, supports, lifts, rangs = compteur.meilleures_paires(
+            options["top_n"], options["support_min"]
+        )
+        self.stdout.write(f"{len(compteur.cles)} paire(s) distincte(s), {len(sources)} lien(s) retenu(s)")
+
+        taille = options["batch_size"]
+        with transaction.atomic():
+            OeuvreAchatConjoint.objects.all().delete()
+            for depart in range(0, len(sources), taille):
+                OeuvreAchatConjoint.objects.bulk_create([
+                    OeuvreAchatConjoint(
+                        oeuvre_id=int(s), associee_id=int(c), support=int(n), lift=float(l), rang=int(r)
+                    )
+                    for s, c, n, l, r in zip(
+                        sources[depart:depart + taille],
+                        cibles[depart:depart + taille],
+                        supports[depart:depart + taille],
+                        lifts[depart:depart + taille],
+                        rangs[depart:depart + taille],
+                    )
+                ])
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Achats conjoints recalculés en {time.perf_counter() - debut:.1f}s"))
@@ -0,0 +1,105 @@
+import time
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Min
+
+from galerie.models import Oeuvre, OeuvreSimilaire
+from galerie.recommandations import top_k, vecteurs
+
+
+class Command(BaseCommand):
+    help = "Précalcule les œuvres similaires (top-k cosinus) des œuvres validées"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--top-k", type=int, default=8)
+        parser.add_argument("--batch-size", type=int, default=256)
+        parser.add_argument(
+            "--incremental",
+            action="store_true",
+            help="Ne calcule que les nouvelles œuvres validées et les voisins qu'elles modifient",
+        )
+
+    def handle(self, *args, **options):
+        k = options["top_k"]
+        debut = time.perf_counter()
+
+        oeuvres = list(
+            Oeuvre.objects.filter(statut=Oeuvre.Statut.VALIDE)
+            .order_by("pk")
+            .values_list("pk", "categorie_id", "technique", "artiste_id", "prix", "couleurs")
+        )
+        pks = np.array([o[0] for o in oeuvres], dtype=np.int64)
+        x = vecteurs(oeuvres)
+        self.stdout.write(f"{len(pks)} œuvre(s) validée(s), vecteurs {x.shape} en {time.perf_counter() - debut:.1f}s")
+
+        if options["incremental"]:
+            lignes = self.lignes_a_recalculer(x, pks, k, options["batch_size"])
+            total = self.calculer(x, pks, lignes, k, options["batch_size"])
+        else:
+            lignes = np.arange(len(pks))
+            # Une seule transaction : les pages gardent les anciens voisins jusqu'au
+            # COMMIT et un calcul interrompu ne laisse pas la table vide
+            with transaction.atomic():
+                OeuvreSimilaire.objects.all().delete()
+                total = self.calculer(x, pks, lignes, k, options["batch_size"])
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(lignes)} œuvre(s) recalculée(s), {total} lien(s) en {time.perf_counter() - debut:.1f}s"
+        ))
+
+    def calculer(self, x, pks, lignes, k, taille_lot):
+        total = 0
+        lot = []
+        for ligne, voisins, scores in top_k(x, lignes, k, taille_lot):
+            lot.append((int(pks[ligne]), pks[voisins], scores))
+            if len(lot) >= taille_lot:
+                total += self.enregistrer(lot)
+                lot = []
+        if lot:
+            total += self.enregistrer(lot)
+        return total
+
+    def lignes_a_recalculer(self, x, pks, k, taille_lot):
+        """Nouvelles œuvres (sans voisins) + œuvres dont le top-k accueille une nouvelle œuvre"""
+        # Liens devenus invalides (œuvre refusée/supprimée depuis le dernier calcul)
+        OeuvreSimilaire.objects.exclude(oeuvre__statut=Oeuvre.Statut.VALIDE).delete()
+        perimees = set(
+            OeuvreSimilaire.objects.exclude(similaire__statut=Oeuvre.Statut.VALIDE)
+            .values_list("oeuvre_id", flat=True)
+        )
+
+        seuils = {
+            row["oeuvre"]: (row["score_min"], row["nb"])
+            for row in OeuvreSimilaire.objects.values("oeuvre").annotate(score_min=Min("score"), nb=Count("pk"))
+        }
+        position = {int(pk): i for i, pk in enumerate(pks)}
+        nouvelles = np.array([i for i, pk in enumerate(pks) if int(pk) not in seuils], dtype=np.int64)
+
+        impactees = set(position[pk] for pk in perimees if pk in position)
+        if len(nouvelles):
+            # Meilleure similarité de chaque œuvre existante avec une des nouvelles
+            meilleure = np.full(len(pks), -np.inf, dtype=np.float32)
+            for depart in range(0, len(nouvelles), taille_lot):
+                bloc = x[nouvelles[depart:depart + taille_lot]] @ x.T
+                np.maximum(meilleure, bloc.max(axis=0), out=meilleure)
+            for pk, (score_min, nb) in seuils.items():
+                i = position.get(pk)
+                if i is not None and (nb < k or meilleure[i] > score_min):
+                    impactees.add(i)
+
+        lignes = np.union1d(nouvelles, np.array(sorted(impactees), dtype=np.int64))
+        self.stdout.write(f"Incrémental : {len(nouvelles)} nouvelle(s), {len(lignes) - len(nouvelles)} voisine(s) impactée(s)")
+        return lignes
+
+    @transaction.atomic
+    def enregistrer(self, lot):
+        OeuvreSimilaire.objects.filter(oeuvre_id__in=[pk for pk, _, _ in lot]).delete()
+        liens = [
+            OeuvreSimilaire(oeuvre_id=pk, similaire_id=int(voisin), score=float(score), rang=rang)
+            for pk, voisins, scores in lot
+            for rang, (voisin, score) in enumerate(zip(voisins, scores), start=1)
+        ]
+        OeuvreSimilaire.objects.bulk_create(liens, batch_size=1000)
+        return len(liens)
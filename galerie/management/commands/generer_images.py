@@ -0,0 +1,100 @@
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from galerie.imaging import generer_image
+from galerie.models import Oeuvre
+
+
+class Command(BaseCommand):
+    help = "Génère des images de test (dégradés NumPy) en parallèle, et les associe aux œuvres sans image"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--count", type=int, default=100, help="Nombre d'images à générer")
+        parser.add_argument("--width", type=int, default=1200)
+        parser.add_argument("--height", type=int, default=900)
+        parser.add_argument("--quality", type=int, default=85)
+        parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=500)
+        parser.add_argument(
+            "--link",
+            action="store_true",
+            help="Associe les images aux œuvres dont l'image est vide ou absente du disque",
+        )
+
+    def handle(self, *args, **options):
+        if options["link"]:
+            oeuvres = self.oeuvres_sans_image(options["count"])
+            titres = [titre for _, titre, _ in oeuvres]
+            # Stockage par empreinte : une référence FichierMedia par œuvre associée
+            stockage = default_storage
+        else:
+            oeuvres = []
+            titres = [f"Oeuvre {i + 1}" for i in range(options["count"])]
+            # Images référencées par aucune œuvre : hors du comptage des
+            # références, écrasées d'un lancement à l'autre
+            stockage = FileSystemStorage(allow_overwrite=True)
+
+        taches = [
+            (titre, options["width"], options["height"], options["seed"] + i, options["quality"])
+            for i, titre in enumerate(titres)
+        ]
+        self.stdout.write(
+            f"Génération de {len(taches)} image(s) {options['width']}x{options['height']} "
+            f"avec {options['workers']} processus..."
+        )
+
+        debut = time.perf_counter()
+        a_associer = []
+        octets = 0
+        with ProcessPoolExecutor(max_workers=options["workers"]) as pool:
+            for i, contenu in enumerate(pool.map(generer_image, taches, chunksize=8)):
+                octets += len(contenu)
+                nom = stockage.save(f"oeuvres/generee_{i}.jpg", ContentFile(contenu))
+                if oeuvres:
+                    pk, _, precedente = oeuvres[i]
+                    a_associer.append((pk, nom, precedente))
+                    if len(a_associer) >= options["batch_size"]:
+                        self.associer(a_associer)
+                        a_associer = []
+        if a_associer:
+            self.associer(a_associer)
+
+        duree = time.perf_counter() - debut
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(taches)} image(s) ({octets / 1e6:.1f} Mo) en {duree:.1f}s "
+            f"({len(taches) / duree if duree else 0:.0f} images/s)"
+            + (f", {len(oeuvres)} œuvre(s) associée(s)" if oeuvres else "")
+        ))
+        if oeuvres:
+            self.stdout.write("Lancez `manage.py analyser_images` pour calculer empreintes et couleurs.")
+
+    def associer(self, lot):
+        """
+        (pk, nouvelle image, ancienne image) : bulk_update() n'envoie pas les
+        signaux, l'ancienne image est donc libérée ici comme le ferait
+        signals.liberer_fichier_remplace
+        """
+        with transaction.atomic():
+            Oeuvre.objects.bulk_update([Oeuvre(pk=pk, image=nom) for pk, nom, _ in lot], ["image"])
+            for _, _, precedente in lot:
+                if precedente:
+                    transaction.on_commit(partial(default_storage.delete, precedente))
+
+    def oeuvres_sans_image(self, limite):
+        """(pk, titre, image actuelle) des œuvres sans image ou dont l'image manque sur le disque"""
+        resultat = []
+        qs = Oeuvre.objects.order_by("pk").values_list("pk", "titre", "image")
+        for pk, titre, image in qs.iterator(chunk_size=5000):
+            if not image or not default_storage.exists(image):
+                resultat.append((pk, titre, image))
+                if len(resultat) >= limite:
+                    break
+        return resultat
@@ -0,0 +1,102 @@
+import csv
+import sys
+import time
+import unicodedata
+
+from django.core.management.base import BaseCommand, CommandError
+
+from galerie.models import Lieu
+
+
+# Colonnes d'un fichier GeoNames (cities500.txt, allCountries.txt...)
+NOM, NOM_ASCII, NOMS_ALTERNATIFS, LATITUDE, LONGITUDE, CODE_PAYS, POPULATION = 1, 2, 3, 4, 5, 8, 14
+
+
+def normaliser(texte):
+    """'Fès ' -> 'fes' : sans accents ni casse, pour rapprocher ville et gazetteer"""
+    texte = unicodedata.normalize("NFKD", texte or "")
+    return "".join(c for c in texte if not unicodedata.combining(c)).casefold().strip()
+
+
+class Command(BaseCommand):
+    help = (
+        "Renseigne latitude/longitude des lieux depuis un gazetteer local au format GeoNames "
+        "(fichier TSV, https://download.geonames.org/export/dump/), sans service en ligne"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("fichier", help="Fichier GeoNames (cities500.txt, allCountries.txt...)")
+        parser.add_argument(
+            "--pays",
+            action="append",
+            default=[],
+            metavar="NOM=CODE",
+            help="Correspondance Lieu.pays -> code ISO GeoNames, ex. --pays Maroc=MA (répétable)",
+        )
+        parser.add_argument("--force", action="store_true", help="Regéocode aussi les lieux déjà renseignés")
+        parser.add_argument("--batch-size", type=int, default=500)
+
+    def handle(self, *args, **options):
+        codes_pays = {}
+        for correspondance in options["pays"]:
+            nom, _, code = correspondance.partition("=")
+            if not code:
+                raise CommandError(f"--pays attend NOM=CODE, reçu {correspondance!r}")
+            codes_pays[normaliser(nom)] = code.strip().upper()
+
+        lieux = Lieu.objects.all()
+        if not options["force"]:
+            lieux = lieux.filter(latitude=None)
+        lieux = list(lieux.only("pk", "ville", "pays"))
+        villes = {normaliser(lieu.ville) for lieu in lieux}
+        self.stdout.write(f"{len(lieux)} lieu(x) à géocoder ({len(villes)} ville(s))...")
+
+        # Un seul passage sur le fichier : on ne garde que les villes cherchées
+        debut = time.perf_counter()
+        candidats = {}  # ville normalisée -> [(code pays, population, latitude, longitude)]
+        csv.field_size_limit(sys.maxsize)
+        try:
+            with open(options["fichier"], encoding="utf-8", newline="") as fichier:
+                for colonnes in csv.reader(fichier, delimiter="\t", quoting=csv.QUOTE_NONE):
+                    if len(colonnes) <= POPULATION:
+                        continue
+                    noms = {normaliser(colonnes[NOM]), normaliser(colonnes[NOM_ASCII])}
+                    noms.update(normaliser(nom) for nom in colonnes[NOMS_ALTERNATIFS].split(","))
+                    trouves = noms & villes
+                    if not trouves:
+                        continue
+                    try:
+                        entree = (
+                            colonnes[CODE_PAYS],
+                            int(colonnes[POPULATION] or 0),
+                            float(colonnes[LATITUDE]),
+                            float(colonnes[LONGITUDE]),
+                        )
+                    except ValueError:
+                        continue
+                    for ville in trouves:
+                        candidats.setdefault(ville, []).append(entree)
+        except OSError as erreur:
+            raise CommandError(f"Gazetteer illisible : {erreur}")
+
+        a_enregistrer, introuvables = [], []
+        for lieu in lieux:
+            entrees = candidats.get(normaliser(lieu.ville), [])
+            pays = normaliser(lieu.pays)
+            code = codes_pays.get(pays) or (pays.upper() if len(pays) == 2 else None)
+            if code:
+                entrees = [entree for entree in entrees if entree[0] == code]
+            if not entrees:
+                introuvables.append(lieu)
+                continue
+            # Homonymes (Valence, Tripoli...) : la ville la plus peuplée l'emporte
+            _, _, lieu.latitude, lieu.longitude = max(entrees, key=lambda entree: entree[1])
+            a_enregistrer.append(lieu)
+
+        Lieu.objects.bulk_update(a_enregistrer, ["latitude", "longitude"], batch_size=options["batch_size"])
+        for lieu in introuvables:
+            self.stdout.write(f"❌ Introuvable : {lieu.ville} ({lieu.pays})")
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {len(a_enregistrer)} lieu(x) géocodé(s) en {time.perf_counter() - debut:.1f}s, "
+            f"{len(introuvables)} introuvable(s) (index de proximité rechargé par les workers sous INDEX_TTL)"
+        ))
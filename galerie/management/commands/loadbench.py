@@ -0,0 +1,461 @@
+import http.client
+import json
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+
+import numpy as np
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.urls import reverse
+
+from galerie.models import Exposition, Oeuvre, Utilisateur
+
+
+HOTES_LOCAUX = {"127.0.0.1", "localhost", "::1"}
+SERVER_TIMING = re.compile(r"(\w+);dur=([\d.]+)")
+
+# Parcours rejoués et poids par défaut (somme libre)
+MIX_DEFAUT = {
+    "parcourir": 40,
+    "rechercher": 20,
+    "panier": 15,
+    "achat": 10,
+    "notifications": 15,
+}
+PARCOURS_CONNECTES = {"panier", "achat", "notifications"}
+
+RECHERCHES = ["paysage", "portrait", "huile", "bronze", "abstrait", "mer", "nuit"]
+COULEURS = ["#1f3a93", "#c0392b", "#f1c40f", "#27ae60", "#2c3e50", "#e67e22"]
+
+PAIEMENT_TEST = {
+    "adresse": "1 Rue du Banc d'Essai",
+    "code_postal": "75001",
+    "ville": "Paris",
+    "pays": "France",
+    "numero_carte": "4111111111111111",
+    "nom_titulaire": "Banc Essai",
+    "date_expiration": "12/30",
+    "cvv": "123",
+    "accepte_conditions": "on",
+}
+
+
+class HandlerSilencieux(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+# ======================
+# Client HTTP (une connexion keep-alive et des cookies par client virtuel)
+# ======================
+class ClientVirtuel:
+    def __init__(self, hote, port, resultats):
+        self.hote, self.port = hote, port
+        self.resultats = resultats
+        self.cookies = {}
+        self.connexion = None
+        self.connecte = False
+
+    def _connexion(self):
+        if self.connexion is None:
+            self.connexion = http.client.HTTPConnection(self.hote, self.port, timeout=30)
+        return self.connexion
+
+    def fermer(self):
+        if self.connexion is not None:
+            self.connexion.close()
+            self.connexion = None
+
+    def _envoyer(self, methode, chemin, corps, entetes):
+        for tentative in range(2):
+            connexion = self._connexion()
+            try:
+                connexion.request(methode, chemin, body=corps, headers=entetes)
+                reponse = connexion.getresponse()
+                reponse.read()
+                return reponse
+            except (http.client.HTTPException, ConnectionError):
+                # Connexion fermée par le serveur entre deux requêtes : on en rouvre une
+                self.fermer()
+                if tentative:
+                    raise
+
+    def requete(self, route, methode, chemin, donnees=None):
+        """Une requête mesurée ; retourne (statut, Location)"""
+        entetes = {"Host": f"{self.hote}:{self.port}"}
+        if self.cookies:
+            entetes["Cookie"] = "; ".join(f"{k}={v}" for k, v in self.cookies.items())
+        corps = None
+        if donnees is not None:
+            donnees = dict(donnees, csrfmiddlewaretoken=self.cookies.get("csrftoken", ""))
+            corps = urlencode(donnees)
+            entetes["Content-Type"] = "application/x-www-form-urlencoded"
+
+        debut = time.perf_counter()
+        try:
+            reponse = self._envoyer(methode, chemin, corps, entetes)
+        except (OSError, http.client.HTTPException):
+            self.resultats.noter(route, (time.perf_counter() - debut) * 1000, 0)
+            return 0, None
+        self.resultats.noter(
+            route,
+            (time.perf_counter() - debut) * 1000,
+            reponse.status,
+            reponse.getheader("Server-Timing"),
+        )
+
+        for entete in reponse.msg.get_all("Set-Cookie") or []:
+            for nom, morceau in SimpleCookie(entete).items():
+                if morceau["max-age"] == "0" or not morceau.value:
+                    self.cookies.pop(nom, None)
+                else:
+                    self.cookies[nom] = morceau.value
+        if reponse.getheader("Connection", "").lower() == "close":
+            self.fermer()
+        return reponse.status, reponse.getheader("Location")
+
+    def get(self, route, chemin):
+        return self.requete(route, "GET", chemin)
+
+    def post(self, route, chemin, donnees):
+        return self.requete(route, "POST", chemin, donnees)
+
+
+# ======================
+# Agrégation des mesures
+# ======================
+class Resultats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.enregistrer = False
+        self.durees = {}
+        self.erreurs = {}
+        self.server_timing = {}  # route -> {métrique: somme des ms}
+
+    def noter(self, route, duree_ms, statut, server_timing=None):
+        if not self.enregistrer:
+            return
+        with self._lock:
+            self.durees.setdefault(route, []).append(duree_ms)
+            if statut == 0 or statut >= 500:
+                self.erreurs[route] = self.erreurs.get(route, 0) + 1
+            if server_timing:
+                sommes = self.server_timing.setdefault(route, {"_n": 0})
+                sommes["_n"] += 1
+                for metrique, dur in SERVER_TIMING.findall(server_timing):
+                    sommes[metrique] = sommes.get(metrique, 0.0) + float(dur)
+
+    def rapport(self, duree):
+        lignes = {}
+        for route, durees in sorted(self.durees.items()):
+            valeurs = np.array(durees)
+            p50, p95, p99 = np.percentile(valeurs, [50, 95, 99])
+            lignes[route] = {
+                "requetes": len(valeurs),
+                "req_s": round(len(valeurs) / duree, 1),
+                "p50_ms": round(float(p50), 1),
+                "p95_ms": round(float(p95), 1),
+                "p99_ms": round(float(p99), 1),
+                "max_ms": round(float(valeurs.max()), 1),
+                "erreurs": self.erreurs.get(route, 0),
+            }
+            sommes = self.server_timing.get(route)
+            if sommes:
+                # Moyennes de l'en-tête Server-Timing : où part le temps côté serveur
+                lignes[route]["server_timing_ms"] = {
+                    metrique: round(somme / sommes["_n"], 2)
+                    for metrique, somme in sommes.items() if metrique != "_n"
+                }
+        return lignes
+
+
+# ======================
+# Commande
+# ======================
+class Command(BaseCommand):
+    help = (
+        "Banc de charge HTTP local : rejoue un mélange pondéré de parcours "
+        "(catalogue, recherche, panier, achat, notifications) avec des clients concurrents. "
+        "Les parcours panier/achat écrivent en base : à lancer sur une base de test "
+        "(populate_data --scale)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=16, help="Clients virtuels concurrents")
+        parser.add_argument("--duration", type=float, default=30, help="Durée mesurée (secondes)")
+        parser.add_argument("--warmup", type=float, default=5, help="Échauffement non mesuré (secondes)")
+        parser.add_argument(
+            "--url",
+            help="Serveur local déjà lancé (ex. http://127.0.0.1:8000). Par défaut : serveur WSGI dans le processus",
+        )
+        parser.add_argument(
+            "--gunicorn",
+            type=int,
+            metavar="WORKERS",
+            help="Lance un gunicorn local avec ce nombre de workers pour la durée du banc",
+        )
+        parser.add_argument(
+            "--mix",
+            help="Poids des parcours, ex. parcourir=40,rechercher=20,panier=15,achat=10,notifications=15",
+        )
+        parser.add_argument("--users", default="scale_client_", help="Préfixe des comptes clients à utiliser")
+        parser.add_argument("--password", default="password123")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--json", dest="sortie_json", help="Écrit le rapport JSON dans ce fichier")
+
+    def handle(self, *args, **options):
+        mix = self.lire_mix(options["mix"])
+        self.preparer_donnees(options)
+        if not self.utilisateurs:
+            retires = sorted(PARCOURS_CONNECTES & set(mix))
+            self.stdout.write(self.style.WARNING(
+                f"Aucun compte '{options['users']}*' : parcours {', '.join(retires)} ignorés "
+                "(lancer populate_data --scale)."
+            ))
+            mix = {nom: poids for nom, poids in mix.items() if nom not in PARCOURS_CONNECTES}
+        if not mix:
+            raise CommandError("Aucun parcours à rejouer.")
+        if options["clients"] > len(self.utilisateurs) and self.utilisateurs:
+            self.stdout.write(self.style.WARNING(
+                f"{options['clients']} clients pour {len(self.utilisateurs)} compte(s) : des sessions seront partagées."
+            ))
+
+        arreter_serveur = lambda: None
+        if options["url"]:
+            hote, port = self.adresse_locale(options["url"])
+            cible = options["url"]
+        elif options["gunicorn"]:
+            hote, port, arreter_serveur = self.lancer_gunicorn(options["gunicorn"])
+            cible = f"gunicorn {options['gunicorn']} worker(s)"
+        else:
+            hote, port, arreter_serveur = self.lancer_serveur_local()
+            cible = "serveur WSGI dans le processus"
+
+        self.stdout.write(
+            f"Banc de charge : {options['clients']} client(s), {options['duration']:.0f}s "
+            f"(+{options['warmup']:.0f}s d'échauffement) sur {cible} ({hote}:{port})"
+        )
+        self.stdout.write("Mélange : " + ", ".join(f"{nom}={poids}" for nom, poids in mix.items()))
+
+        resultats = Resultats()
+        try:
+            duree = self.executer(hote, port, mix, resultats, options)
+        finally:
+            arreter_serveur()
+
+        self.afficher(resultats.rapport(duree), duree, options)
+
+    # ----- Préparation -----
+    def lire_mix(self, texte):
+        if not texte:
+            return dict(MIX_DEFAUT)
+        mix = {}
+        for morceau in texte.split(","):
+            nom, _, poids = morceau.partition("=")
+            nom = nom.strip()
+            if nom not in MIX_DEFAUT:
+                raise CommandError(f"Parcours inconnu : {nom} (parmi {', '.join(MIX_DEFAUT)})")
+            try:
+                mix[nom] = float(poids)
+            except ValueError:
+                raise CommandError(f"Poids invalide pour {nom} : {poids!r}")
+        return {nom: poids for nom, poids in mix.items() if poids > 0}
+
+    def preparer_donnees(self, options):
+        """Identifiants lus une fois en base, puis tirés au hasard par les clients"""
+        self.oeuvres = list(
+            Oeuvre.objects.filter(statut=Oeuvre.Statut.VALIDE, stock__gt=0)
+            .order_by("?").values_list("pk", flat=True)[:5000]
+        )
+        self.expositions = list(Exposition.objects.order_by("?").values_list("pk", flat=True)[:1000])
+        self.utilisateurs = list(
+            Utilisateur.objects.filter(username__startswith=options["users"], is_active=True)
+            .order_by("pk").values_list("username", flat=True)[:max(options["clients"], 1)]
+        )
+        if not self.oeuvres:
+            raise CommandError("Aucune œuvre validée en stock : lancer populate_data (--scale) d'abord.")
+
+    def adresse_locale(self, url):
+        morceaux = urlsplit(url)
+        if morceaux.scheme != "http" or morceaux.hostname not in HOTES_LOCAUX:
+            raise CommandError("Le banc de charge ne vise que des serveurs locaux (http://127.0.0.1, localhost).")
+        return morceaux.hostname, morceaux.port or 80
+
+    def lancer_serveur_local(self):
+        serveur = ThreadedWSGIServer(("127.0.0.1", 0), HandlerSilencieux)
+        serveur.set_app(get_wsgi_application())
+        thread = threading.Thread(target=serveur.serve_forever, daemon=True)
+        thread.start()
+
+        def arreter():
+            serveur.shutdown()
+            serveur.server_close()
+
+        return "127.0.0.1", serveur.server_address[1], arreter
+
+    def lancer_gunicorn(self, workers):
+        import socket
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            port = s.getsockname()[1]
+        processus = subprocess.Popen(
+            [
+                sys.executable, "-m", "gunicorn", "GallerieVirtuelle.wsgi:application",
+                "--bind", f"127.0.0.1:{port}", "--workers", str(workers), "--log-level", "warning",
+            ],
+        )
+        limite = time.monotonic() + 30
+        while time.monotonic() < limite:
+            if processus.poll() is not None:
+                raise CommandError("gunicorn s'est arrêté au démarrage (est-il installé ?).")
+            try:
+                socket.create_connection(("127.0.0.1", port), timeout=0.5).close()
+                break
+            except OSError:
+                time.sleep(0.2)
+        else:
+            processus.terminate()
+            raise CommandError("gunicorn n'écoute pas après 30s.")
+
+        def arreter():
+            processus.terminate()
+            processus.wait(timeout=30)
+
+        return "127.0.0.1", port, arreter
+
+    # ----- Exécution -----
+    def executer(self, hote, port, mix, resultats, options):
+        noms = list(mix)
+        poids = [mix[nom] for nom in noms]
+        fin_echauffement = time.monotonic() + options["warmup"]
+        fin = fin_echauffement + options["duration"]
+
+        def boucle(numero):
+            alea = random.Random(options["seed"] * 1000 + numero)
+            client = ClientVirtuel(hote, port, resultats)
+            utilisateur = self.utilisateurs[numero % len(self.utilisateurs)] if self.utilisateurs else None
+            try:
+                while time.monotonic() < fin:
+                    parcours = alea.choices(noms, poids)[0]
+                    if parcours in PARCOURS_CONNECTES and not client.connecte:
+                        if not self.se_connecter(client, utilisateur, options["password"]):
+                            parcours = "parcourir"
+                    getattr(self, f"parcours_{parcours}")(client, alea)
+            finally:
+                client.fermer()
+
+        threads = [threading.Thread(target=boucle, args=(i,), daemon=True) for i in range(options["clients"])]
+        for thread in threads:
+            thread.start()
+        time.sleep(max(0, fin_echauffement - time.monotonic()))
+        resultats.enregistrer = True
+        debut = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - debut
+
+    def suivre(self, client, statut, location, route):
+        """Suit une redirection locale (mesurée sous `route`)"""
+        if statut in (301, 302, 303) and location:
+            chemin = urlsplit(location).path or "/"
+            return client.get(route, chemin)
+        return statut, location
+
+    def se_connecter(self, client, utilisateur, mot_de_passe):
+        client.get("login", reverse("galerie:login"))  # cookie csrftoken
+        statut, _ = client.post(
+            "login (POST)", reverse("galerie:login"), {"username": utilisateur, "password": mot_de_passe}
+        )
+        client.connecte = statut == 302
+        return client.connecte
+
+    # ----- Parcours -----
+    def parcours_parcourir(self, client, alea):
+        client.get("home", reverse("galerie:home"))
+        client.get("oeuvres_list", reverse("galerie:oeuvres_list"))
+        for pk in alea.sample(self.oeuvres, min(2, len(self.oeuvres))):
+            client.get("oeuvre_detail", reverse("galerie:oeuvre_detail", args=[pk]))
+        client.get("expositions_list", reverse("galerie:expositions_list"))
+        if self.expositions:
+            client.get("exposition_detail", reverse("galerie:exposition_detail", args=[alea.choice(self.expositions)]))
+
+    def parcours_rechercher(self, client, alea):
+        liste = reverse("galerie:oeuvres_list")
+        client.get("oeuvres_list ?q", f"{liste}?{urlencode({'q': alea.choice(RECHERCHES)})}")
+        client.get("oeuvres_list ?tri", f"{liste}?{urlencode({'tri': alea.choice(['prix_croissant', 'titre_az'])})}")
+        client.get("oeuvres_list ?couleur", f"{liste}?{urlencode({'couleur': alea.choice(COULEURS)})}")
+        client.get("oeuvre_detail", reverse("galerie:oeuvre_detail", args=[alea.choice(self.oeuvres)]))
+
+    def parcours_panier(self, client, alea):
+        pk = alea.choice(self.oeuvres)
+        client.get("oeuvre_detail", reverse("galerie:oeuvre_detail", args=[pk]))
+        statut, location = client.get("cart_add", reverse("galerie:cart_add", args=[pk]))
+        self.suivre(client, statut, location, "cart_detail")
+
+    def parcours_achat(self, client, alea):
+        client.get("cart_clear", reverse("galerie:cart_clear"))
+        pk = alea.choice(self.oeuvres)
+        client.get("cart_add", reverse("galerie:cart_add", args=[pk]))
+        client.get("cart_detail", reverse("galerie:cart_detail"))
+        statut, location = client.post("checkout", reverse("galerie:checkout"), {})
+        if statut != 302 or "/payer/" not in (location or ""):
+            return  # stock épuisé entre-temps
+        page_paiement = urlsplit(location).path
+        client.get("order_pay", page_paiement)
+        statut, location = client.post("order_pay (POST)", page_paiement, PAIEMENT_TEST)
+        self.suivre(client, statut, location, "payment_success")
+
+    def parcours_notifications(self, client, alea):
+        client.get("notifications_list", reverse("galerie:notifications_list"))
+        client.get("client_dashboard", reverse("galerie:client_dashboard"))
+
+    # ----- Rapport -----
+    def afficher(self, lignes, duree, options):
+        total = sum(ligne["requetes"] for ligne in lignes.values())
+        erreurs = sum(ligne["erreurs"] for ligne in lignes.values())
+        largeur = max([len(route) for route in lignes] + [5])
+        self.stdout.write("")
+        self.stdout.write(
+            f"{'Route':<{largeur}}  {'requêtes':>8}  {'req/s':>7}  {'p50':>7}  {'p95':>7}  {'p99':>7}  {'max':>7}  {'erreurs':>7}"
+        )
+        for route, ligne in lignes.items():
+            self.stdout.write(
+                f"{route:<{largeur}}  {ligne['requetes']:>8}  {ligne['req_s']:>7.1f}  "
+                f"{ligne['p50_ms']:>7.1f}  {ligne['p95_ms']:>7.1f}  {ligne['p99_ms']:>7.1f}  "
+                f"{ligne['max_ms']:>7.1f}  {ligne['erreurs']:>7}"
+            )
+        style = self.style.SUCCESS if not erreurs else self.style.WARNING
+        self.stdout.write(style(
+            f"\n✅ {total} requête(s) en {duree:.1f}s : {total / duree if duree else 0:.1f} req/s, "
+            f"{erreurs} erreur(s) (temps en ms)"
+        ))
+
+        avec_timing = {route: ligne["server_timing_ms"] for route, ligne in lignes.items() if "server_timing_ms" in ligne}
+        if avec_timing:
+            metriques = list(dict.fromkeys(m for timing in avec_timing.values() for m in timing))
+            self.stdout.write("\nRépartition moyenne côté serveur (Server-Timing, ms)")
+            self.stdout.write(f"{'Route':<{largeur}}  " + "  ".join(f"{m:>7}" for m in metriques))
+            for route, timing in avec_timing.items():
+                self.stdout.write(
+                    f"{route:<{largeur}}  " + "  ".join(f"{timing.get(m, 0):>7.1f}" for m in metriques)
+                )
+
+        if options["sortie_json"]:
+            rapport = {
+                "clients": options["clients"],
+                "duree_s": round(duree, 2),
+                "serveur": options["url"] or (f"gunicorn:{options['gunicorn']}" if options["gunicorn"] else "wsgi"),
+                "req_s": round(total / duree if duree else 0, 1),
+                "erreurs": erreurs,
+                "routes": lignes,
+            }
+            with open(options["sortie_json"], "w", encoding="utf-8") as f:
+                json.dump(rapport, f, indent=2, ensure_ascii=False)
+            self.stdout.write(f"Rapport écrit dans {options['sortie_json']}")
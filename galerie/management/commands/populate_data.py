@@ -1,12 +1,41 @@
-from django.core.management.base import BaseCommand
-from galerie.models import Utilisateur, Artiste, Categorie, Oeuvre, Lieu, Exposition
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from galerie.models import (
+    Utilisateur, Artiste, Categorie, Oeuvre, Lieu, Exposition,
+    Commande, LigneCommande, Paiement, Notification,
+)
+from galerie import compteurs
+from galerie.signals import signaux_suspendus
 from datetime import date, timedelta
+from decimal import Decimal
 from django.utils import timezone
+import random
+import time
 
 class Command(BaseCommand):
     help = 'Populate database with sample data'
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale',
+            action='store_true',
+            help='Génère un jeu de données synthétique volumineux et déterministe (bulk_create)',
+        )
+        parser.add_argument('--artistes', type=int, default=2000)
+        parser.add_argument('--clients', type=int, default=20000)
+        parser.add_argument('--oeuvres', type=int, default=100000)
+        parser.add_argument('--lignes', type=int, default=1000000)
+        parser.add_argument('--notifications', type=int, default=5000000)
+        parser.add_argument('--expositions', type=int, default=1000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--seed', type=int, default=42)
+
     def handle(self, *args, **kwargs):
+        if kwargs.get('scale'):
+            with signaux_suspendus():
+                return self.handle_scale(**kwargs)
+
         # ============================================
         # 1. CRÉER LES LIEUX D'EXPOSITIONS
         # ============================================
@@ -259,3 +288,203 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f'\n✅ {expo_created_count} expositions ajoutées à la base de données!'))
         self.stdout.write(self.style.SUCCESS('✅ Tous les données ont été créées avec succès !'))
 
+    # ============================================
+    # MODE --scale : volumes de production
+    # ============================================
+    CATEGORIES_SCALE = ['Peinture', 'Sculpture', 'Photographie', 'Gravure', 'Dessin',
+                        'Céramique', 'Textile', 'Installation', 'Art numérique', 'Collage']
+    TECHNIQUES_SCALE = ['Huile sur toile', 'Acrylique', 'Aquarelle', 'Bronze', 'Argentique',
+                        'Fusain', 'Encre', 'Techniques mixtes', 'Numérique', 'Pastel']
+    VILLES_SCALE = ['Marrakech', 'Casablanca', 'Rabat', 'Fès', 'Tanger', 'Essaouira', 'Agadir', 'Meknès']
+
+    def handle_scale(self, **options):
+        if Utilisateur.objects.filter(username__startswith='scale_').exists():
+            raise CommandError("Des données --scale existent déjà (utilisateurs 'scale_*').")
+
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        self.maintenant = timezone.now()
+        debut = time.perf_counter()
+
+        categories = [
+            Categorie.objects.get_or_create(nom_categorie=nom, defaults={'description': nom})[0].pk
+            for nom in self.CATEGORIES_SCALE
+        ]
+        artistes = self.scale_artistes(options['artistes'])
+        clients = self.scale_clients(options['clients'])
+        oeuvres, prix = self.scale_oeuvres(options['oeuvres'], artistes, categories)
+        self.scale_expositions(options['expositions'], oeuvres)
+        self.scale_commandes(options['lignes'], clients, oeuvres, prix)
+        self.scale_notifications(options['notifications'], clients + [u for u, _ in artistes])
+        # Signaux suspendus pendant le chargement : compteurs recalculés d'un coup
+        compteurs.reconcilier()
+
+        self.stdout.write(self.style.SUCCESS(f'\n✅ Jeu de données --scale chargé en {time.perf_counter() - debut:.0f}s'))
+
+    def inserer(self, model, objets, libelle):
+        """bulk_create par lots, un lot = une transaction ; retourne les objets créés (pk renseignées)"""
+        debut = time.perf_counter()
+        crees = []
+        lot = []
+        total = 0
+        for objet in objets:
+            lot.append(objet)
+            if len(lot) >= self.batch_size:
+                total += self.inserer_lot(model, lot, crees)
+                lot = []
+        if lot:
+            total += self.inserer_lot(model, lot, crees)
+        self.rapport(libelle, total, debut)
+        return crees
+
+    def inserer_lot(self, model, lot, crees):
+        with transaction.atomic():
+            model.objects.bulk_create(lot, batch_size=self.batch_size)
+        if model in (Utilisateur, Artiste, Oeuvre, Commande, Lieu, Exposition):
+            crees.extend(o.pk for o in lot)
+        return len(lot)
+
+    def rapport(self, libelle, total, debut):
+        duree = time.perf_counter() - debut
+        self.stdout.write(f'✅ {total} {libelle} en {duree:.1f}s ({total / duree if duree else 0:,.0f} lignes/s)')
+
+    def scale_artistes(self, nombre):
+        mot_de_passe = make_password('password123')
+        users = self.inserer(Utilisateur, (
+            Utilisateur(username=f'scale_artiste_{i}', email=f'artiste{i}@scale.test',
+                        role='artiste', password=mot_de_passe)
+            for i in range(nombre)
+        ), 'utilisateurs artistes')
+        artistes = self.inserer(Artiste, (
+            Artiste(user_id=user_id, nom=f'Artiste {i}', nationalite=self.rng.choice(['Marocaine', 'Française', 'Espagnole', 'Sénégalaise']))
+            for i, user_id in enumerate(users)
+        ), 'artistes')
+        return list(zip(users, artistes))
+
+    def scale_clients(self, nombre):
+        mot_de_passe = make_password('password123')
+        return self.inserer(Utilisateur, (
+            Utilisateur(username=f'scale_client_{i}', email=f'client{i}@scale.test',
+                        role='visiteur', password=mot_de_passe)
+            for i in range(nombre)
+        ), 'clients')
+
+    def scale_oeuvres(self, nombre, artistes, categories):
+        rng = self.rng
+        statuts = [Oeuvre.Statut.VALIDE] * 16 + [Oeuvre.Statut.EN_ATTENTE] * 3 + [Oeuvre.Statut.REFUSE]
+        prix = [round(min(rng.lognormvariate(7, 1.2), 500000), 2) for _ in range(nombre)]
+        oeuvres = self.inserer(Oeuvre, (
+            Oeuvre(
+                titre=f'Œuvre {i}',
+                description=f'Œuvre synthétique numéro {i}',
+                technique=rng.choice(self.TECHNIQUES_SCALE),
+                annee_creation=rng.randint(1950, 2026),
+                prix=Decimal(str(prix[i])),
+                stock=rng.randint(0, 5),
+                statut=rng.choice(statuts),
+                artiste_id=rng.choice(artistes)[1],
+                categorie_id=rng.choice(categories),
+            )
+            for i in range(nombre)
+        ), 'œuvres')
+        return oeuvres, prix
+
+    def scale_expositions(self, nombre, oeuvres):
+        rng = self.rng
+        lieux = self.inserer(Lieu, (
+            Lieu(nom_lieu=f'Lieu {i}', ville=rng.choice(self.VILLES_SCALE), pays='Maroc')
+            for i in range(max(1, nombre // 10))
+        ), 'lieux')
+        aujourd_hui = self.maintenant.date()
+        debuts = [aujourd_hui + timedelta(days=rng.randint(-400, 200)) for _ in range(nombre)]
+        expositions = self.inserer(Exposition, (
+            Exposition(
+                nom_exposition=f'Exposition {i}',
+                description=f'Exposition synthétique {i}',
+                date_debut=debuts[i],
+                date_fin=debuts[i] + timedelta(days=rng.randint(7, 120)),
+                lieu_id=rng.choice(lieux),
+            )
+            for i in range(nombre)
+        ), 'expositions')
+        Through = Exposition.oeuvres.through
+        self.inserer(Through, (
+            Through(exposition_id=expo_id, oeuvre_id=oeuvre_id)
+            for expo_id in expositions
+            for oeuvre_id in rng.sample(oeuvres, min(10, len(oeuvres)))
+        ), 'liens exposition-œuvre')
+
+    def scale_commandes(self, nb_lignes, clients, oeuvres, prix):
+        """Commandes de 1 à 5 lignes jusqu'à atteindre nb_lignes, datées sur les 365 derniers jours"""
+        rng = self.rng
+        statuts = ([Commande.Statut.PAYEE] * 12 + [Commande.Statut.VALIDEE] * 4
+                   + [Commande.Statut.EN_COURS] * 3 + [Commande.Statut.ANNULEE])
+        index_oeuvres = range(len(oeuvres))
+        debut = time.perf_counter()
+        nb_commandes = nb_paiements = total = 0
+
+        while total < nb_lignes:
+            paniers = []
+            while total < nb_lignes and len(paniers) < self.batch_size // 3:
+                taille = min(rng.randint(1, 5), nb_lignes - total, len(oeuvres))
+                paniers.append(rng.sample(index_oeuvres, taille))
+                total += taille
+
+            commandes = []
+            for panier in paniers:
+                commande = Commande(
+                    utilisateur_id=rng.choice(clients),
+                    statut=rng.choice(statuts),
+                    montant_total=Decimal(str(round(sum(prix[i] for i in panier), 2))),
+                    adresse_livraison='Adresse synthétique',
+                )
+                commande.date_scale = self.maintenant - timedelta(seconds=rng.randint(0, 365 * 86400))
+                commandes.append(commande)
+
+            with transaction.atomic():
+                Commande.objects.bulk_create(commandes)
+                # date_commande est auto_now_add : on réécrit la date synthétique après insertion
+                for commande in commandes:
+                    commande.date_commande = commande.date_scale
+                Commande.objects.bulk_update(commandes, ['date_commande'], batch_size=1000)
+                LigneCommande.objects.bulk_create([
+                    LigneCommande(
+                        commande_id=commande.pk,
+                        oeuvre_id=oeuvres[i],
+                        quantite=1,
+                        prix_unitaire=Decimal(str(prix[i])),
+                    )
+                    for commande, panier in zip(commandes, paniers)
+                    for i in panier
+                ])
+                paiements = [
+                    Paiement(
+                        commande_id=commande.pk,
+                        statut=Paiement.Statut.SUCCES,
+                        montant=commande.montant_total,
+                        reference=f'SCALE-{commande.pk}',
+                    )
+                    for commande in commandes
+                    if commande.statut in (Commande.Statut.PAYEE, Commande.Statut.VALIDEE)
+                ]
+                Paiement.objects.bulk_create(paiements)
+            nb_commandes += len(commandes)
+            nb_paiements += len(paiements)
+
+        self.rapport('lignes de commande', total, debut)
+        self.stdout.write(f'   ({nb_commandes} commandes, {nb_paiements} paiements)')
+
+    def scale_notifications(self, nombre, utilisateurs):
+        rng = self.rng
+        types = [t for t, _ in Notification.Type.choices]
+        statuts = [Notification.Statut.NON_LUE, Notification.Statut.LUE, Notification.Statut.LUE]
+        self.inserer(Notification, (
+            Notification(
+                titre=f'Notification {i}',
+                message='Message synthétique',
+                type_notif=rng.choice(types),
+                statut=rng.choice(statuts),
+                utilisateur_id=rng.choice(utilisateurs),
+            )
+            for i in range(nombre)
+        ), 'notifications')
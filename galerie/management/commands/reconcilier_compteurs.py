@@ -0,0 +1,19 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from galerie import compteurs
+
+
+class Command(BaseCommand):
+    help = "Recalcule les compteurs dénormalisés des artistes et catégories (œuvres par statut, ventes)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000, help="Artistes/catégories par lot")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        corrections = compteurs.reconcilier(options["batch_size"])
+        for modele, corrigees in corrections.items():
+            self.stdout.write(f"{modele._meta.verbose_name_plural} : {corrigees} ligne(s) corrigée(s)")
+        self.stdout.write(self.style.SUCCESS(f"✅ Compteurs réconciliés en {time.perf_counter() - debut:.1f}s"))
@@ -0,0 +1,37 @@
+import time
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from galerie import rollups
+
+
+class Command(BaseCommand):
+    help = (
+        "Met à jour les agrégats de ventes journaliers (commandes modifiées depuis le dernier passage). "
+        "À lancer périodiquement (cron) ; --backfill recalcule l'historique existant."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--backfill", action="store_true", help="Recalcule tout l'historique des commandes")
+        parser.add_argument("--depuis", help="Avec --backfill : ne recalcule qu'à partir de cette date (AAAA-MM-JJ)")
+
+    def handle(self, *args, **options):
+        debut = time.perf_counter()
+        if options["depuis"] and not options["backfill"]:
+            raise CommandError("--depuis ne s'utilise qu'avec --backfill")
+
+        if options["backfill"]:
+            depuis = None
+            if options["depuis"]:
+                try:
+                    depuis = date.fromisoformat(options["depuis"])
+                except ValueError:
+                    raise CommandError(f"Date invalide : {options['depuis']}")
+            jours, lignes = rollups.reconstruire(depuis)
+        else:
+            jours, lignes = rollups.mettre_a_jour()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ {jours} jour(s) recalculé(s), {lignes} ligne(s) d'agrégat en {time.perf_counter() - debut:.1f}s"
+        ))
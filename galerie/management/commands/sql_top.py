@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+
+from galerie import instrumentation
+
+
+class Command(BaseCommand):
+    help = "Affiche les empreintes SQL les plus coûteuses collectées par SQLStatsMiddleware (tous workers)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--limit", type=int, default=20)
+        parser.add_argument("--sort", choices=list(instrumentation.TRIS), default="total")
+        parser.add_argument("--view", help="Limiter à une vue (ex. galerie:orders_list)")
+        parser.add_argument("--reset", action="store_true", help="Efface les statistiques collectées")
+
+    def handle(self, *args, **options):
+        if options["reset"]:
+            instrumentation.reinitialiser()
+            self.stdout.write(self.style.SUCCESS("✅ Statistiques SQL effacées"))
+            return
+
+        vues, empreintes = instrumentation.top(options["limit"], options["sort"], options["view"])
+        if not vues:
+            self.stdout.write("Aucune statistique (SQL_STATS_ACTIF, ou attendre SQL_STATS_INTERVALLE secondes).")
+            return
+
+        self.stdout.write(self.style.MIGRATE_HEADING("Vues (par temps SQL)"))
+        self.stdout.write(f"{'requêtes':>9} {'SQL/req':>8} {'SQL ms':>10} {'total ms':>10}  vue")
+        for ligne in vues:
+            self.stdout.write(
+                f"{ligne['requetes']:>9} {ligne['sql_par_requete']:>8.1f} "
+                f"{ligne['sql_ms']:>10.0f} {ligne['total_ms']:>10.0f}  {ligne['vue']}"
+            )
+
+        self.stdout.write("")
+        self.stdout.write(self.style.MIGRATE_HEADING(f"Empreintes (tri : {options['sort']})"))
+        for ligne in empreintes:
+            alertes = []
+            if ligne["n_plus_un"]:
+                alertes.append(f"N+1 x{ligne['max_par_requete']}")
+            if ligne["doublons"]:
+                alertes.append(f"{ligne['doublons']} doublon(s)")
+            self.stdout.write(
+                f"{ligne['total_ms']:>10.1f} ms  {ligne['nombre']:>7} exéc.  "
+                f"{ligne['par_requete']:>5.1f}/req  max {ligne['max_ms']:.1f} ms  {ligne['vue']}"
+                + (self.style.WARNING("  [" + ", ".join(alertes) + "]") if alertes else "")
+            )
+            self.stdout.write(f"    {ligne['sql'][:300]}")
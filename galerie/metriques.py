@@ -0,0 +1,181 @@
+"""
+Métriques applicatives au format Prometheus (vue /metrics).
+
+Chaque processus tient ses compteurs et histogrammes en mémoire et les écrit
+dans METRIQUES_DOSSIER/metriques-<pid>.json au plus toutes les
+METRIQUES_INTERVALLE secondes ; /metrics fusionne les fichiers de tous les
+workers. Les fichiers des workers arrêtés sont conservés : un compteur ne
+doit pas redescendre quand gunicorn recycle un worker.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+
+SECONDES = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+REQUETES_SQL = (1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+# nom -> (type, aide, bornes des histogrammes)
+DEFINITIONS = {
+    "galerie_http_requests_total": ("counter", "Requêtes HTTP par route, méthode et statut", None),
+    "galerie_http_request_duration_seconds": ("histogram", "Durée des requêtes HTTP par route", SECONDES),
+    "galerie_db_queries_total": ("counter", "Requêtes SQL exécutées, par route", None),
+    "galerie_db_queries_per_request": ("histogram", "Requêtes SQL par requête HTTP, par route", REQUETES_SQL),
+    "galerie_cache_requests_total": ("counter", "Lectures de cache par cache et résultat (hit/miss)", None),
+    "galerie_checkouts_total": ("counter", "Passages en caisse par résultat", None),
+    "galerie_paiements_total": ("counter", "Paiements de commandes par statut", None),
+    "galerie_tickets_vendus_total": ("counter", "Tickets d'exposition vendus, par type", None),
+    "galerie_conflits_stock_total": ("counter", "Stock insuffisant au moment d'ajouter au panier ou de commander", None),
+    "galerie_moderations_total": ("counter", "Œuvres validées ou refusées, par décision", None),
+}
+JAUGES = {
+    "galerie_workers": "Processus ayant publié des métriques depuis moins d'une minute",
+    "galerie_http_requests_in_progress": "Requêtes HTTP en cours (dernière publication de chaque worker)",
+}
+FRAICHEUR = 60
+
+
+def _echapper(valeur):
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{cle}="{_echapper(valeur)}"' for cle, valeur in sorted(labels.items())) + "}"
+
+
+class Registre:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dernier_ecrit = time.monotonic()
+        self.compteurs = {}  # nom -> {labels: valeur}
+        self.histogrammes = {}  # nom -> {labels: [effectifs par borne..., +Inf, somme]}
+        self.en_cours = 0
+
+    def incrementer(self, nom, valeur=1, **labels):
+        cle = _labels(labels)
+        with self._lock:
+            serie = self.compteurs.setdefault(nom, {})
+            serie[cle] = serie.get(cle, 0) + valeur
+
+    def observer(self, nom, valeur, **labels):
+        bornes = DEFINITIONS[nom][2]
+        cle = _labels(labels)
+        with self._lock:
+            serie = self.histogrammes.setdefault(nom, {})
+            effectifs = serie.get(cle)
+            if effectifs is None:
+                effectifs = serie[cle] = [0] * (len(bornes) + 1) + [0.0]
+            for i, borne in enumerate(bornes):
+                if valeur <= borne:
+                    effectifs[i] += 1
+                    break
+            else:
+                effectifs[len(bornes)] += 1
+            effectifs[-1] += valeur
+
+    def debut_requete(self):
+        with self._lock:
+            self.en_cours += 1
+
+    def fin_requete(self):
+        with self._lock:
+            self.en_cours -= 1
+
+    def publier_si_besoin(self):
+        if time.monotonic() - self._dernier_ecrit >= getattr(settings, "METRIQUES_INTERVALLE", 5):
+            self.publier()
+
+    def publier(self):
+        with self._lock:
+            contenu = json.dumps({
+                "pid": os.getpid(),
+                "maj": time.time(),
+                "en_cours": self.en_cours,
+                "compteurs": self.compteurs,
+                "histogrammes": self.histogrammes,
+            })
+            self._dernier_ecrit = time.monotonic()
+        cible = dossier()
+        cible.mkdir(parents=True, exist_ok=True)
+        fichier = cible / f"metriques-{os.getpid()}.json"
+        temporaire = fichier.with_suffix(".tmp")
+        temporaire.write_text(contenu, encoding="utf-8")
+        os.replace(temporaire, fichier)
+
+
+registre = Registre()
+incrementer = registre.incrementer
+observer = registre.observer
+
+
+def compter_cache(cache, hit):
+    registre.incrementer("galerie_cache_requests_total", cache=cache, resultat="hit" if hit else "miss")
+
+
+def dossier():
+    return Path(getattr(settings, "METRIQUES_DOSSIER", Path(settings.BASE_DIR) / "metriques"))
+
+
+# ======================
+# Exposition (fusion de tous les workers)
+# ======================
+def fusionner():
+    compteurs, histogrammes, workers, en_cours = {}, {}, 0, 0
+    maintenant = time.time()
+    for fichier in dossier().glob("metriques-*.json"):
+        try:
+            donnees = json.loads(fichier.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            continue
+        if maintenant - donnees["maj"] < FRAICHEUR:
+            workers += 1
+            en_cours += donnees["en_cours"]
+        for nom, serie in donnees["compteurs"].items():
+            cumul = compteurs.setdefault(nom, {})
+            for cle, valeur in serie.items():
+                cumul[cle] = cumul.get(cle, 0) + valeur
+        for nom, serie in donnees["histogrammes"].items():
+            cumul = histogrammes.setdefault(nom, {})
+            for cle, effectifs in serie.items():
+                if cle in cumul:
+                    cumul[cle] = [a + b for a, b in zip(cumul[cle], effectifs)]
+                else:
+                    cumul[cle] = list(effectifs)
+    return compteurs, histogrammes, {"galerie_workers": workers, "galerie_http_requests_in_progress": en_cours}
+
+
+def _avec_le(cle, borne):
+    le = f'le="{borne}"'
+    return "{" + le + "}" if not cle else cle[:-1] + "," + le + "}"
+
+
+def exposer():
+    """Texte au format d'exposition Prometheus 0.0.4"""
+    registre.publier()
+    compteurs, histogrammes, jauges = fusionner()
+    lignes = []
+    for nom, (genre, aide, bornes) in DEFINITIONS.items():
+        lignes.append(f"# HELP {nom} {aide}")
+        lignes.append(f"# TYPE {nom} {genre}")
+        if genre == "counter":
+            for cle, valeur in sorted(compteurs.get(nom, {}).items()):
+                lignes.append(f"{nom}{cle} {valeur}")
+            continue
+        for cle, effectifs in sorted(histogrammes.get(nom, {}).items()):
+            cumul = 0
+            for borne, effectif in zip(list(bornes) + ["+Inf"], effectifs):
+                cumul += effectif
+                lignes.append(f"{nom}_bucket{_avec_le(cle, borne)} {cumul}")
+            lignes.append(f"{nom}_sum{cle} {effectifs[-1]}")
+            lignes.append(f"{nom}_count{cle} {cumul}")
+    for nom, aide in JAUGES.items():
+        lignes.append(f"# HELP {nom} {aide}")
+        lignes.append(f"# TYPE {nom} gauge")
+        lignes.append(f"{nom} {jauges[nom]}")
+    return "\n".join(lignes) + "\n"
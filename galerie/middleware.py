@@ -0,0 +1,178 @@
+import cProfile
+import pstats
+import random
+import threading
+import time
+
+from django.conf import settings
+
+from . import metriques, profilage
+from .chronometrage import SESSION_STAFF, Chronometre, chronometre_courant
+from .instrumentation import collecte_sql, stats as stats_sql
+
+
+# ======================
+# Profilage cProfile d'un échantillon de requêtes
+# ======================
+class ProfilageMiddleware:
+    """
+    Profile une fraction PROFILAGE_TAUX des requêtes, ou toute requête d'un
+    compte staff portant l'en-tête PROFILAGE_ENTETE (ex. "X-Profile: 1").
+    Un seul profil à la fois par processus : cProfile ne supporte pas deux
+    profileurs actifs, les requêtes concurrentes passent sans profilage.
+    """
+
+    _verrou = threading.Lock()
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.taux = getattr(settings, "PROFILAGE_TAUX", 0.0)
+        self.entete = getattr(settings, "PROFILAGE_ENTETE", "X-Profile")
+
+    def declencheur(self, request):
+        if self.entete and request.headers.get(self.entete):
+            if getattr(request, "user", None) is not None and request.user.is_staff:
+                return "entete"
+        if self.taux and random.random() < self.taux:
+            return "echantillon"
+        return None
+
+    def __call__(self, request):
+        declencheur = self.declencheur(request)
+        if declencheur is None or not self._verrou.acquire(blocking=False):
+            return self.get_response(request)
+
+        try:
+            profil = cProfile.Profile()
+            debut = time.perf_counter()
+            profil.enable()
+            try:
+                response = self.get_response(request)
+            finally:
+                profil.disable()
+            duree_ms = (time.perf_counter() - debut) * 1000
+        finally:
+            self._verrou.release()
+
+        match = request.resolver_match
+        profilage.enregistrer(
+            pstats.Stats(profil),
+            vue=match.view_name if match else "sans_vue",
+            chemin=request.path,
+            methode=request.method,
+            statut=response.status_code,
+            duree_ms=duree_ms,
+            declencheur=declencheur,
+        )
+        return response
+
+
+# ======================
+# Empreintes SQL par vue (galerie/instrumentation.py)
+# ======================
+class SQLStatsMiddleware:
+    """
+    Agrège par (vue, empreinte) le relevé SQL de la requête (collecte_sql,
+    partagé avec ServerTiming et Metriques). À placer en tête de MIDDLEWARE
+    pour compter aussi les requêtes de session et d'authentification.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.actif = getattr(settings, "SQL_STATS_ACTIF", True)
+
+    def __call__(self, request):
+        if not self.actif:
+            return self.get_response(request)
+
+        debut = time.perf_counter()
+        with collecte_sql() as collecteur:
+            response = self.get_response(request)
+
+        match = request.resolver_match
+        stats_sql.ajouter(match.view_name if match else "sans_vue", collecteur, time.perf_counter() - debut)
+        return response
+
+
+# ======================
+# En-tête Server-Timing (galerie/chronometrage.py)
+# ======================
+class ServerTimingMiddleware:
+    """
+    Ajoute l'en-tête Server-Timing (db, tpl, ctx, vue, mw, total).
+    À placer en tête de MIDDLEWARE, avec ServerTimingVueMiddleware en dernier.
+    Réservé aux comptes staff (statut mémorisé en session à la connexion),
+    sauf SERVER_TIMING_STAFF = False.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.actif = getattr(settings, "SERVER_TIMING_ACTIF", True)
+        self.staff_seulement = getattr(settings, "SERVER_TIMING_STAFF", True)
+
+    def __call__(self, request):
+        if not self.actif:
+            return self.get_response(request)
+
+        chronometre = Chronometre()
+        jeton = chronometre_courant.set(chronometre)
+        try:
+            with collecte_sql() as collecteur:
+                response = self.get_response(request)
+        finally:
+            chronometre_courant.reset(jeton)
+
+        if not self.staff_seulement or hasattr(request, "session") and request.session.get(SESSION_STAFF):
+            response["Server-Timing"] = chronometre.entete(collecteur.nombre)
+        return response
+
+
+class ServerTimingVueMiddleware:
+    """Dernier middleware : délimite le temps passé dans la vue elle-même"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        chronometre = chronometre_courant.get()
+        if chronometre is not None:
+            chronometre.entrer("vue")
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        chronometre = chronometre_courant.get()
+        if chronometre is not None:
+            chronometre.sortir("vue")
+        return response
+
+
+# ======================
+# Métriques Prometheus (galerie/metriques.py)
+# ======================
+class MetriquesMiddleware:
+    """Nombre de requêtes, durée et requêtes SQL par route (nom d'URL)"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metriques.registre.debut_requete()
+        debut = time.perf_counter()
+        try:
+            with collecte_sql() as collecteur:
+                response = self.get_response(request)
+        finally:
+            metriques.registre.fin_requete()
+        duree = time.perf_counter() - debut
+        nb_sql = collecteur.nombre
+
+        match = request.resolver_match
+        route = match.view_name if match else "sans_route"
+        metriques.incrementer(
+            "galerie_http_requests_total", route=route, method=request.method, status=response.status_code
+        )
+        metriques.observer("galerie_http_request_duration_seconds", duree, route=route)
+        metriques.incrementer("galerie_db_queries_total", nb_sql, route=route)
+        metriques.observer("galerie_db_queries_per_request", nb_sql, route=route)
+        metriques.registre.publier_si_besoin()
+        return response
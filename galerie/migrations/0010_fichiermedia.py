@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0009_alter_lignecommande_prix_unitaire'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FichierMedia',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('chemin', models.CharField(max_length=255, unique=True)),
+                ('empreinte', models.CharField(db_index=True, max_length=64)),
+                ('taille', models.PositiveBigIntegerField(default=0)),
+                ('references', models.PositiveIntegerField(default=0)),
+                ('date_creation', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'verbose_name': 'Fichier média',
+                'verbose_name_plural': 'Fichiers médias',
+                'db_table': 'fichier_media',
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0010_fichiermedia'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oeuvre',
+            name='phash',
+            field=models.BigIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0011_oeuvre_phash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='oeuvre',
+            name='couleurs',
+            field=models.BinaryField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0012_oeuvre_couleurs'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OeuvreSimilaire',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('rang', models.PositiveSmallIntegerField()),
+                ('oeuvre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='similaires', to='galerie.oeuvre')),
+                ('similaire', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='galerie.oeuvre')),
+            ],
+            options={
+                'verbose_name': 'Œuvre similaire',
+                'verbose_name_plural': 'Œuvres similaires',
+                'db_table': 'oeuvre_similaire',
+                'ordering': ['oeuvre_id', 'rang'],
+                'constraints': [models.UniqueConstraint(fields=('oeuvre', 'rang'), name='unique_oeuvre_similaire_rang')],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 6.0.1 on 2026-10-19 00:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0013_oeuvresimilaire'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OeuvreAchatConjoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('support', models.PositiveIntegerField()),
+                ('lift', models.FloatField()),
+                ('rang', models.PositiveSmallIntegerField()),
+                ('associee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='galerie.oeuvre')),
+                ('oeuvre', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='achats_conjoints', to='galerie.oeuvre')),
+            ],
+            options={
+                'verbose_name': 'Achat conjoint',
+                'verbose_name_plural': 'Achats conjoints',
+                'db_table': 'oeuvre_achat_conjoint',
+                'ordering': ['oeuvre_id', 'rang'],
+                'constraints': [models.UniqueConstraint(fields=('oeuvre', 'rang'), name='unique_oeuvre_achat_conjoint_rang')],
+            },
+        ),
+    ]
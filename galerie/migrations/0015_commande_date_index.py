@@ -0,0 +1,18 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0014_oeuvreachatconjoint'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='commande',
+            name='date_commande',
+            field=models.DateTimeField(auto_now_add=True, db_index=True),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def initialiser_date_modification(apps, schema_editor):
+    Commande = apps.get_model("galerie", "Commande")
+    Commande.objects.update(date_modification=models.F("date_commande"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0015_commande_date_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EtatAgregat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nom', models.CharField(max_length=50, unique=True)),
+                ('filigrane', models.DateTimeField(blank=True, null=True)),
+                ('date_maj', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': "État d'agrégat",
+                'verbose_name_plural': "États d'agrégats",
+                'db_table': 'etat_agregat',
+            },
+        ),
+        migrations.AddField(
+            model_name='commande',
+            name='date_modification',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+        migrations.RunPython(initialiser_date_modification, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='VenteJournaliere',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('jour', models.DateField()),
+                ('chiffre_affaires', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('unites', models.PositiveIntegerField(default=0)),
+                ('commandes', models.PositiveIntegerField(default=0)),
+                ('artiste', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ventes_journalieres', to='galerie.artiste')),
+                ('categorie', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='ventes_journalieres', to='galerie.categorie')),
+            ],
+            options={
+                'verbose_name': 'Vente journalière',
+                'verbose_name_plural': 'Ventes journalières',
+                'db_table': 'vente_journaliere',
+                'ordering': ['-jour'],
+                'indexes': [models.Index(fields=['artiste', 'jour'], name='vente_jour_artiste_idx')],
+                'constraints': [models.UniqueConstraint(fields=('jour', 'artiste', 'categorie'), name='unique_vente_journaliere')],
+            },
+        ),
+    ]
@@ -0,0 +1,114 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:23
+
+from django.db import migrations, models
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def initialiser_compteurs(apps, schema_editor):
+    """Valeurs initiales ; ensuite tenues à jour par galerie.compteurs"""
+    Oeuvre = apps.get_model("galerie", "Oeuvre")
+    LigneCommande = apps.get_model("galerie", "LigneCommande")
+    montant = DecimalField(max_digits=12, decimal_places=2)
+    statuts = {
+        "nb_oeuvres_en_attente": "en_attente",
+        "nb_oeuvres_validees": "valide",
+        "nb_oeuvres_refusees": "refuse",
+    }
+    for modele, cle in (("Artiste", "artiste"), ("Categorie", "categorie")):
+        def agregat(queryset, expression, sortie):
+            return Coalesce(
+                Subquery(
+                    queryset.filter(**{cle: OuterRef("pk")})
+                    .order_by()
+                    .values(cle)
+                    .annotate(valeur=expression)
+                    .values("valeur"),
+                    output_field=sortie,
+                ),
+                Value(0),
+                output_field=sortie,
+            )
+
+        ventes = LigneCommande.objects.filter(commande__statut__in=["payee", "validee"])
+        ventes = ventes.annotate(**{cle: F(f"oeuvre__{cle}")})
+        apps.get_model("galerie", modele).objects.update(
+            nb_oeuvres=agregat(Oeuvre.objects, Count("pk"), IntegerField()),
+            **{
+                champ: agregat(Oeuvre.objects, Count("pk", filter=Q(statut=statut)), IntegerField())
+                for champ, statut in statuts.items()
+            },
+            unites_vendues=agregat(ventes, Sum("quantite"), IntegerField()),
+            chiffre_affaires=agregat(ventes, Sum(F("quantite") * F("prix_unitaire"), output_field=montant), montant),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0016_ventes_journalieres'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='artiste',
+            name='chiffre_affaires',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='artiste',
+            name='nb_oeuvres',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='artiste',
+            name='nb_oeuvres_en_attente',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='artiste',
+            name='nb_oeuvres_refusees',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='artiste',
+            name='nb_oeuvres_validees',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='artiste',
+            name='unites_vendues',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categorie',
+            name='chiffre_affaires',
+            field=models.DecimalField(db_index=True, decimal_places=2, default=0, editable=False, max_digits=12),
+        ),
+        migrations.AddField(
+            model_name='categorie',
+            name='nb_oeuvres',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categorie',
+            name='nb_oeuvres_en_attente',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categorie',
+            name='nb_oeuvres_refusees',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categorie',
+            name='nb_oeuvres_validees',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categorie',
+            name='unites_vendues',
+            field=models.PositiveIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(initialiser_compteurs, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,26 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:38
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0017_compteurs_denormalises'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='lieu',
+            name='ville',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='exposition',
+            index=models.Index(fields=['date_debut', 'date_fin'], name='expo_periode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exposition',
+            index=models.Index(fields=['lieu', 'date_debut', 'date_fin'], name='expo_lieu_periode_idx'),
+        ),
+    ]
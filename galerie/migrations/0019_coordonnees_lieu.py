@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-19 01:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0018_index_periode_expositions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lieu',
+            name='latitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='lieu',
+            name='longitude',
+            field=models.FloatField(blank=True, null=True),
+        ),
+    ]
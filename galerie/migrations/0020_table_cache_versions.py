@@ -0,0 +1,20 @@
+# Generated by Django 6.0.1 on 2026-10-19 02:10
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def creer_table_cache(apps, schema_editor):
+    """Table du cache "versions" (DatabaseCache) ; sans effet si CACHE_VERSIONS_URL le met sur Redis"""
+    call_command("createcachetable", database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('galerie', '0019_coordonnees_lieu'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_table_cache, migrations.RunPython.noop),
+    ]
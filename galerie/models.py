@@ -9,7 +9,6 @@ from django.contrib.auth.models import AbstractUser
 
 class Utilisateur(AbstractUser):
     """Modèle utilisateur avec 4 rôles : visiteur, artiste, curateur, super_admin"""
-    
 
     ROLES = [
         ("visiteur", "Visiteur"),
@@ -35,9 +34,30 @@ class Utilisateur(AbstractUser):
 # 2. MODÈLE ARTISTE
 # ============================================
 
-class Artiste(models.Model):
+class CompteursOeuvres(models.Model):
+    """
+    Compteurs dénormalisés (œuvres par statut, ventes) tenus à jour par
+    galerie.compteurs ; la commande reconcilier_compteurs les recalcule.
+    """
+
+    nb_oeuvres = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+    nb_oeuvres_en_attente = models.PositiveIntegerField(default=0, editable=False)
+    nb_oeuvres_validees = models.PositiveIntegerField(default=0, editable=False)
+    nb_oeuvres_refusees = models.PositiveIntegerField(default=0, editable=False)
+    unites_vendues = models.PositiveIntegerField(default=0, db_index=True, editable=False)
+    chiffre_affaires = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0, db_index=True, editable=False
+    )
+
+    class Meta:
+        abstract = True
+
+
+class Artiste(CompteursOeuvres):
     """Extension du profil Utilisateur pour les artistes"""
 
+    ESPACES_CACHE = ("artistes", "catalogue")
+
     user = models.OneToOneField(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -63,9 +83,11 @@ class Artiste(models.Model):
 # 3. MODÈLE CATÉGORIE (Type_oeuvre dans ton PDF)
 # ============================================
 
-class Categorie(models.Model):
+class Categorie(CompteursOeuvres):
     """Catégories d'œuvres (Peinture, Sculpture, Photographie, etc.)"""
 
+    ESPACES_CACHE = ("catalogue", "facettes")
+
     nom_categorie = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
 
@@ -85,6 +107,16 @@ class Categorie(models.Model):
 class Oeuvre(models.Model):
     """Œuvres d'art soumises par les artistes"""
 
+    # Espaces de cache versionnés (galerie.cache) : toute écriture change leur
+    # version, {champ} est remplacé par la valeur de l'instance
+    ESPACES_CACHE = ("catalogue", "facettes", "oeuvre:{pk}")
+    # ... sauf une sauvegarde partielle (update_fields) qui ne touche aucun de
+    # ces champs : stock décrémenté au passage en caisse, dates
+    CHAMPS_CACHE = {
+        "titre", "description", "image", "technique", "annee_creation", "prix", "statut",
+        "artiste", "artiste_id", "categorie", "categorie_id",
+    }
+
     class Statut(models.TextChoices):
         EN_ATTENTE = "en_attente", "En attente de validation"
         VALIDE = "valide", "Validée"
@@ -123,6 +155,10 @@ class Oeuvre(models.Model):
     date_soumission = models.DateTimeField(auto_now_add=True)
     date_validation = models.DateTimeField(null=True, blank=True)
 
+    # Analyse d'image (calculée à l'upload ou par la commande analyser_images)
+    phash = models.BigIntegerField(null=True, blank=True, editable=False)
+    couleurs = models.BinaryField(null=True, blank=True, editable=False)  # Lab int8, 3 couleurs
+
     class Meta:
         db_table = "oeuvre"
         verbose_name = "Œuvre"
@@ -132,6 +168,20 @@ class Oeuvre(models.Model):
     def __str__(self):
         return f"{self.titre} - {self.artiste}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # État chargé : les compteurs d'Artiste/Categorie ne suivent que les changements
+        instance._etat_compteurs = instance.etat_compteurs()
+        return instance
+
+    def etat_compteurs(self):
+        """(artiste_id, categorie_id, statut), None si un de ces champs n'est pas chargé"""
+        champs = ("artiste_id", "categorie_id", "statut")
+        if any(champ not in self.__dict__ for champ in champs):
+            return None
+        return tuple(self.__dict__[champ] for champ in champs)
+
     @property
     def est_disponible(self):
         """Vérifie si l'œuvre est disponible à la vente"""
@@ -159,10 +209,15 @@ class Oeuvre(models.Model):
 class Lieu(models.Model):
     """Lieux d'exposition (galeries, musées, etc.)"""
 
+    ESPACES_CACHE = ("expositions",)
+
     nom_lieu = models.CharField(max_length=150)
     adresse = models.TextField(blank=True)
-    ville = models.CharField(max_length=100)
+    ville = models.CharField(max_length=100, db_index=True)
     pays = models.CharField(max_length=100)
+    # Renseignées hors ligne depuis un gazetteer (commande geocoder_lieux)
+    latitude = models.FloatField(null=True, blank=True)
+    longitude = models.FloatField(null=True, blank=True)
 
     class Meta:
         db_table = "lieu"
@@ -177,9 +232,48 @@ class Lieu(models.Model):
 # 6. MODÈLE EXPOSITION
 # ============================================
 
+class ExpositionQuerySet(models.QuerySet):
+    """Statut calculé par la base, pour filtrer et trier sans charger les lignes"""
+
+    ETATS = {"a_venir": "à venir", "en_cours": "en cours", "terminee": "terminée"}
+
+    def avec_etat(self, jour=None):
+        from django.utils import timezone
+        jour = jour or timezone.localdate()
+        return self.annotate(etat=models.Case(
+            models.When(date_debut__gt=jour, then=models.Value("a_venir")),
+            models.When(date_fin__lt=jour, then=models.Value("terminee")),
+            default=models.Value("en_cours"),
+            output_field=models.CharField(max_length=10),
+        ))
+
+    def chevauchant(self, debut=None, fin=None):
+        """Expositions ouvertes au moins un jour dans [debut, fin] (bornes facultatives)"""
+        qs = self
+        if fin is not None:
+            qs = qs.filter(date_debut__lte=fin)
+        if debut is not None:
+            qs = qs.filter(date_fin__gte=debut)
+        return qs
+
+    def filtrer_etat(self, etat, jour=None):
+        """Filtre sur les colonnes de dates (indexables) plutôt que sur l'annotation"""
+        from django.utils import timezone
+        jour = jour or timezone.localdate()
+        if etat == "a_venir":
+            return self.filter(date_debut__gt=jour)
+        if etat == "en_cours":
+            return self.filter(date_debut__lte=jour, date_fin__gte=jour)
+        if etat == "terminee":
+            return self.filter(date_fin__lt=jour)
+        return self
+
+
 class Exposition(models.Model):
     """Expositions regroupant plusieurs œuvres"""
 
+    ESPACES_CACHE = ("expositions", "exposition:{pk}")
+
     nom_exposition = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     date_debut = models.DateField()
@@ -204,11 +298,18 @@ class Exposition(models.Model):
         blank=True,
     )
 
+    objects = ExpositionQuerySet.as_manager()
+
     class Meta:
         db_table = "exposition"
         verbose_name = "Exposition"
         verbose_name_plural = "Expositions"
         ordering = ["-date_debut"]
+        indexes = [
+            # Chevauchement de période : date_debut <= fin AND date_fin >= debut
+            models.Index(fields=["date_debut", "date_fin"], name="expo_periode_idx"),
+            models.Index(fields=["lieu", "date_debut", "date_fin"], name="expo_lieu_periode_idx"),
+        ]
 
     def __str__(self):
         return self.nom_exposition
@@ -222,6 +323,8 @@ class Exposition(models.Model):
     @property
     def statut(self):
         """Retourne le statut de l'exposition: 'à venir', 'en cours' ou 'terminée'"""
+        if "etat" in self.__dict__:  # annoté par ExpositionQuerySet.avec_etat()
+            return ExpositionQuerySet.ETATS[self.etat]
         from django.utils import timezone
         today = timezone.now().date()
         
@@ -250,6 +353,8 @@ class Commande(models.Model):
         ANNULEE = "annulee", "Annulée"
         VALIDEE = "validee", "Validée"
 
+    STATUTS_VENTE = (Statut.PAYEE, Statut.VALIDEE)  # commandes comptées comme ventes
+
     utilisateur = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
@@ -266,7 +371,8 @@ class Commande(models.Model):
         related_name="commandes_gerees",
     )
 
-    date_commande = models.DateTimeField(auto_now_add=True)
+    date_commande = models.DateTimeField(auto_now_add=True, db_index=True)
+    date_modification = models.DateTimeField(auto_now=True, db_index=True)  # filigrane des agrégats de ventes
     montant_total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)
     statut = models.CharField(max_length=20, choices=Statut.choices, default=Statut.EN_COURS)
     adresse_livraison = models.TextField(blank=True)
@@ -280,6 +386,18 @@ class Commande(models.Model):
     def __str__(self):
         return f"Commande #{self.id} - {self.utilisateur.username}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut différé : pas d'état connu, compter_vente laisse la commande à reconcilier_compteurs
+        if "statut" in field_names:
+            instance._statut_charge = instance.statut
+        return instance
+
+    @property
+    def est_vendue(self):
+        return self.statut in self.STATUTS_VENTE
+
 
 # ============================================
 # 8. MODÈLE LIGNE COMMANDE (association Commande-Oeuvre)
@@ -492,6 +610,8 @@ class Notification(models.Model):
 class Ticket(models.Model):
     """Tickets pour les expositions"""
     
+    ESPACES_CACHE = ("disponibilite", "exposition:{exposition_id}")
+
     class TypeTicket(models.TextChoices):
         GRATUIT = "gratuit", "Gratuit"
         STANDARD = "standard", "Standard (15€)"
@@ -575,4 +695,158 @@ class AchatTicket(models.Model):
         if not self.numero_confirmation:
             import uuid
             self.numero_confirmation = f"TICKET-{uuid.uuid4().hex[:8].upper()}"
-        super().save(*args, **kwargs)
\ No newline at end of file
+        super().save(*args, **kwargs)
+
+
+# ============================================
+# 12. MODÈLE FICHIER MÉDIA (stockage adressé par contenu)
+# ============================================
+
+class FichierMedia(models.Model):
+    """Fichier stocké sous son empreinte SHA-256, partagé entre plusieurs références"""
+
+    chemin = models.CharField(max_length=255, unique=True)
+    empreinte = models.CharField(max_length=64, db_index=True)
+    taille = models.PositiveBigIntegerField(default=0)
+    references = models.PositiveIntegerField(default=0)
+    date_creation = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = "fichier_media"
+        verbose_name = "Fichier média"
+        verbose_name_plural = "Fichiers médias"
+
+    def __str__(self):
+        return f"{self.chemin} ({self.references} réf.)"
+
+
+# ============================================
+# 13. MODÈLE ŒUVRE SIMILAIRE (recommandations précalculées)
+# ============================================
+
+class OeuvreSimilaire(models.Model):
+    """Top-k des œuvres les plus proches, calculé par la commande calculer_similarites"""
+
+    oeuvre = models.ForeignKey(
+        Oeuvre,
+        on_delete=models.CASCADE,
+        related_name="similaires",
+    )
+    similaire = models.ForeignKey(
+        Oeuvre,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    score = models.FloatField()
+    rang = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = "oeuvre_similaire"
+        verbose_name = "Œuvre similaire"
+        verbose_name_plural = "Œuvres similaires"
+        ordering = ["oeuvre_id", "rang"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["oeuvre", "rang"],
+                name="unique_oeuvre_similaire_rang",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.oeuvre_id} -> {self.similaire_id} ({self.score:.2f})"
+
+
+# ============================================
+# 14. MODÈLE ACHAT CONJOINT ("les collectionneurs ont aussi acheté")
+# ============================================
+
+class OeuvreAchatConjoint(models.Model):
+    """Top-N des œuvres achetées avec une œuvre, calculé par la commande calculer_achats_conjoints"""
+
+    oeuvre = models.ForeignKey(
+        Oeuvre,
+        on_delete=models.CASCADE,
+        related_name="achats_conjoints",
+    )
+    associee = models.ForeignKey(
+        Oeuvre,
+        on_delete=models.CASCADE,
+        related_name="+",
+    )
+    support = models.PositiveIntegerField()  # nombre de commandes contenant les deux œuvres
+    lift = models.FloatField()
+    rang = models.PositiveSmallIntegerField()
+
+    class Meta:
+        db_table = "oeuvre_achat_conjoint"
+        verbose_name = "Achat conjoint"
+        verbose_name_plural = "Achats conjoints"
+        ordering = ["oeuvre_id", "rang"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["oeuvre", "rang"],
+                name="unique_oeuvre_achat_conjoint_rang",
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.oeuvre_id} + {self.associee_id} (lift {self.lift:.2f})"
+
+
+# ============================================
+# 15. MODÈLE VENTE JOURNALIÈRE (agrégats de ventes)
+# ============================================
+
+class VenteJournaliere(models.Model):
+    """Ventes d'un jour pour un couple artiste × catégorie, maintenues par galerie.rollups"""
+
+    jour = models.DateField()
+    artiste = models.ForeignKey(
+        Artiste,
+        on_delete=models.CASCADE,
+        related_name="ventes_journalieres",
+    )
+    categorie = models.ForeignKey(
+        Categorie,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="ventes_journalieres",
+    )
+    chiffre_affaires = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    unites = models.PositiveIntegerField(default=0)
+    commandes = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        db_table = "vente_journaliere"
+        verbose_name = "Vente journalière"
+        verbose_name_plural = "Ventes journalières"
+        ordering = ["-jour"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["jour", "artiste", "categorie"],
+                name="unique_vente_journaliere",
+            )
+        ]
+        indexes = [
+            models.Index(fields=["artiste", "jour"], name="vente_jour_artiste_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.jour} - {self.artiste_id}/{self.categorie_id} : {self.chiffre_affaires} €"
+
+
+class EtatAgregat(models.Model):
+    """Filigrane d'un agrégat : commandes modifiées après cette date à reprendre"""
+
+    nom = models.CharField(max_length=50, unique=True)
+    filigrane = models.DateTimeField(null=True, blank=True)
+    date_maj = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        db_table = "etat_agregat"
+        verbose_name = "État d'agrégat"
+        verbose_name_plural = "États d'agrégats"
+
+    def __str__(self):
+        return f"{self.nom} ({self.filigrane})"
@@ -0,0 +1,86 @@
+"""
+Modération des œuvres en attente, à l'unité ou par lots (API oeuvres_moderation,
+action de l'admin Django).
+
+Un lot est traité dans une transaction et en un nombre fixe de requêtes, quelle
+que soit sa taille : lecture verrouillée des œuvres encore en attente, un
+UPDATE pour leur statut, un UPDATE sur les artistes et un sur les catégories
+pour les compteurs, un INSERT groupé pour les notifications (une par artiste).
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from . import compteurs, metriques
+from .cache import espaces_de, invalider
+from .indexes import couleurs
+from .models import Notification, Oeuvre
+
+
+DECISIONS = {
+    "valider": Oeuvre.Statut.VALIDE,
+    "refuser": Oeuvre.Statut.REFUSE,
+}
+MAX_LOT = 500
+TITRES_CITES = 10
+
+
+def _notification(utilisateur_id, decision, titres):
+    valide = decision == "valider"
+    cites = ", ".join(f"« {titre} »" for titre in titres[:TITRES_CITES])
+    if len(titres) > TITRES_CITES:
+        cites += f" et {len(titres) - TITRES_CITES} autre(s)"
+    if len(titres) == 1:
+        titre = "Œuvre validée" if valide else "Œuvre refusée"
+    else:
+        titre = f"{len(titres)} œuvres validées" if valide else f"{len(titres)} œuvres refusées"
+    if valide:
+        message = f"Votre soumission {cites} a été validée : elle est maintenant visible dans la galerie."
+    else:
+        message = f"Votre soumission {cites} n'a pas été retenue par les curateurs."
+    return Notification(
+        utilisateur_id=utilisateur_id,
+        titre=titre[:200],
+        message=message,
+        type_notif=Notification.Type.UPDATE if valide else Notification.Type.ALERTE,
+    )
+
+
+def moderer(ids, decision):
+    """
+    Valide ou refuse les œuvres `ids` encore en attente ; les autres (déjà
+    modérées, inexistantes) sont ignorées. Retourne les pk modérées.
+    """
+    statut = DECISIONS[decision]
+    with transaction.atomic():
+        oeuvres = list(
+            Oeuvre.objects.select_for_update(of=("self",))
+            .filter(pk__in=ids, statut=Oeuvre.Statut.EN_ATTENTE)
+            .order_by("pk")
+            .values("pk", "titre", "artiste_id", "categorie_id", "artiste__user_id", "couleurs")
+        )
+        if not oeuvres:
+            return []
+        pks = [oeuvre["pk"] for oeuvre in oeuvres]
+        Oeuvre.objects.filter(pk__in=pks).update(statut=statut, date_validation=timezone.now())
+        compteurs.statuts_modifies(
+            [(oeuvre["artiste_id"], oeuvre["categorie_id"]) for oeuvre in oeuvres],
+            Oeuvre.Statut.EN_ATTENTE,
+            statut,
+        )
+
+        titres = {}
+        for oeuvre in oeuvres:
+            titres.setdefault(oeuvre["artiste__user_id"], []).append(oeuvre["titre"])
+        Notification.objects.bulk_create([
+            _notification(utilisateur_id, decision, liste) for utilisateur_id, liste in titres.items()
+        ])
+        # QuerySet.update() n'envoie pas post_save : versions des espaces de cache changées ici
+        invalider(espace for pk in pks for espace in espaces_de(Oeuvre(pk=pk)))
+
+        if statut == Oeuvre.Statut.VALIDE:
+            # QuerySet.update() n'envoie pas post_save : index couleurs mis à jour ici
+            nouvelles = [(oeuvre["pk"], oeuvre["couleurs"]) for oeuvre in oeuvres if oeuvre["couleurs"] is not None]
+            transaction.on_commit(lambda: couleurs.ajouter_plusieurs(nouvelles))
+
+    metriques.incrementer("galerie_moderations_total", len(pks), decision=decision)
+    return pks
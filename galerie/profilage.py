@@ -0,0 +1,132 @@
+"""
+Profilage des requêtes (ProfilageMiddleware) et tampon circulaire sur disque.
+
+Chaque requête profilée produit deux fichiers dans PROFILAGE_DOSSIER :
+- <id>.folded : piles repliées ("a;b;c 1234", en µs), à passer tel quel à
+  flamegraph.pl ou speedscope ;
+- <id>.json   : métadonnées (vue, chemin, durée...) pour la page staff.
+
+Au-delà de PROFILAGE_MAX profils, les plus anciens sont supprimés.
+"""
+import json
+import re
+import time
+from collections import defaultdict
+from pathlib import Path
+
+from django.conf import settings
+
+
+SEUIL_US = 10  # branches de moins de 10 µs ignorées
+PROFONDEUR_MAX = 300
+NOM_VALIDE = re.compile(r"^\d+-[\w.-]+$")
+CARACTERES_INTERDITS = re.compile(r"[^\w.-]")
+
+
+def dossier():
+    chemin = Path(getattr(settings, "PROFILAGE_DOSSIER", Path(settings.BASE_DIR) / "profils"))
+    return chemin
+
+
+def _libelle(fonction):
+    fichier, ligne, nom = fonction
+    if fichier == "~":
+        libelle = nom
+    else:
+        if "site-packages/" in fichier:
+            fichier = fichier.split("site-packages/", 1)[1]
+        elif "/lib/python" in fichier:
+            fichier = fichier.split("/lib/python", 1)[1].partition("/")[2]
+        elif fichier.startswith(str(settings.BASE_DIR)):
+            fichier = fichier[len(str(settings.BASE_DIR)) + 1:]
+        libelle = f"{fichier}:{nom}"
+    return libelle.replace(";", ",").replace(" ", "_")
+
+
+def piles_repliees(stats):
+    """
+    pstats.Stats -> {"a;b;c": µs}.
+
+    cProfile ne garde que les arêtes appelant -> appelé : on redescend depuis
+    les racines en répartissant le temps de chaque fonction au prorata du
+    temps cumulé de chaque arête. C'est une approximation (comme flameprof),
+    exacte tant qu'une fonction coûte autant quel que soit son appelant.
+    """
+    entrees = stats.stats
+    appeles = defaultdict(dict)
+    for fonction, (_, _, _, _, appelants) in entrees.items():
+        for appelant, arete in appelants.items():
+            appeles[appelant][fonction] = arete[3]
+
+    piles = defaultdict(float)
+
+    def descendre(fonction, pile, vus, cumul):
+        _, _, propre, total, _ = entrees[fonction]
+        ratio = cumul / total if total else 0
+        piles[";".join(pile)] += propre * ratio
+        if len(pile) >= PROFONDEUR_MAX:
+            return
+        for appele, total_arete in appeles.get(fonction, {}).items():
+            part = total_arete * ratio
+            if appele in vus or part * 1e6 < SEUIL_US:
+                continue
+            descendre(appele, pile + [_libelle(appele)], vus | {appele}, part)
+
+    for racine, (_, _, _, total, appelants) in entrees.items():
+        if not appelants:
+            descendre(racine, [_libelle(racine)], {racine}, total)
+
+    return {pile: round(secondes * 1e6) for pile, secondes in piles.items() if secondes * 1e6 >= 1}
+
+
+def enregistrer(stats, vue, chemin, methode, statut, duree_ms, declencheur):
+    """Écrit un profil dans le tampon circulaire et retourne son identifiant"""
+    cible = dossier()
+    cible.mkdir(parents=True, exist_ok=True)
+    identifiant = f"{time.time_ns()}-{CARACTERES_INTERDITS.sub('_', vue)[:80]}"
+    piles = piles_repliees(stats)
+    (cible / f"{identifiant}.folded").write_text(
+        "".join(f"{pile} {us}\n" for pile, us in sorted(piles.items())),
+        encoding="utf-8",
+    )
+    (cible / f"{identifiant}.json").write_text(json.dumps({
+        "id": identifiant,
+        "vue": vue,
+        "chemin": chemin,
+        "methode": methode,
+        "statut": statut,
+        "duree_ms": round(duree_ms, 1),
+        "declencheur": declencheur,
+        "date": time.time(),
+        "nb_appels": stats.total_calls,
+    }), encoding="utf-8")
+    purger(cible)
+    return identifiant
+
+
+def purger(cible):
+    maximum = getattr(settings, "PROFILAGE_MAX", 200)
+    metas = sorted(cible.glob("*.json"))
+    for meta in metas[:max(0, len(metas) - maximum)]:
+        meta.unlink(missing_ok=True)
+        meta.with_suffix(".folded").unlink(missing_ok=True)
+
+
+def profils_lents(limite=50):
+    """Métadonnées des profils du tampon, du plus lent au plus rapide"""
+    profils = []
+    for meta in dossier().glob("*.json"):
+        try:
+            profils.append(json.loads(meta.read_text(encoding="utf-8")))
+        except (OSError, ValueError):
+            continue  # supprimé ou en cours d'écriture par un autre worker
+    profils.sort(key=lambda p: p["duree_ms"], reverse=True)
+    return profils[:limite]
+
+
+def chemin_piles(identifiant):
+    """Chemin du .folded d'un profil, ou None"""
+    if not NOM_VALIDE.match(identifiant):
+        return None
+    chemin = dossier() / f"{identifiant}.folded"
+    return chemin if chemin.exists() else None
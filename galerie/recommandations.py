@@ -0,0 +1,200 @@
+"""
+Moteurs de recommandation, calculés hors ligne par des commandes :
+
+- "œuvres similaires" (calculer_similarites) : vecteurs de caractéristiques
+  + top-k par similarité cosinus, par blocs de lignes ; la matrice n x n
+  n'est jamais matérialisée.
+- "les collectionneurs ont aussi acheté" (calculer_achats_conjoints) :
+  co-occurrences des œuvres dans les commandes, classées par lift.
+"""
+import zlib
+
+import numpy as np
+
+from .imaging import decoder_lab
+
+
+# Taille de chaque bloc du vecteur et poids relatif dans la similarité
+BLOCS = {
+    "categorie": (64, 1.0),
+    "technique": (64, 0.8),
+    "artiste": (128, 1.0),
+    "prix": (8, 0.6),
+    "couleur": (64, 1.0),
+}
+
+# Bandes de prix (log) : <100, 100-300, 300-1k, ... >100k
+BORNES_PRIX = np.array([100, 300, 1_000, 3_000, 10_000, 30_000, 100_000], dtype=np.float64)
+
+# Histogramme couleur : 4 x 4 x 4 cases sur (L, a, b), poids par rang de couleur dominante
+CASES_COULEUR = 4
+POIDS_RANGS = np.array([0.5, 0.3, 0.2], dtype=np.float32)
+
+
+def _decalages():
+    decalages, debut = {}, 0
+    for nom, (taille, _) in BLOCS.items():
+        decalages[nom] = debut
+        debut += taille
+    return decalages, debut
+
+
+DECALAGES, DIMENSION = _decalages()
+
+
+def _hacher(texte, taille):
+    return zlib.crc32(texte.encode("utf-8")) % taille
+
+
+def case_couleur(lab):
+    """Indices de case (n,) pour des couleurs Lab (n, 3)"""
+    l = np.clip(lab[:, 0] / 100 * CASES_COULEUR, 0, CASES_COULEUR - 1).astype(int)
+    a = np.clip((lab[:, 1] + 64) / 128 * CASES_COULEUR, 0, CASES_COULEUR - 1).astype(int)
+    b = np.clip((lab[:, 2] + 64) / 128 * CASES_COULEUR, 0, CASES_COULEUR - 1).astype(int)
+    return (l * CASES_COULEUR + a) * CASES_COULEUR + b
+
+
+def vecteurs(oeuvres):
+    """
+    oeuvres : liste de tuples (pk, categorie_id, technique, artiste_id, prix, couleurs)
+    Retourne une matrice float32 (n, DIMENSION) aux lignes normalisées (L2).
+    """
+    n = len(oeuvres)
+    x = np.zeros((n, DIMENSION), dtype=np.float32)
+    lignes = np.arange(n)
+    if not n:
+        return x
+
+    _, categories, techniques, artistes, prix, couleurs = zip(*oeuvres)
+
+    taille, poids = BLOCS["categorie"]
+    avec = np.array([c is not None for c in categories])
+    idx = np.array([(c or 0) % taille for c in categories])
+    x[lignes[avec], DECALAGES["categorie"] + idx[avec]] = poids
+
+    taille, poids = BLOCS["technique"]
+    normalisees = [(t or "").strip().lower() for t in techniques]
+    avec = np.array([bool(t) for t in normalisees])
+    idx = np.array([_hacher(t, taille) for t in normalisees])
+    x[lignes[avec], DECALAGES["technique"] + idx[avec]] = poids
+
+    taille, poids = BLOCS["artiste"]
+    idx = np.array(artistes) % taille
+    x[lignes, DECALAGES["artiste"] + idx] = poids
+
+    taille, poids = BLOCS["prix"]
+    bandes = np.digitize(np.array(prix, dtype=np.float64), BORNES_PRIX)
+    x[lignes, DECALAGES["prix"] + bandes] = poids
+    # Bandes voisines à moitié : 900€ reste proche de 1100€
+    voisines = DECALAGES["prix"] + np.clip(bandes - 1, 0, taille - 1)
+    np.maximum.at(x, (lignes, voisines), poids / 2)
+    voisines = DECALAGES["prix"] + np.clip(bandes + 1, 0, taille - 1)
+    np.maximum.at(x, (lignes, voisines), poids / 2)
+
+    taille, poids = BLOCS["couleur"]
+    avec = np.array([c is not None for c in couleurs])
+    if avec.any():
+        lab = decoder_lab(b"".join(bytes(c) for c in couleurs if c is not None))
+        rangs = len(lab) // int(avec.sum())
+        cases = case_couleur(lab).reshape(-1, rangs)
+        histogrammes = np.zeros((len(cases), taille), dtype=np.float32)
+        np.add.at(histogrammes, (np.arange(len(cases))[:, np.newaxis], cases), POIDS_RANGS[:rangs])
+        histogrammes /= np.linalg.norm(histogrammes, axis=1, keepdims=True)
+        x[lignes[avec], DECALAGES["couleur"]:DECALAGES["couleur"] + taille] = histogrammes * poids
+
+    normes = np.linalg.norm(x, axis=1, keepdims=True)
+    normes[normes == 0] = 1
+    return x / normes
+
+
+def top_k(x, lignes, k, taille_lot=256):
+    """
+    Pour chaque indice de `lignes`, les k voisins les plus proches dans `x`
+    (lui-même exclu). Génère (ligne, indices (k,), scores (k,)) lot par lot.
+    """
+    k = min(k, len(x) - 1)
+    if k <= 0:
+        return
+    for debut in range(0, len(lignes), taille_lot):
+        lot = np.asarray(lignes[debut:debut + taille_lot])
+        scores = x[lot] @ x.T  # (lot, n)
+        scores[np.arange(len(lot)), lot] = -np.inf
+        meilleurs = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        tries = np.take_along_axis(scores, meilleurs, axis=1)
+        ordre = np.argsort(-tries, axis=1, kind="stable")
+        meilleurs = np.take_along_axis(meilleurs, ordre, axis=1)
+        tries = np.take_along_axis(tries, ordre, axis=1)
+        for i, ligne in enumerate(lot):
+            yield int(ligne), meilleurs[i], tries[i]
+
+
+# ======================
+# Achats conjoints (co-occurrences dans les commandes)
+# ======================
+class CompteurPaires:
+    """
+    Compte les paires d'œuvres achetées ensemble, panier par panier.
+
+    Les paires d'un lot sont encodées en un int64 (a << 32 | b, a < b), réduites
+    avec np.unique puis fusionnées dans les tableaux triés déjà accumulés :
+    la mémoire dépend du nombre de paires distinctes, pas du nombre de lignes.
+    """
+
+    def __init__(self, max_panier=50):
+        self.max_panier = max_panier
+        self.nb_paniers = 0
+        self.cles = np.empty(0, dtype=np.int64)
+        self.effectifs = np.empty(0, dtype=np.int64)
+        self.articles = {}
+        self._lot = []
+
+    def ajouter_panier(self, oeuvres):
+        self.nb_paniers += 1
+        for pk in oeuvres:
+            self.articles[pk] = self.articles.get(pk, 0) + 1
+        if 2 <= len(oeuvres) <= self.max_panier:
+            self._lot.append(np.sort(np.asarray(oeuvres, dtype=np.int64)))
+
+    def vider_lot(self):
+        if not self._lot:
+            return
+        morceaux = []
+        for panier in self._lot:
+            i, j = np.triu_indices(len(panier), 1)
+            morceaux.append((panier[i] << 32) | panier[j])
+        self._lot = []
+        cles, effectifs = np.unique(np.concatenate(morceaux), return_counts=True)
+        toutes = np.concatenate([self.cles, cles])
+        self.cles, inverse = np.unique(toutes, return_inverse=True)
+        self.effectifs = np.bincount(
+            inverse,
+            weights=np.concatenate([self.effectifs, effectifs]),
+        ).astype(np.int64)
+
+    def meilleures_paires(self, top_n, support_min=2):
+        """
+        Retourne (oeuvres, associees, supports, lifts, rangs) : pour chaque œuvre,
+        ses top_n associées par lift décroissant.
+        lift = P(a et b) / (P(a) P(b)) = n_ab * N / (n_a * n_b)
+        """
+        self.vider_lot()
+        garder = self.effectifs >= support_min
+        cles, supports = self.cles[garder], self.effectifs[garder]
+        a, b = cles >> 32, cles & 0xFFFFFFFF
+
+        n_a = np.array([self.articles[int(pk)] for pk in a], dtype=np.float64)
+        n_b = np.array([self.articles[int(pk)] for pk in b], dtype=np.float64)
+        lifts = supports * self.nb_paniers / (n_a * n_b)
+
+        # Chaque paire compte dans les deux sens
+        sources = np.concatenate([a, b])
+        cibles = np.concatenate([b, a])
+        supports = np.concatenate([supports, supports])
+        lifts = np.concatenate([lifts, lifts])
+
+        ordre = np.lexsort((-supports, -lifts, sources))
+        sources, cibles, supports, lifts = sources[ordre], cibles[ordre], supports[ordre], lifts[ordre]
+        debuts = np.flatnonzero(np.r_[True, sources[1:] != sources[:-1]])
+        rangs = np.arange(len(sources)) - np.repeat(debuts, np.diff(np.r_[debuts, len(sources)]))
+        garder = rangs < top_n
+        return sources[garder], cibles[garder], supports[garder], lifts[garder], rangs[garder] + 1
@@ -0,0 +1,145 @@
+"""
+Agrégats de ventes par jour × artiste × catégorie (table vente_journaliere).
+
+Un jour d'agrégat est toujours recalculé en entier depuis les lignes de
+commande : l'opération est idempotente, une commande annulée ou modifiée
+après coup est donc simplement reprise. mettre_a_jour() ne reprend que les
+jours des commandes modifiées depuis le filigrane (Commande.date_modification,
+que les récepteurs de LigneCommande touchent aussi) ; reconstruire() recalcule
+tout l'historique (ou depuis une date).
+
+Seules les commandes payées ou validées sont des ventes ; le jour d'une vente
+est celui de date_commande dans le fuseau courant.
+"""
+from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, ExpressionWrapper, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import Commande, EtatAgregat, LigneCommande, VenteJournaliere
+
+
+NOM = "ventes_journalieres"
+# Les transactions encore ouvertes au moment du passage peuvent valider des
+# date_modification un peu antérieures au filigrane : on repasse sur cette marge
+CHEVAUCHEMENT = timedelta(minutes=5)
+JOURS_PAR_LOT = 31
+
+
+def _bornes(jour):
+    debut = timezone.make_aware(datetime.combine(jour, time.min))
+    return debut, debut + timedelta(days=1)
+
+
+def recalculer_jours(jours):
+    """Recalcule les agrégats des jours donnés ; retourne (jours, lignes écrites)"""
+    jours = sorted(set(jours))
+    ecrites = 0
+    for depart in range(0, len(jours), JOURS_PAR_LOT):
+        lot = jours[depart:depart + JOURS_PAR_LOT]
+        periodes = Q()
+        for jour in lot:
+            debut, fin = _bornes(jour)
+            periodes |= Q(commande__date_commande__gte=debut, commande__date_commande__lt=fin)
+        lignes = (
+            LigneCommande.objects
+            .filter(periodes, commande__statut__in=Commande.STATUTS_VENTE)
+            .annotate(jour=TruncDate("commande__date_commande"))
+            .values("jour", "oeuvre__artiste_id", "oeuvre__categorie_id")
+            .annotate(
+                chiffre_affaires=Sum(ExpressionWrapper(
+                    F("quantite") * F("prix_unitaire"),
+                    output_field=DecimalField(max_digits=12, decimal_places=2),
+                )),
+                unites=Sum("quantite"),
+                commandes=Count("commande_id", distinct=True),
+            )
+            .order_by()
+        )
+        with transaction.atomic():
+            VenteJournaliere.objects.filter(jour__in=lot).delete()
+            ventes = VenteJournaliere.objects.bulk_create([
+                VenteJournaliere(
+                    jour=ligne["jour"],
+                    artiste_id=ligne["oeuvre__artiste_id"],
+                    categorie_id=ligne["oeuvre__categorie_id"],
+                    chiffre_affaires=ligne["chiffre_affaires"],
+                    unites=ligne["unites"],
+                    commandes=ligne["commandes"],
+                )
+                for ligne in lignes
+            ])
+        ecrites += len(ventes)
+    return len(jours), ecrites
+
+
+def _jours(commandes):
+    return set(
+        commandes.order_by()
+        .annotate(jour=TruncDate("date_commande"))
+        .values_list("jour", flat=True)
+        .distinct()
+    )
+
+
+def mettre_a_jour():
+    """Reprend les jours des commandes modifiées depuis le dernier passage"""
+    etat, _ = EtatAgregat.objects.get_or_create(nom=NOM)
+    if etat.filigrane is None:
+        return reconstruire()
+    debut = timezone.now()
+    jours = _jours(Commande.objects.filter(date_modification__gt=etat.filigrane - CHEVAUCHEMENT))
+    resultat = recalculer_jours(jours)
+    etat.filigrane = debut
+    etat.save(update_fields=["filigrane", "date_maj"])
+    return resultat
+
+
+def reconstruire(depuis=None):
+    """Recalcule tout l'historique (ou à partir de la date depuis)"""
+    debut = timezone.now()
+    commandes = Commande.objects.all()
+    obsoletes = VenteJournaliere.objects.all()
+    if depuis is not None:
+        commandes = commandes.filter(date_commande__gte=_bornes(depuis)[0])
+        obsoletes = obsoletes.filter(jour__gte=depuis)
+    jours = _jours(commandes)
+    # Jours qui n'ont plus aucune commande (suppressions) : agrégats à retirer
+    obsoletes.exclude(jour__in=jours).delete()
+    resultat = recalculer_jours(jours)
+    if depuis is None:
+        EtatAgregat.objects.update_or_create(nom=NOM, defaults={"filigrane": debut})
+    return resultat
+
+
+def filigrane():
+    return EtatAgregat.objects.filter(nom=NOM).values_list("filigrane", flat=True).first()
+
+
+def serie_journaliere(jours=30, **filtres):
+    """[{"jour", "chiffre_affaires", "unites"}] des derniers jours, jours vides compris"""
+    fin = timezone.localdate()
+    debut = fin - timedelta(days=jours - 1)
+    totaux = {
+        ligne["jour"]: ligne
+        for ligne in VenteJournaliere.objects
+        .filter(jour__gte=debut, **filtres)
+        .values("jour")
+        .annotate(
+            chiffre_affaires=Sum("chiffre_affaires"),
+            unites=Sum("unites"),
+        )
+        .order_by()
+    }
+    serie = []
+    for decalage in range(jours):
+        jour = debut + timedelta(days=decalage)
+        ligne = totaux.get(jour, {})
+        serie.append({
+            "jour": jour.isoformat(),
+            "chiffre_affaires": float(ligne.get("chiffre_affaires") or 0),
+            "unites": ligne.get("unites") or 0,
+        })
+    return serie
@@ -0,0 +1,341 @@
+from contextlib import contextmanager
+
+from django.apps import apps
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import m2m_changed, pre_save, post_save, pre_delete, post_delete
+from django.utils import timezone
+
+from . import compteurs, metriques
+from .cache import espaces_de, invalider
+from .chronometrage import SESSION_STAFF
+from .imaging import analyser_image
+from .indexes import couleurs, empreintes, lieux
+from .models import Oeuvre, Artiste, Exposition, AchatTicket, Commande, LigneCommande, Lieu
+
+
+# Tous les récepteurs de la galerie, pour signaux_suspendus()
+RECEPTEURS = []
+
+
+def recepteur(signal, sender=None):
+    """Comme @receiver, et inscrit le récepteur dans RECEPTEURS : aucun ne peut y être oublié"""
+    def decorateur(fonction):
+        signal.connect(fonction, sender=sender)
+        RECEPTEURS.append((signal, fonction, sender))
+        return fonction
+    return decorateur
+
+
+# Champs fichiers dont le stockage tient le compte des références
+CHAMPS_FICHIERS = {
+    Oeuvre: "image",
+    Artiste: "photo_profil",
+    Exposition: "affiche",
+}
+
+
+def liberer_fichier(fichier_champ, nom):
+    """Retire la référence au fichier une fois la transaction validée"""
+    if nom:
+        storage = fichier_champ.storage
+        transaction.on_commit(lambda: storage.delete(nom))
+
+
+@recepteur(pre_save)
+def memoriser_fichier_precedent(sender, instance, update_fields=None, **kwargs):
+    champ = CHAMPS_FICHIERS.get(sender)
+    if champ is None or instance.pk is None:
+        return
+    if update_fields is not None and champ not in update_fields:
+        return
+    instance._fichier_precedent = (
+        sender.objects.filter(pk=instance.pk).values_list(champ, flat=True).first()
+    )
+    # Nouveau contenu à enregistrer : le stockage ajoutera une référence, même
+    # s'il retombe sur le même nom (contenu identique)
+    fichier = getattr(instance, champ)
+    instance._fichier_televerse = bool(fichier) and not fichier._committed
+
+
+@recepteur(post_save)
+def liberer_fichier_remplace(sender, instance, created=False, **kwargs):
+    champ = CHAMPS_FICHIERS.get(sender)
+    if champ is None:
+        return
+    if not created and "_fichier_precedent" not in instance.__dict__:
+        return  # le champ fichier n'a pas été sauvegardé (update_fields)
+    precedent = instance.__dict__.pop("_fichier_precedent", None)
+    televerse = instance.__dict__.pop("_fichier_televerse", False)
+    fichier = getattr(instance, champ)
+    if precedent == fichier.name and not televerse:
+        return
+    if precedent:
+        # Remplacé, ou re-téléversé à l'identique : la référence en plus
+        # posée par le stockage compense celle qu'on retire ici
+        liberer_fichier(fichier, precedent)
+    if sender is Oeuvre and fichier.name and precedent != fichier.name:
+        analyser_oeuvre(instance)
+
+
+@recepteur(post_delete)
+def liberer_fichier_supprime(sender, instance, **kwargs):
+    champ = CHAMPS_FICHIERS.get(sender)
+    if champ is None:
+        return
+    fichier = getattr(instance, champ)
+    liberer_fichier(fichier, fichier.name)
+
+
+# ======================
+# Analyse d'image des œuvres
+# ======================
+def analyser_oeuvre(oeuvre):
+    """Calcule l'empreinte perceptuelle de la nouvelle image et met l'index à jour"""
+    from PIL import Image
+
+    try:
+        with oeuvre.image.open("rb") as fichier, Image.open(fichier) as image:
+            resultats = analyser_image(image)
+    except (OSError, ValueError):
+        return
+    Oeuvre.objects.filter(pk=oeuvre.pk).update(**resultats)
+    for champ, valeur in resultats.items():
+        setattr(oeuvre, champ, valeur)
+    pk, phash = oeuvre.pk, oeuvre.phash
+    transaction.on_commit(lambda: empreintes.ajouter(pk, phash))
+
+
+# Les index en mémoire ne suivent que les écritures validées : une transaction
+# annulée n'y laisse pas d'entrée fantôme (valeurs copiées pour on_commit)
+@recepteur(post_delete, sender=Oeuvre)
+def retirer_oeuvre_des_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: (empreintes.retirer(pk), couleurs.retirer(pk)))
+
+
+@recepteur(post_save, sender=Oeuvre)
+def synchroniser_index_couleurs(sender, instance, update_fields=None, **kwargs):
+    """Seules les œuvres validées sont cherchables par couleur"""
+    if update_fields is not None and not {"statut", "couleurs"} & set(update_fields):
+        return  # stock au passage en caisse... : pas de copie de l'index
+    pk, valeur = instance.pk, instance.couleurs
+    if instance.statut != Oeuvre.Statut.VALIDE:
+        transaction.on_commit(lambda: couleurs.retirer(pk))
+    elif valeur is not None:
+        transaction.on_commit(lambda: couleurs.ajouter(pk, valeur))
+
+
+@recepteur(post_save, sender=Lieu)
+def synchroniser_index_lieux(sender, instance, update_fields=None, **kwargs):
+    """Seuls les lieux géocodés sont dans l'index de proximité"""
+    if update_fields is not None and not {"latitude", "longitude"} & set(update_fields):
+        return
+    pk, position = instance.pk, (instance.latitude, instance.longitude)
+    if None in position:
+        transaction.on_commit(lambda: lieux.retirer(pk))
+    else:
+        transaction.on_commit(lambda: lieux.ajouter(pk, position))
+
+
+@recepteur(post_delete, sender=Lieu)
+def retirer_lieu_de_l_index(sender, instance, **kwargs):
+    pk = instance.pk
+    transaction.on_commit(lambda: lieux.retirer(pk))
+
+
+# ======================
+# Métriques
+# ======================
+@recepteur(post_save, sender=AchatTicket)
+def compter_ticket_vendu(sender, instance, created=False, **kwargs):
+    if created:
+        metriques.incrementer(
+            "galerie_tickets_vendus_total", instance.quantite, type_ticket=instance.ticket.type_ticket
+        )
+
+
+# ======================
+# Compteurs dénormalisés (Artiste, Categorie)
+# ======================
+CHAMPS_COMPTES = {"statut", "artiste", "artiste_id", "categorie", "categorie_id"}
+
+
+@recepteur(post_save, sender=Oeuvre)
+def compter_oeuvre(sender, instance, created=False, update_fields=None, **kwargs):
+    if update_fields is not None and not CHAMPS_COMPTES & set(update_fields):
+        return
+    avant = None if created else instance.__dict__.get("_etat_compteurs")
+    if not created and avant is None:
+        return  # état chargé inconnu (champs différés...) : laissé à reconcilier_compteurs
+    apres = instance.etat_compteurs()
+    compteurs.oeuvre_modifiee(avant, apres)
+    instance._etat_compteurs = apres
+
+
+@recepteur(pre_delete, sender=Oeuvre)
+def decompter_oeuvre(sender, instance, **kwargs):
+    """Avant la suppression : les lignes de commande de l'œuvre vont partir en cascade"""
+    compteurs.oeuvre_modifiee(instance.__dict__.get("_etat_compteurs") or instance.etat_compteurs(), None)
+    compteurs.ventes_modifiees(
+        LigneCommande.objects.filter(oeuvre_id=instance.pk, commande__statut__in=Commande.STATUTS_VENTE), -1
+    )
+
+
+@recepteur(post_save, sender=Commande)
+def compter_vente(sender, instance, created=False, update_fields=None, **kwargs):
+    if update_fields is not None and "statut" not in update_fields:
+        return
+    if not created and "_statut_charge" not in instance.__dict__:
+        return
+    avant = not created and instance._statut_charge in Commande.STATUTS_VENTE
+    if avant != instance.est_vendue:
+        compteurs.commande_vendue(instance, 1 if instance.est_vendue else -1)
+    instance._statut_charge = instance.statut
+
+
+@recepteur(post_save, sender=LigneCommande)
+def compter_ligne_vendue(sender, instance, created=False, **kwargs):
+    """Ligne ajoutée à une commande déjà payée (commande créée payée, admin)"""
+    if created and instance.commande.est_vendue:
+        compteurs.ventes_modifiees(LigneCommande.objects.filter(pk=instance.pk), 1)
+
+
+@recepteur(pre_delete, sender=Commande)
+def decompter_vente(sender, instance, **kwargs):
+    if instance.__dict__.get("_statut_charge", instance.statut) in Commande.STATUTS_VENTE:
+        compteurs.commande_vendue(instance, -1)
+
+
+# ======================
+# Agrégats de ventes
+# ======================
+@recepteur(post_delete, sender=Commande)
+def retirer_commande_des_agregats(sender, instance, **kwargs):
+    """Une commande supprimée n'a plus de date_modification à suivre : on reprend son jour tout de suite"""
+    if not instance.est_vendue:
+        return
+    from .rollups import recalculer_jours
+
+    jour = timezone.localdate(instance.date_commande)
+    transaction.on_commit(lambda: recalculer_jours([jour]))
+
+
+@recepteur(post_save, sender=LigneCommande)
+@recepteur(post_delete, sender=LigneCommande)
+def toucher_commande_de_la_ligne(sender, instance, created=False, origin=None, **kwargs):
+    """
+    Le filigrane ne suit que Commande.date_modification : une ligne ajoutée,
+    modifiée ou retirée après coup (admin...) touche sa commande vendue.
+    """
+    if isinstance(origin, Commande):
+        return  # suppression de la commande elle-même : retirer_commande_des_agregats
+    if created and not instance.commande.est_vendue:
+        return  # passage au panier : la commande sera touchée en devenant vendue
+    Commande.objects.filter(pk=instance.commande_id, statut__in=Commande.STATUTS_VENTE).update(
+        date_modification=timezone.now()
+    )
+
+
+# ======================
+# Espaces de cache versionnés (galerie.cache)
+# ======================
+def invalider_espaces_modele(sender, instance, update_fields=None, **kwargs):
+    """
+    Toute écriture d'un modèle qui déclare ESPACES_CACHE change la version de
+    ses espaces, sauf une sauvegarde partielle hors de ses CHAMPS_CACHE
+    """
+    champs = getattr(sender, "CHAMPS_CACHE", None)
+    if update_fields is not None and champs is not None and not champs & set(update_fields):
+        return
+    invalider(espaces_de(instance))
+
+
+MODELES_VERSIONNES = [
+    modele for modele in apps.get_app_config("galerie").get_models()
+    if getattr(modele, "ESPACES_CACHE", None)
+]
+for modele in MODELES_VERSIONNES:
+    recepteur(post_save, sender=modele)(invalider_espaces_modele)
+    recepteur(post_delete, sender=modele)(invalider_espaces_modele)
+
+
+@recepteur(m2m_changed, sender=Exposition.oeuvres.through)
+def invalider_oeuvres_exposees(sender, instance, action, reverse, model, pk_set=None, **kwargs):
+    """Les deux côtés de la relation : l'exposition et ses œuvres"""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if action == "pre_clear":
+        liees = instance.expositions if reverse else instance.oeuvres
+        pk_set = liees.values_list("pk", flat=True)
+    espaces = espaces_de(instance)
+    for pk in pk_set or ():
+        espaces += espaces_de(model(pk=pk))
+    invalider(espaces)
+
+
+# La page d'une exposition affiche aussi des champs de ses œuvres, de leurs
+# artistes et du lieu : leurs écritures changent la version "exposition:<pk>"
+CHAMPS_AFFICHES_OEUVRE = {"titre", "image", "prix", "artiste", "artiste_id"}
+
+
+def expositions_de_l_oeuvre(pk):
+    return Exposition.oeuvres.through.objects.filter(oeuvre_id=pk).values_list("exposition_id", flat=True)
+
+
+def invalider_pages_expositions(pks):
+    invalider(f"exposition:{pk}" for pk in pks)
+
+
+@recepteur(post_save, sender=Oeuvre)
+def invalider_expositions_de_l_oeuvre(sender, instance, created=False, update_fields=None, **kwargs):
+    if created or (update_fields is not None and not CHAMPS_AFFICHES_OEUVRE & set(update_fields)):
+        return  # une œuvre neuve n'est encore dans aucune exposition
+    invalider_pages_expositions(expositions_de_l_oeuvre(instance.pk))
+
+
+@recepteur(pre_delete, sender=Oeuvre)
+def invalider_expositions_de_l_oeuvre_supprimee(sender, instance, **kwargs):
+    invalider_pages_expositions(list(expositions_de_l_oeuvre(instance.pk)))
+
+
+@recepteur(post_save, sender=Artiste)
+def invalider_expositions_de_l_artiste(sender, instance, created=False, **kwargs):
+    if not created:
+        invalider_pages_expositions(
+            Exposition.oeuvres.through.objects.filter(oeuvre__artiste_id=instance.pk)
+            .values_list("exposition_id", flat=True).distinct()
+        )
+
+
+@recepteur(post_save, sender=Lieu)
+def invalider_expositions_du_lieu(sender, instance, created=False, **kwargs):
+    if not created:
+        invalider_pages_expositions(instance.expositions.values_list("pk", flat=True))
+
+
+# ======================
+# En-tête Server-Timing réservé au staff (middleware.ServerTimingMiddleware)
+# ======================
+@recepteur(user_logged_in)
+def memoriser_staff(sender, request, user, **kwargs):
+    """Le middleware lit le statut dans la session : pas de requête utilisateur en plus"""
+    request.session[SESSION_STAFF] = user.is_staff
+
+
+# ======================
+# Suspension (chargements en masse)
+# ======================
+@contextmanager
+def signaux_suspendus():
+    """
+    Déconnecte les récepteurs de la galerie le temps d'un chargement en masse
+    (les compteurs dénormalisés sont à réconcilier ensuite)
+    """
+    for signal, fonction, sender in RECEPTEURS:
+        signal.disconnect(fonction, sender=sender)
+    try:
+        yield
+    finally:
+        for signal, fonction, sender in RECEPTEURS:
+            signal.connect(fonction, sender=sender)
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import re
+
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+from django.views.static import serve
+
+
+# Un chemin adressé par contenu ne change jamais : on peut le mettre en cache "pour toujours"
+CACHE_IMMUABLE = "public, max-age=31536000, immutable"
+
+CHEMIN_EMPREINTE = re.compile(r"(^|/)[0-9a-f]{2}/[0-9a-f]{64}(\.[\w]+)?$")
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """
+    Stockage qui nomme chaque fichier d'après le SHA-256 de son contenu.
+
+    - deux uploads identiques pointent vers le même fichier (pas de doublon disque)
+    - chaque sauvegarde ajoute une référence dans FichierMedia
+    - delete() retire une référence et ne supprime le fichier qu'à la dernière
+    """
+
+    taille_bloc = 64 * 1024
+
+    def empreinte(self, content):
+        sha = hashlib.sha256()
+        for bloc in content.chunks(self.taille_bloc):
+            sha.update(bloc)
+        if hasattr(content, "seek"):
+            content.seek(0)
+        return sha.hexdigest()
+
+    def chemin_pour(self, name, empreinte):
+        """oeuvres/photo.JPG -> oeuvres/ab/ab12...ef.jpg"""
+        dossier = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(dossier, empreinte[:2], f"{empreinte}{extension}").replace("\\", "/")
+
+    def _save(self, name, content):
+        from .models import FichierMedia
+
+        empreinte = self.empreinte(content)
+        name = self.chemin_pour(name, empreinte)
+
+        if not self.exists(name):
+            name = super()._save(name, content)
+
+        with transaction.atomic():
+            fichier, created = FichierMedia.objects.get_or_create(
+                chemin=name,
+                defaults={
+                    "empreinte": empreinte,
+                    "taille": content.size or 0,
+                    "references": 1,
+                },
+            )
+            if not created:
+                FichierMedia.objects.filter(pk=fichier.pk).update(references=F("references") + 1)
+        return name
+
+    def delete(self, name):
+        """Retire une référence ; le fichier n'est effacé que s'il n'est plus utilisé"""
+        from .models import FichierMedia
+
+        if not name:
+            return
+
+        with transaction.atomic():
+            fichier = FichierMedia.objects.select_for_update().filter(chemin=name).first()
+            if fichier is None:
+                # Fichier antérieur au stockage par empreinte : on ne connaît pas ses
+                # références, on le laisse en place.
+                return
+            if fichier.references > 1:
+                FichierMedia.objects.filter(pk=fichier.pk).update(references=F("references") - 1)
+                return
+            fichier.delete()
+
+        super().delete(name)
+
+
+def media_serve(request, path, document_root=None, show_indexes=False):
+    """Sert MEDIA_ROOT (mode DEBUG) avec un cache immuable pour les chemins adressés par contenu"""
+    response = serve(request, path, document_root=document_root, show_indexes=show_indexes)
+    if response.status_code == 200 and CHEMIN_EMPREINTE.search(path):
+        response["Cache-Control"] = CACHE_IMMUABLE
+    return response
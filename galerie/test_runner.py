@@ -0,0 +1,28 @@
+"""
+Lanceur de tests (TEST_RUNNER) : les fichiers écrits par les middlewares
+d'instrumentation vont dans un dossier temporaire, supprimé à la fin, et
+jamais dans le dépôt.
+"""
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class GalerieTestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.dossier = Path(tempfile.mkdtemp(prefix="galerie-tests-"))
+        self.reglages = override_settings(
+            PROFILAGE_DOSSIER=self.dossier / "profils",
+            SQL_STATS_DOSSIER=self.dossier / "sql_stats",
+            METRIQUES_DOSSIER=self.dossier / "metriques",
+        )
+        self.reglages.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self.reglages.disable()
+        shutil.rmtree(self.dossier, ignore_errors=True)
+        super().teardown_test_environment(**kwargs)
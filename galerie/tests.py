@@ -1,3 +1,925 @@
-from django.test import TestCase
+import gc
+import io
+import json
+import os
+import shutil
+import tempfile
+import time
+import weakref
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.contrib.auth.models import update_last_login
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.template import Context, Template
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from PIL import Image
+
+from . import compteurs, instrumentation, moderation, rollups, views
+from . import signals as galerie_signals
+from . import urls as galerie_urls
+from .cache import cle_versionnee, stock_versions, versions
+from .imaging import (
+    couleurs_dominantes,
+    decoder_lab,
+    degrade,
+    dhash,
+    encoder_lab,
+    kmeans,
+    rgb_vers_lab,
+    vers_non_signe,
+    vers_signe,
+)
+from .indexes import DISTANCE_DOUBLON, IndexEmpreintes, IndexLieux, couleurs, lieux
+from .instrumentation import collecte_sql
+from .recommandations import CompteurPaires
+from .models import (
+    FichierMedia,
+    Utilisateur,
+    Artiste,
+    Categorie,
+    Oeuvre,
+    Lieu,
+    Exposition,
+    Commande,
+    LigneCommande,
+    Paiement,
+    Panier,
+    PanierItem,
+    Notification,
+    Ticket,
+    VenteJournaliere,
+)
+
+
+# ============================================
+# BUDGETS DE PERFORMANCE PAR ROUTE
+# ============================================
+#
+# Chaque route de galerie/urls.py est appelée (GET) pour chaque rôle, et
+# comparée à galerie/perf_baseline.json (versionné, vérifié en CI) :
+#   - nombre de requêtes SQL différent de la référence                 -> échec
+#     (plus : régression ; moins : référence à abaisser, sinon elle
+#     laisserait revenir une régression jusqu'à l'ancien niveau)
+#   - p50 > référence x TOLERANCE + MARGE_MS                            -> échec
+# Les temps sont versionnés en unités d'étalonnage : chaque mesure est divisée
+# par la durée d'une charge fixe (SQL, template, Python) exécutée juste avant,
+# ce qui compense la vitesse de la machine et ses ralentissements passagers.
+# Durées en temps CPU du thread (client de test et SQLite dans le processus) :
+# les autres processus de la machine ne les allongent pas.
+# Le p50 seulement : sur REPETITIONS mesures, le p95 est un maximum, trop bruité.
+#
+# Mettre à jour la référence après une optimisation (ou une nouvelle route) :
+#   GALERIE_PERF_UPDATE=1 python manage.py test galerie.tests.PerfRoutesTests
+# Machine trop bruitée pour les temps : GALERIE_PERF_TEMPS=0
+
+FICHIER_REFERENCE = Path(__file__).resolve().parent / "perf_baseline.json"
+MISE_A_JOUR = os.environ.get("GALERIE_PERF_UPDATE") == "1"
+VERIFIER_TEMPS = os.environ.get("GALERIE_PERF_TEMPS", "1") == "1"
+TOLERANCE = float(os.environ.get("GALERIE_PERF_TOLERANCE", "1.5"))
+MARGE_MS = float(os.environ.get("GALERIE_PERF_MARGE_MS", "2"))
+REPETITIONS = int(os.environ.get("GALERIE_PERF_REPETITIONS", "7"))
+
+ROLES = ["anonyme", "visiteur", "artiste", "admin"]
+
+
+def percentile(valeurs, p):
+    valeurs = sorted(valeurs)
+    rang = (len(valeurs) - 1) * p / 100
+    bas = int(rang)
+    haut = min(bas + 1, len(valeurs) - 1)
+    return valeurs[bas] + (valeurs[haut] - valeurs[bas]) * (rang - bas)
+
+
+GABARIT_ETALON = Template("{% for i in valeurs %}<li>{{ i }}</li>{% endfor %}")
+
+
+def etalon():
+    """Durée (ms) d'une charge fixe (SQL, template, Python) : l'unité des temps de référence"""
+    debut = time.thread_time()
+    with connection.cursor() as curseur:
+        for i in range(5):
+            curseur.execute("SELECT %s", [i])
+            curseur.fetchone()
+    GABARIT_ETALON.render(Context({"valeurs": range(100)}))
+    json.dumps(sorted(str(i) for i in range(500)))
+    return (time.thread_time() - debut) * 1000
+
+
+class PerfRoutesTests(TestCase):
+    """Budget de requêtes SQL et de temps de rendu pour chaque route et chaque rôle"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.visiteur = Utilisateur.objects.create_user("visiteur", password="pwd", role="visiteur")
+        cls.admin = Utilisateur.objects.create_user("admin", password="pwd", is_staff=True, is_superuser=True)
+        user_artiste = Utilisateur.objects.create_user("artiste", password="pwd", role="artiste")
+
+        categories = [Categorie.objects.create(nom_categorie=f"Catégorie {i}") for i in range(3)]
+        artistes = [Artiste.objects.create(user=user_artiste, nom="Artiste principal")]
+        for i in range(2):
+            user = Utilisateur.objects.create_user(f"artiste{i}", password="pwd", role="artiste")
+            artistes.append(Artiste.objects.create(user=user, nom=f"Artiste {i}"))
+        cls.artiste = artistes[0]
+
+        statuts = [Oeuvre.Statut.VALIDE] * 3 + [Oeuvre.Statut.EN_ATTENTE]
+        oeuvres = [
+            Oeuvre.objects.create(
+                titre=f"Œuvre {i}",
+                description="Description",
+                image=f"oeuvres/test_{i}.jpg",
+                technique=["Huile", "Acrylique", "Bronze"][i % 3],
+                prix=Decimal(100 + 10 * i),
+                stock=3,
+                statut=statuts[i % 4],
+                artiste=artistes[i % 3],
+                categorie=categories[i % 3],
+            )
+            for i in range(24)
+        ]
+        cls.oeuvre = next(o for o in oeuvres if o.statut == Oeuvre.Statut.VALIDE)
+        cls.oeuvre_attente = next(
+            o for o in oeuvres if o.statut == Oeuvre.Statut.EN_ATTENTE and o.artiste == cls.artiste
+        )
+
+        lieu = Lieu.objects.create(nom_lieu="Musée", ville="Marrakech", pays="Maroc")
+        aujourd_hui = date.today()
+        expositions = []
+        for i in range(6):
+            expo = Exposition.objects.create(
+                nom_exposition=f"Exposition {i}",
+                date_debut=aujourd_hui + timedelta(days=30 * (i - 3)),
+                date_fin=aujourd_hui + timedelta(days=30 * (i - 3) + 45),
+                lieu=lieu,
+            )
+            expo.oeuvres.set(oeuvres[i * 3:i * 3 + 6])
+            Ticket.objects.create(exposition=expo, type_ticket=Ticket.TypeTicket.STANDARD, prix=15)
+            expositions.append(expo)
+        cls.exposition = expositions[3]
+
+        for i in range(4):
+            commande = Commande.objects.create(
+                utilisateur=cls.visiteur,
+                statut=Commande.Statut.PAYEE if i else Commande.Statut.EN_COURS,
+                montant_total=Decimal("500.00"),
+            )
+            for oeuvre in oeuvres[i * 4:i * 4 + 3]:
+                LigneCommande.objects.create(commande=commande, oeuvre=oeuvre, prix_unitaire=oeuvre.prix)
+            if i:
+                Paiement.objects.create(commande=commande, montant=commande.montant_total, statut=Paiement.Statut.SUCCES)
+            else:
+                cls.commande = commande
+
+        panier = Panier.objects.create(client=cls.visiteur)
+        for oeuvre in oeuvres[:3]:
+            PanierItem.objects.create(panier=panier, oeuvre=oeuvre)
+
+        cls.notification = None
+        for i in range(5):
+            notification = Notification.objects.create(
+                utilisateur=cls.visiteur,
+                titre=f"Notification {i}",
+                message="Message",
+                exposition=cls.exposition,
+            )
+            cls.notification = cls.notification or notification
+
+    def setUp(self):
+        cache.clear()
+        # Versions des espaces créées hors des savepoints de mesure (annulés,
+        # ils les effaceraient de la table du cache "versions") : chaque mesure
+        # compte leur lecture, comme en production, pas leur création
+        versions([*views.ESPACES_DASHBOARD, f"exposition:{self.exposition.pk}"])
+        self.clients_roles = {"anonyme": self.client_class()}
+        for role, user in (("visiteur", self.visiteur), ("artiste", self.artiste.user), ("admin", self.admin)):
+            client = self.client_class()
+            client.force_login(user)
+            self.clients_roles[role] = client
+
+    def arguments_route(self):
+        """kwargs de reverse() pour chaque nom de route"""
+        return {
+            "oeuvre_detail": {"pk": self.oeuvre.pk},
+            "exposition_detail": {"pk": self.exposition.pk},
+            "expositions_calendrier": {"annee": self.exposition.date_debut.year, "mois": self.exposition.date_debut.month},
+            "oeuvre_update": {"pk": self.oeuvre_attente.pk},
+            "oeuvre_valider": {"pk": self.oeuvre_attente.pk},
+            "oeuvre_refuser": {"pk": self.oeuvre_attente.pk},
+            "cart_add": {"oeuvre_id": self.oeuvre.pk},
+            "cart_remove": {"oeuvre_id": self.oeuvre.pk},
+            "order_pay": {"order_id": self.commande.pk},
+            "payment_success": {"order_id": self.commande.pk},
+            "order_cancel": {"order_id": self.commande.pk},
+            "notification_mark_read": {"pk": self.notification.pk},
+            "notification_delete": {"pk": self.notification.pk},
+            "profilage_piles": {"identifiant": "0-inconnu"},
+        }
+
+    @staticmethod
+    def noms_routes():
+        return sorted({p.name for p in galerie_urls.urlpatterns if getattr(p, "name", None)})
+
+    def mesurer(self, client, url):
+        """
+        Une requête dans un savepoint annulé ensuite : chaque mesure part du
+        même état, même pour les vues qui écrivent (panier, validation...).
+        """
+        client.cookies.pop("messages", None)
+        connection.queries_log.clear()  # CaptureQueriesContext est borné à 9000 requêtes
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as requetes:
+                debut = time.thread_time()
+                response = client.get(url)
+                duree = (time.thread_time() - debut) * 1000
+            transaction.set_rollback(True)
+        self.assertLess(response.status_code, 500, url)
+        return len(requetes), duree
+
+    def test_toutes_les_routes_ont_des_arguments(self):
+        arguments = self.arguments_route()
+        for nom in self.noms_routes():
+            with self.subTest(route=nom):
+                reverse(f"galerie:{nom}", kwargs=arguments.get(nom))
+
+    def test_budgets_par_route(self):
+        reference = {}
+        if FICHIER_REFERENCE.exists():
+            reference = json.loads(FICHIER_REFERENCE.read_text(encoding="utf-8"))
+        mesures = {}
+        arguments = self.arguments_route()
+
+        for nom in self.noms_routes():
+            url = reverse(f"galerie:{nom}", kwargs=arguments.get(nom))
+            for role in ROLES:
+                cle = f"{nom}|{role}"
+                client = self.clients_roles[role]
+                self.mesurer(client, url)  # échauffement : index en mémoire, caches
+                etalon()  # échauffement de l'étalon
+                resultats, unites = [], []
+                gc.disable()  # pas de pause du ramasse-miettes au milieu des mesures
+                try:
+                    for _ in range(REPETITIONS):
+                        unites.append(etalon())
+                        resultats.append(self.mesurer(client, url))
+                finally:
+                    gc.enable()
+                unite = percentile(unites, 50)
+                p50 = percentile([duree for _, duree in resultats], 50)
+                mesures[cle] = {
+                    "requetes": max(nb for nb, _ in resultats),
+                    "p50": round(percentile([duree / u for (_, duree), u in zip(resultats, unites)], 50), 2),
+                }
+
+                if MISE_A_JOUR:
+                    continue
+                with self.subTest(route=cle):
+                    attendu = reference.get(cle)
+                    self.assertIsNotNone(
+                        attendu,
+                        f"{cle} absent de {FICHIER_REFERENCE.name} (relancer avec GALERIE_PERF_UPDATE=1)",
+                    )
+                    nombre = mesures[cle]["requetes"]
+                    self.assertLessEqual(
+                        nombre, attendu["requetes"], f"{cle} : {nombre} requêtes SQL (budget {attendu['requetes']})"
+                    )
+                    self.assertEqual(
+                        nombre, attendu["requetes"],
+                        f"{cle} : {nombre} requêtes SQL, budget {attendu['requetes']} à abaisser (GALERIE_PERF_UPDATE=1)",
+                    )
+                    if VERIFIER_TEMPS:
+                        limite = attendu["p50"] * TOLERANCE + MARGE_MS / unite
+                        self.assertLessEqual(
+                            mesures[cle]["p50"], limite,
+                            f"{cle} : p50 {p50:.2f} ms, {mesures[cle]['p50']} étalons "
+                            f"(limite {limite:.2f}, étalon {unite:.2f} ms)",
+                        )
+
+        if MISE_A_JOUR:
+            FICHIER_REFERENCE.write_text(
+                json.dumps(mesures, indent=2, sort_keys=True, ensure_ascii=False) + "\n", encoding="utf-8"
+            )
+
+
+# ============================================
+# TESTS UNITAIRES
+# ============================================
+
+def image_png(couleur):
+    tampon = io.BytesIO()
+    Image.new("RGB", (16, 16), couleur).save(tampon, format="PNG")
+    return tampon.getvalue()
+
+
+class DonneesCatalogue:
+    """Un artiste et une catégorie pour créer des œuvres"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = Utilisateur.objects.create_user("artiste_unitaire", password="pwd", role="artiste")
+        cls.artiste = Artiste.objects.create(user=user, nom="Artiste unitaire")
+        cls.categorie = Categorie.objects.create(nom_categorie="Peinture")
+
+    def creer_oeuvre(self, **champs):
+        valeurs = {
+            "titre": "Œuvre",
+            "image": "oeuvres/existante.jpg",
+            "prix": Decimal("100.00"),
+            "artiste": self.artiste,
+            "categorie": self.categorie,
+        }
+        valeurs.update(champs)
+        return Oeuvre.objects.create(**valeurs)
+
+
+class StockageTests(DonneesCatalogue, TestCase):
+    """Références de FichierMedia et fichiers sur disque (ContentAddressedStorage)"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media = tempfile.mkdtemp(prefix="galerie-media-")
+        cls.addClassCleanup(shutil.rmtree, cls.media, ignore_errors=True)
+        cls.enterClassContext(override_settings(MEDIA_ROOT=cls.media))
+        super().setUpClass()
+
+    def televerser(self, oeuvre, contenu, nom="photo.png"):
+        with self.captureOnCommitCallbacks(execute=True):
+            oeuvre.image = SimpleUploadedFile(nom, contenu, content_type="image/png")
+            oeuvre.save()
+        return oeuvre.image.name
+
+    def etat(self, nom):
+        """(références, présent sur disque)"""
+        references = FichierMedia.objects.filter(chemin=nom).values_list("references", flat=True).first()
+        return references, os.path.exists(os.path.join(self.media, nom))
+
+    def test_creation_reupload_identique_remplacement_suppression(self):
+        rouge, bleu = image_png("red"), image_png("blue")
+        oeuvre = self.creer_oeuvre()
+        nom_rouge = self.televerser(oeuvre, rouge)
+        self.assertEqual(self.etat(nom_rouge), (1, True))
+
+        # Mêmes octets re-téléversés : même nom, toujours une seule référence
+        self.assertEqual(self.televerser(oeuvre, rouge, "autre_nom.png"), nom_rouge)
+        self.assertEqual(self.etat(nom_rouge), (1, True))
+
+        nom_bleu = self.televerser(oeuvre, bleu)
+        self.assertNotEqual(nom_bleu, nom_rouge)
+        self.assertEqual(self.etat(nom_rouge), (None, False))
+        self.assertEqual(self.etat(nom_bleu), (1, True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            oeuvre.delete()
+        self.assertEqual(self.etat(nom_bleu), (None, False))
+
+    def test_fichier_partage_supprime_a_la_derniere_reference(self):
+        contenu = image_png("green")
+        premiere, seconde = self.creer_oeuvre(), self.creer_oeuvre()
+        nom = self.televerser(premiere, contenu)
+        self.assertEqual(self.televerser(seconde, contenu), nom)
+        self.assertEqual(self.etat(nom), (2, True))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            premiere.delete()
+        self.assertEqual(self.etat(nom), (1, True))
+        with self.captureOnCommitCallbacks(execute=True):
+            seconde.delete()
+        self.assertEqual(self.etat(nom), (None, False))
+
+    def test_sauvegarde_sans_nouveau_fichier_ne_touche_pas_aux_references(self):
+        oeuvre = self.creer_oeuvre()
+        nom = self.televerser(oeuvre, image_png("yellow"))
+        with self.captureOnCommitCallbacks(execute=True):
+            oeuvre.titre = "Nouveau titre"
+            oeuvre.save()
+        self.assertEqual(self.etat(nom), (1, True))
+
+    def generer_images(self, **options):
+        call_command("generer_images", count=1, width=16, height=16, workers=1, stdout=io.StringIO(), **options)
+
+    def test_generer_images_sans_association_hors_references(self):
+        self.generer_images()
+        self.generer_images()
+        self.assertFalse(FichierMedia.objects.exists())
+        generees = [nom for nom in os.listdir(os.path.join(self.media, "oeuvres")) if nom.startswith("generee")]
+        self.assertEqual(generees, ["generee_0.jpg"])  # écrasée, pas de generee_0_<suffixe>.jpg
+
+    def test_generer_images_libere_l_image_remplacee(self):
+        oeuvre = self.creer_oeuvre()
+        ancienne = self.televerser(oeuvre, image_png("purple"))
+        os.remove(os.path.join(self.media, ancienne))  # image perdue : à régénérer
+        with self.captureOnCommitCallbacks(execute=True):
+            self.generer_images(link=True)
+        oeuvre.refresh_from_db()
+        self.assertNotEqual(oeuvre.image.name, ancienne)
+        self.assertEqual(self.etat(ancienne), (None, False))
+        self.assertEqual(self.etat(oeuvre.image.name), (1, True))
+
+
+def index_sans_base(classe, valeurs):
+    """Index rempli à la main : pas de chargement depuis la base"""
+    index = classe()
+    index._construit_le = time.monotonic()
+    for pk, valeur in valeurs.items():
+        index.ajouter(pk, valeur)
+    return index
+
+
+class IndexMemoireTests(TestCase):
+    """Copie à l'écriture et synchronisation des index après validation"""
+
+    def test_ecritures_ne_modifient_pas_un_instantane(self):
+        index = index_sans_base(IndexLieux, {1: (48.85, 2.35), 2: (45.76, 4.83), 3: (43.30, 5.37)})
+        pks, valeurs = index.pks, index.valeurs
+        copie_pks, copie_valeurs = pks.copy(), valeurs.copy()
+
+        index.retirer(1)
+        index.ajouter(2, (0.0, 0.0))
+        self.assertEqual(pks.tolist(), copie_pks.tolist())
+        self.assertEqual(valeurs.tolist(), copie_valeurs.tolist())
+        self.assertEqual(sorted(index.pks.tolist()), [2, 3])
+        self.assertEqual(index.valeurs[index.positions[2]].tolist(), [0.0, 0.0])
+        self.assertEqual(index.valeurs[index.positions[3]].tolist(), [43.30, 5.37])
+
+    def test_ajout_par_lot(self):
+        index = index_sans_base(IndexLieux, {1: (48.85, 2.35)})
+        pks, valeurs = index.pks, index.valeurs
+        index.ajouter_plusieurs([(2, (45.76, 4.83)), (1, (0.0, 0.0)), (3, (43.30, 5.37))])
+        self.assertEqual(pks.tolist(), [1])
+        self.assertEqual(valeurs.tolist(), [[48.85, 2.35]])
+        self.assertEqual(index.pks.tolist(), [1, 2, 3])
+        self.assertEqual(index.positions, {1: 0, 2: 1, 3: 2})
+        self.assertEqual(index.valeurs.tolist(), [[0.0, 0.0], [45.76, 4.83], [43.30, 5.37]])
+
+    def test_sauvegarde_du_stock_ne_copie_pas_l_index(self):
+        oeuvre = Oeuvre.objects.create(
+            titre="Validée", image="oeuvres/x.jpg", prix=Decimal("10.00"), statut=Oeuvre.Statut.VALIDE,
+            couleurs=bytes(9), artiste=Artiste.objects.create(
+                user=Utilisateur.objects.create_user("a", password="pwd"), nom="A"
+            ),
+        )
+        couleurs.construire()
+        valeurs = couleurs.valeurs
+        with self.captureOnCommitCallbacks(execute=True):
+            oeuvre.stock = 0
+            oeuvre.save(update_fields=["stock"])
+        self.assertIs(couleurs.valeurs, valeurs)
+        with self.captureOnCommitCallbacks(execute=True):
+            oeuvre.statut = Oeuvre.Statut.REFUSE
+            oeuvre.save(update_fields=["statut"])
+        self.assertNotIn(oeuvre.pk, couleurs.positions)
+
+    def test_ecriture_annulee_ne_laisse_pas_d_entree(self):
+        lieux.construire()
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                annule = Lieu.objects.create(nom_lieu="Annulé", ville="Lyon", pays="France", latitude=45.76, longitude=4.83)
+                transaction.set_rollback(True)
+        self.assertNotIn(annule.pk, lieux.positions)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            valide = Lieu.objects.create(nom_lieu="Validé", ville="Lyon", pays="France", latitude=45.76, longitude=4.83)
+        pk = valide.pk
+        self.assertIn(pk, lieux.positions)
+        with self.captureOnCommitCallbacks(execute=True):
+            valide.delete()
+        self.assertNotIn(pk, lieux.positions)
+
+
+class AnalyseImageTests(SimpleTestCase):
+    """Empreinte dHash et couleurs dominantes (galerie.imaging)"""
+
+    def test_dhash_proche_pour_une_image_retouchee(self):
+        image = degrade(320, 240, graine=1)
+        reduite = image.resize((160, 120))
+        autre = degrade(320, 240, graine=2)
+        self.assertEqual(dhash(image), dhash(image.copy()))
+        self.assertLessEqual((dhash(image) ^ dhash(reduite)).bit_count(), DISTANCE_DOUBLON)
+        self.assertGreater((dhash(image) ^ dhash(autre)).bit_count(), DISTANCE_DOUBLON)
+
+    def test_empreinte_signee_reversible(self):
+        for valeur in (0, 1, (1 << 63) - 1, 1 << 63, (1 << 64) - 1):
+            signee = vers_signe(valeur)
+            self.assertTrue(-(1 << 63) <= signee < 1 << 63)
+            self.assertEqual(vers_non_signe(signee), valeur)
+
+    def test_kmeans_trie_par_effectif(self):
+        groupes = [((20.0, 0.0, 0.0), 50), ((60.0, 40.0, -30.0), 30), ((90.0, -20.0, 60.0), 20)]
+        rng = np.random.default_rng(0)
+        points = np.concatenate([
+            np.asarray(centre, dtype=np.float32) + rng.normal(0, 1, (nombre, 3)).astype(np.float32)
+            for centre, nombre in groupes
+        ])
+        centres, effectifs = kmeans(points, k=3)
+        self.assertEqual(effectifs.tolist(), [50, 30, 20])
+        for centre, (attendu, _) in zip(centres, groupes):
+            np.testing.assert_allclose(centre, attendu, atol=1.0)
+
+    def test_couleurs_dominantes(self):
+        image = Image.new("RGB", (100, 100), (255, 0, 0))
+        image.paste((0, 0, 255), (0, 0, 100, 30))
+        lab = decoder_lab(encoder_lab(couleurs_dominantes(image)))
+        np.testing.assert_allclose(lab[0], np.rint(rgb_vers_lab([255, 0, 0])), atol=2)
+        np.testing.assert_allclose(lab[1], np.rint(rgb_vers_lab([0, 0, 255])), atol=2)
+
+
+class IndexRechercheTests(SimpleTestCase):
+    """Recherches des index en mémoire : quasi-doublons et lieux proches"""
+
+    def test_voisins_par_distance_de_hamming(self):
+        base = 0xF0F0_F0F0_F0F0_F0F0
+        index = index_sans_base(IndexEmpreintes, {
+            1: vers_signe(base),
+            2: vers_signe(base ^ 0b111),  # 3 bits
+            3: vers_signe(base ^ 0b1),  # 1 bit
+            4: vers_signe(~base & ((1 << 64) - 1)),  # 64 bits
+        })
+        self.assertEqual(index.voisins(vers_signe(base), exclure=1), [(3, 1), (2, 3)])
+        self.assertEqual(index.voisins(vers_signe(base), distance_max=0), [(1, 0)])
+
+    def test_lieux_proches(self):
+        index = index_sans_base(IndexLieux, {
+            1: (48.8566, 2.3522),  # Paris
+            2: (50.6292, 3.0573),  # Lille
+            3: (45.7640, 4.8357),  # Lyon
+            4: (43.2965, 5.3698),  # Marseille
+        })
+        proches = index.proches(48.8566, 2.3522, rayon_km=450)
+        self.assertEqual([pk for pk, _ in proches], [1, 2, 3])
+        self.assertAlmostEqual(proches[0][1], 0.0)
+        self.assertAlmostEqual(proches[1][1], 204, delta=2)
+        self.assertAlmostEqual(proches[2][1], 392, delta=2)
+
+        self.assertEqual([pk for pk, _ in index.proches(43.3, 5.4, limite=2)], [4, 3])
+        self.assertEqual(len(index.proches(0.0, 0.0, limite=None)), 4)
+        self.assertEqual(index.proches(0.0, 0.0, rayon_km=100), [])
+
+
+class CompteurPairesTests(SimpleTestCase):
+    """Achats conjoints : supports et lift (galerie.recommandations)"""
+
+    def test_lift_et_fusion_des_lots(self):
+        compteur = CompteurPaires(max_panier=3)
+        for panier in ([1, 2], [2, 1], [1, 3]):
+            compteur.ajouter_panier(panier)
+        compteur.vider_lot()  # les lots suivants sont fusionnés aux paires déjà comptées
+        for panier in ([2, 3], [4], [1, 2, 3, 4]):
+            compteur.ajouter_panier(panier)
+
+        # 6 paniers : n_1 = 4, n_2 = 4, n_3 = 3 ; le dernier dépasse max_panier, ses paires ne comptent pas
+        oeuvres, associees, supports, lifts, rangs = compteur.meilleures_paires(top_n=5, support_min=2)
+        self.assertEqual(
+            list(zip(oeuvres.tolist(), associees.tolist(), supports.tolist(), rangs.tolist())),
+            [(1, 2, 2, 1), (2, 1, 2, 1)],
+        )
+        np.testing.assert_allclose(lifts, [2 * 6 / (4 * 4)] * 2)
+
+        oeuvres, associees, _, _, rangs = compteur.meilleures_paires(top_n=1, support_min=1)
+        self.assertEqual(dict(zip(oeuvres.tolist(), associees.tolist()))[1], 2)  # lift 0.75 contre 0.5 pour 3
+        self.assertEqual(sorted(oeuvres.tolist()), [1, 2, 3])
+        self.assertEqual(set(rangs.tolist()), {1})
+
+
+class ModerationTests(DonneesCatalogue, TestCase):
+    """Modération par lots (galerie.moderation.moderer)"""
+
+    def test_lot_valide_et_notifie_par_artiste(self):
+        oeuvres = [self.creer_oeuvre(titre=f"Œuvre {i}") for i in range(3)]
+        deja_refusee = self.creer_oeuvre(statut=Oeuvre.Statut.REFUSE)
+
+        pks = moderation.moderer([o.pk for o in oeuvres] + [deja_refusee.pk, 0], "valider")
+        self.assertEqual(pks, sorted(o.pk for o in oeuvres))
+        self.assertEqual(
+            set(Oeuvre.objects.filter(pk__in=pks).values_list("statut", flat=True)), {Oeuvre.Statut.VALIDE}
+        )
+        deja_refusee.refresh_from_db()
+        self.assertEqual(deja_refusee.statut, Oeuvre.Statut.REFUSE)
+
+        notification = Notification.objects.get(utilisateur=self.artiste.user)
+        self.assertEqual(notification.titre, "3 œuvres validées")
+        self.artiste.refresh_from_db()
+        self.assertEqual((self.artiste.nb_oeuvres_en_attente, self.artiste.nb_oeuvres_validees), (0, 3))
+
+        self.assertEqual(moderation.moderer(pks, "refuser"), [])  # plus en attente
+
+    def test_nombre_de_requetes_fixe(self):
+        def requetes(taille):
+            pks = [self.creer_oeuvre().pk for _ in range(taille)]
+            with CaptureQueriesContext(connection) as capture:
+                moderation.moderer(pks, "refuser")
+            return len(capture)
+
+        self.assertEqual(requetes(1), requetes(8))
+
+    def test_api_refuse_les_ids_non_listes(self):
+        oeuvres = [self.creer_oeuvre() for _ in range(3)]
+        self.client.force_login(Utilisateur.objects.create_user("curateur", password="pwd", is_staff=True))
+        url = reverse("galerie:oeuvres_moderation")
+        chiffres = "".join(str(o.pk) for o in oeuvres)
+
+        response = self.client.post(url, {"ids": chiffres, "decision": "refuser"}, content_type="application/json")
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Oeuvre.objects.exclude(statut=Oeuvre.Statut.EN_ATTENTE).exists())
+
+        response = self.client.get(url, {"limite": -5})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()["file"]), 1)
+
+
+class SignauxSuspendusTests(TestCase):
+    """signaux_suspendus() déconnecte tous les récepteurs de galerie.signals"""
+
+    @staticmethod
+    def recepteurs_galerie():
+        from django.db.models import signals
+        connectes = set()
+        for signal in (signals.pre_save, signals.post_save, signals.pre_delete, signals.post_delete, signals.m2m_changed):
+            for entree in signal.receivers:
+                fonction = entree[1]
+                if isinstance(fonction, weakref.ReferenceType):
+                    fonction = fonction()
+                if getattr(fonction, "__module__", None) == galerie_signals.__name__:
+                    connectes.add(fonction.__name__)
+        return connectes
+
+    def test_aucun_recepteur_oublie(self):
+        self.assertIn("compter_ticket_vendu", self.recepteurs_galerie())
+        with galerie_signals.signaux_suspendus():
+            self.assertEqual(self.recepteurs_galerie(), set())
+        self.assertIn("compter_ticket_vendu", self.recepteurs_galerie())
+
+
+class CompteursTests(DonneesCatalogue, TestCase):
+    """Compteurs dénormalisés d'Artiste/Categorie (galerie.compteurs)"""
+
+    def setUp(self):
+        user = Utilisateur.objects.create_user("artiste_bis", password="pwd", role="artiste")
+        self.artiste_bis = Artiste.objects.create(user=user, nom="Artiste bis")
+        self.categorie_bis = Categorie.objects.create(nom_categorie="Sculpture")
+        self.client_commande = Utilisateur.objects.create_user("acheteur", password="pwd")
+
+    def commande(self, *oeuvres, statut=Commande.Statut.EN_COURS):
+        commande = Commande.objects.create(utilisateur=self.client_commande, statut=statut)
+        for quantite, oeuvre in enumerate(oeuvres, start=1):
+            LigneCommande.objects.create(commande=commande, oeuvre=oeuvre, quantite=quantite, prix_unitaire=oeuvre.prix)
+        return commande
+
+    def ventes(self, objet):
+        objet.refresh_from_db()
+        return objet.unites_vendues, objet.chiffre_affaires
+
+    def test_commande_payee_puis_annulee(self):
+        premiere = self.creer_oeuvre(prix=Decimal("100.00"))
+        seconde = self.creer_oeuvre(prix=Decimal("30.00"), artiste=self.artiste_bis, categorie=self.categorie_bis)
+        commande = self.commande(premiere, seconde)
+        self.assertEqual(self.ventes(self.artiste), (0, Decimal("0.00")))
+
+        commande.statut = Commande.Statut.PAYEE
+        with CaptureQueriesContext(connection) as requetes:
+            commande.save(update_fields=["statut"])
+        mises_a_jour = [q for q in requetes if q["sql"].startswith("UPDATE") and "commande" not in q["sql"]]
+        self.assertEqual(len(mises_a_jour), 2)  # un UPDATE par modèle, pas par ligne
+        self.assertEqual(self.ventes(self.artiste), (1, Decimal("100.00")))
+        self.assertEqual(self.ventes(self.artiste_bis), (2, Decimal("60.00")))
+        self.assertEqual(self.ventes(self.categorie_bis), (2, Decimal("60.00")))
+
+        commande.statut = Commande.Statut.ANNULEE
+        commande.save(update_fields=["statut"])
+        self.assertEqual(self.ventes(self.artiste), (0, Decimal("0.00")))
+        self.assertEqual(self.ventes(self.categorie_bis), (0, Decimal("0.00")))
+
+    def test_statut_differe_ne_compte_pas_deux_fois(self):
+        commande = self.commande(self.creer_oeuvre(prix=Decimal("100.00")), statut=Commande.Statut.PAYEE)
+        self.assertEqual(self.ventes(self.artiste), (1, Decimal("100.00")))
+
+        differee = Commande.objects.defer("statut").get(pk=commande.pk)
+        differee.statut = Commande.Statut.PAYEE
+        differee.save()
+        self.assertEqual(self.ventes(self.artiste), (1, Decimal("100.00")))
+
+    def test_statuts_des_oeuvres(self):
+        oeuvre = self.creer_oeuvre()
+        oeuvre.statut = Oeuvre.Statut.VALIDE
+        oeuvre.artiste = self.artiste_bis
+        oeuvre.save()
+        self.artiste.refresh_from_db()
+        self.artiste_bis.refresh_from_db()
+        self.assertEqual((self.artiste.nb_oeuvres, self.artiste.nb_oeuvres_en_attente), (0, 0))
+        self.assertEqual((self.artiste_bis.nb_oeuvres, self.artiste_bis.nb_oeuvres_validees), (1, 1))
+
+    def test_reconcilier_corrige_les_derives(self):
+        self.creer_oeuvre()
+        self.commande(self.creer_oeuvre(prix=Decimal("40.00")), statut=Commande.Statut.PAYEE)
+        Artiste.objects.filter(pk=self.artiste.pk).update(nb_oeuvres=99, unites_vendues=0)
+
+        corrections = compteurs.reconcilier(taille_lot=1)
+        self.assertEqual(corrections, {Artiste: 1, Categorie: 0})
+        self.artiste.refresh_from_db()
+        self.assertEqual((self.artiste.nb_oeuvres, self.artiste.unites_vendues), (2, 1))
+        self.assertEqual(compteurs.reconcilier(), {Artiste: 0, Categorie: 0})
+
+
+class CollecteSQLTests(TestCase):
+    """Un seul execute_wrapper par requête HTTP, lu par les trois middlewares SQL"""
+
+    def test_collecteurs_imbriques_partages(self):
+        with collecte_sql() as externe:
+            with collecte_sql() as interne:
+                self.assertIs(interne, externe)
+                self.assertEqual(len(connection.execute_wrappers), 1)
+                Categorie.objects.count()
+        self.assertEqual(externe.nombre, 1)
+        self.assertEqual(connection.execute_wrappers, [])
+
+    def test_un_collecteur_par_requete(self):
+        crees = []
+
+        class Collecteur(instrumentation.CollecteurRequete):
+            def __init__(self):
+                super().__init__()
+                crees.append(self)
+
+        self.client.force_login(Utilisateur.objects.create_user("gerant", password="pwd", is_staff=True))
+        with mock.patch.object(instrumentation, "CollecteurRequete", Collecteur):
+            response = self.client.get(reverse("galerie:home"))
+        self.assertEqual(len(crees), 1)
+        self.assertGreater(crees[0].nombre, 0)
+        self.assertIn(f'desc="SQL ({crees[0].nombre})"', response["Server-Timing"])
+
+    def test_server_timing_reserve_au_staff(self):
+        self.assertNotIn("Server-Timing", self.client.get(reverse("galerie:home")))
+        self.client.force_login(Utilisateur.objects.create_user("visiteur", password="pwd"))
+        self.assertNotIn("Server-Timing", self.client.get(reverse("galerie:home")))
+
+
+class RollupsTests(DonneesCatalogue, TestCase):
+    """Filigrane des agrégats de ventes (galerie.rollups.mettre_a_jour)"""
+
+    def setUp(self):
+        acheteur = Utilisateur.objects.create_user("acheteur", password="pwd")
+        self.commande = Commande.objects.create(utilisateur=acheteur, statut=Commande.Statut.PAYEE)
+        LigneCommande.objects.create(commande=self.commande, oeuvre=self.creer_oeuvre(), prix_unitaire=Decimal("100.00"))
+        rollups.reconstruire()
+        # Commande payée bien avant le dernier passage
+        Commande.objects.filter(pk=self.commande.pk).update(date_modification=timezone.now() - timedelta(days=2))
+
+    def unites(self):
+        return VenteJournaliere.objects.aggregate(total=Sum("unites"))["total"]
+
+    def test_ligne_ajoutee_puis_retiree_apres_le_filigrane(self):
+        self.assertEqual(self.unites(), 1)
+        ligne = LigneCommande.objects.create(
+            commande=self.commande, oeuvre=self.creer_oeuvre(), quantite=2, prix_unitaire=Decimal("50.00")
+        )
+        rollups.mettre_a_jour()
+        self.assertEqual(self.unites(), 3)
+
+        Commande.objects.filter(pk=self.commande.pk).update(date_modification=timezone.now() - timedelta(days=2))
+        ligne.delete()
+        rollups.mettre_a_jour()
+        self.assertEqual(self.unites(), 1)
+
+    def test_commande_non_vendue_non_touchee(self):
+        commande = Commande.objects.create(utilisateur=self.commande.utilisateur)
+        Commande.objects.filter(pk=commande.pk).update(date_modification=timezone.now() - timedelta(days=2))
+        oeuvre = self.creer_oeuvre()
+        with self.assertNumQueries(1):
+            LigneCommande.objects.create(commande=commande, oeuvre=oeuvre, prix_unitaire=Decimal("10.00"))
+
+
+class CurseursTests(DonneesCatalogue, TestCase):
+    """Pagination par clé (?apres=) des commandes et des ventes d'un artiste"""
+
+    def parcourir(self, route, cle):
+        """Suit les liens ?apres= ; retourne les pk de chaque page"""
+        pages, url = [], reverse(route)
+        while url:
+            response = self.client.get(url)
+            pages.append([objet.pk for objet in response.context[cle]])
+            suivant = response.context["suivant"]
+            if suivant:
+                self.assertContains(response, f'href="?apres={suivant}"')
+            if response.context["curseur"]:
+                self.assertContains(response, f'href="{reverse(route)}"')
+            url = f"{reverse(route)}?apres={suivant}" if suivant else None
+        return pages
+
+    def test_commandes(self):
+        acheteur = Utilisateur.objects.create_user("acheteur", password="pwd")
+        nombre = views.COMMANDES_PAR_PAGE + 5
+        commandes = Commande.objects.bulk_create([Commande(utilisateur=acheteur) for _ in range(nombre)])
+        self.client.force_login(acheteur)
+
+        pages = self.parcourir("galerie:orders_list", "commandes")
+        self.assertEqual([len(page) for page in pages], [views.COMMANDES_PAR_PAGE, 5])
+        self.assertEqual(sum(pages, []), sorted((commande.pk for commande in commandes), reverse=True))
+
+    def test_ventes_artiste_a_egalite_de_commande(self):
+        acheteur = Utilisateur.objects.create_user("acheteur", password="pwd")
+        oeuvres = [self.creer_oeuvre(titre=f"Œuvre {i}") for i in range(3)]
+        commandes = Commande.objects.bulk_create([Commande(utilisateur=acheteur) for _ in range(20)])
+        LigneCommande.objects.bulk_create([
+            LigneCommande(commande=commande, oeuvre=oeuvre, prix_unitaire=oeuvre.prix)
+            for commande in commandes for oeuvre in oeuvres
+        ])
+        self.client.force_login(self.artiste.user)
+
+        pages = self.parcourir("galerie:artiste_sales", "ventes")
+        self.assertEqual([len(page) for page in pages], [views.VENTES_PAR_PAGE, 60 - views.VENTES_PAR_PAGE])
+        attendu = LigneCommande.objects.order_by("-commande_id", "-pk").values_list("pk", flat=True)
+        self.assertEqual(sum(pages, []), list(attendu))
+
+    def test_curseur_invalide_ignore(self):
+        self.assertIsNone(views.lire_curseur("12"))
+        self.assertIsNone(views.lire_curseur("a-b"))
+        self.assertIsNone(views.lire_curseur(None))
+        self.assertEqual(views.lire_curseur("12-7"), (12, 7))
+
+
+class CacheVersionneTests(DonneesCatalogue, TestCase):
+    """Clés versionnées (galerie.cache.cle_versionnee) et leur invalidation par les signaux"""
+
+    def setUp(self):
+        cache.clear()
+
+    def cle(self):
+        return cle_versionnee("test", ("catalogue", "artistes"), "partie")
+
+    def test_ecriture_validee_change_la_cle(self):
+        avant = self.cle()
+        self.assertEqual(avant, self.cle())
+        with self.captureOnCommitCallbacks(execute=False) as rappels:
+            oeuvre = self.creer_oeuvre()
+        self.assertEqual(self.cle(), avant)  # pas avant la validation
+        for rappel in rappels:
+            rappel()
+        self.assertNotEqual(self.cle(), avant)
+
+        avant = self.cle()
+        with self.captureOnCommitCallbacks(execute=True):
+            oeuvre.delete()
+        self.assertNotEqual(self.cle(), avant)
+
+    def test_sauvegarde_partielle_hors_champs_caches(self):
+        oeuvre = self.creer_oeuvre()
+        avant = self.cle()
+        with self.captureOnCommitCallbacks(execute=True):
+            oeuvre.stock = 0
+            oeuvre.save(update_fields=["stock"])
+        self.assertEqual(self.cle(), avant)
+        with self.captureOnCommitCallbacks(execute=True):
+            oeuvre.prix = Decimal("5.00")
+            oeuvre.save(update_fields=["prix"])
+        self.assertNotEqual(self.cle(), avant)
+
+    def test_connexion_ne_change_pas_le_tableau_de_bord(self):
+        user = self.artiste.user
+        avant = cle_versionnee("admin_dashboard", views.ESPACES_DASHBOARD)
+        with self.captureOnCommitCallbacks(execute=True):
+            update_last_login(None, user)
+        self.assertEqual(cle_versionnee("admin_dashboard", views.ESPACES_DASHBOARD), avant)
+
+    def test_version_evincee_recree_au_dela(self):
+        avant = versions(["catalogue"])["catalogue"]
+        stock_versions.delete("galerie:version:catalogue")
+        self.assertGreater(versions(["catalogue"])["catalogue"], avant)
+
+    def test_versions_hors_du_cache_local(self):
+        # Les versions sont dans le cache partagé par les workers, pas dans
+        # le cache local : un autre worker (cache local vide) lit les mêmes
+        avant = self.cle()
+        cache.clear()
+        self.assertEqual(self.cle(), avant)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creer_oeuvre()
+        cache.clear()
+        self.assertNotEqual(self.cle(), avant)
+
+    def test_moderation_change_la_cle_du_tableau_de_bord(self):
+        oeuvre = self.creer_oeuvre()
+        avant = cle_versionnee("admin_dashboard", views.ESPACES_DASHBOARD)
+        with self.captureOnCommitCallbacks(execute=True):
+            moderation.moderer([oeuvre.pk], "valider")
+        self.assertNotEqual(cle_versionnee("admin_dashboard", views.ESPACES_DASHBOARD), avant)
+
+
+class MetriquesAccesTests(TestCase):
+    """/metrics : jeton ou compte staff, même depuis 127.0.0.1 (proxy inverse local)"""
+
+    @override_settings(METRIQUES_JETON="secret")
+    def test_acces(self):
+        url = reverse("galerie:metrics")
+        self.assertEqual(self.client.get(url, REMOTE_ADDR="127.0.0.1").status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer autre").status_code, 403)
+        self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION="Bearer secret").status_code, 200)
+        self.client.force_login(Utilisateur.objects.create_user("staff", password="pwd", is_staff=True))
+        self.assertEqual(self.client.get(url).status_code, 200)
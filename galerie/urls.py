@@ -34,6 +34,7 @@ urlpatterns = [
     # Dashboards
     path("artiste/dashboard/", views.artiste_dashboard, name="artiste_dashboard"),
     path("artiste/sales/", views.artiste_sales, name="artiste_sales"),
+    path("artiste/sales/export/", views.artiste_sales_export, name="artiste_sales_export"),
     path("admin/dashboard/", views.admin_dashboard, name="admin_dashboard"),
     path("admin/validation/", views.admin_validation_list, name="admin_validation_list"),
     path("client/dashboard/", views.client_dashboard, name="client_dashboard"),
@@ -46,6 +47,9 @@ urlpatterns = [
     # Expositions (visiteur)
     path("expositions/", views.expositions_list, name="expositions_list"),
     path("expositions/<int:pk>/", views.exposition_detail, name="exposition_detail"),
+    path("expositions/calendrier/<int:annee>/<int:mois>/", views.expositions_calendrier, name="expositions_calendrier"),
+    path("expositions/proches/", views.expositions_proches, name="expositions_proches"),
+    path("lieux/proches/", views.lieux_proches, name="lieux_proches"),
 
     # Artiste
     path("artiste/oeuvre/create/", views.oeuvre_create, name="oeuvre_create"),
@@ -54,6 +58,7 @@ urlpatterns = [
     # Admin actions
     path("admin/oeuvre/<int:pk>/valider/", views.oeuvre_valider, name="oeuvre_valider"),
     path("admin/oeuvre/<int:pk>/refuser/", views.oeuvre_refuser, name="oeuvre_refuser"),
+    path("admin/oeuvres/moderation/", views.oeuvres_moderation, name="oeuvres_moderation"),
 
     # Panier / commandes
     path("panier/", views.cart_detail, name="cart_detail"),
@@ -72,4 +77,12 @@ urlpatterns = [
     path("notifications/<int:pk>/lire/", views.notification_mark_read, name="notification_mark_read"),
     path("notifications/<int:pk>/supprimer/", views.notification_delete, name="notification_delete"),
     path("admin/notifications/envoyer/", views.notification_send, name="notification_send"),
+
+    # Profilage et statistiques SQL (staff)
+    path("admin/profilage/", views.profilage_list, name="profilage_list"),
+    path("admin/profilage/<str:identifiant>/", views.profilage_piles, name="profilage_piles"),
+    path("admin/sql/", views.sql_stats, name="sql_stats"),
+
+    # Métriques Prometheus
+    path("metrics", views.metrics, name="metrics"),
 ]
@@ -5,17 +5,34 @@ from django.contrib.auth.decorators import login_required
 from django.contrib import messages
 from django.views.generic import ListView, DetailView
 from django.db import transaction, models
-from django.db.models import Q, Count
+from django.db.models import Q, Count, F, Prefetch, Sum
+from django.db.models.functions import Coalesce
 from django.core.exceptions import ObjectDoesNotExist
-from django.http import JsonResponse
+from django.core.paginator import Paginator
+from django.conf import settings
+from django.http import (
+    FileResponse, Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse,
+)
 from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta
-
+import calendar
+import csv
+import json
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+
+from . import instrumentation, metriques, moderation, profilage, rollups
+from .cache import cle_versionnee, memoiser, versions
 from .forms import RegisterForm, OeuvreForm, PaiementForm
+from .imaging import hex_vers_lab
+from .indexes import couleurs, empreintes, lieux
 from .models import (
     Oeuvre,
+    OeuvreAchatConjoint,
+    OeuvreSimilaire,
     Exposition,
+    ExpositionQuerySet,
+    Lieu,
     Categorie,
     Artiste,
     Panier,
@@ -178,10 +195,36 @@ def artiste_dashboard(request):
     return render(
         request,
         "galerie/dashboard/artiste_dashboard.html",
-        {"artiste": artiste, "oeuvres": oeuvres},
+        {
+            "artiste": artiste,
+            "oeuvres": oeuvres,
+            # Ventes des 30 derniers jours, lues dans les agrégats journaliers
+            "ventes_30_jours": rollups.serie_journaliere(30, artiste=artiste),
+        },
     )
 
 
+VENTES_PAR_PAGE = 50
+
+
+def ventes_artiste(artiste):
+    """
+    Lignes de commande des œuvres de l'artiste, des plus récentes aux plus
+    anciennes. L'ordre (commande_id, id) suit date_commande (auto_now_add) et
+    sert de clé de pagination : pas d'OFFSET qui relit les pages précédentes.
+    """
+    return LigneCommande.objects.filter(oeuvre__artiste=artiste).order_by("-commande_id", "-pk")
+
+
+def lire_curseur(valeur):
+    """'<commande_id>-<id>' -> (commande_id, id), None si absent ou invalide"""
+    try:
+        commande_id, pk = (int(partie) for partie in valeur.split("-"))
+    except (AttributeError, ValueError):
+        return None
+    return commande_id, pk
+
+
 @login_required
 def artiste_sales(request):
     """Vue pour voir les ventes d'un artiste"""
@@ -191,104 +234,187 @@ def artiste_sales(request):
         messages.warning(request, "Vous n'êtes pas enregistré comme artiste.")
         return redirect("galerie:home")
 
-    # Récupérer les lignes de commande pour les œuvres de cet artiste
-    ventes = (
-        LigneCommande.objects
-        .filter(oeuvre__artiste=artiste)
-        .select_related("oeuvre", "commande", "commande__utilisateur")
-        .order_by("-commande__date_commande")
+    ventes = ventes_artiste(artiste)
+
+    # Totaux et ventes par statut : une seule requête
+    totaux = ventes.order_by().aggregate(
+        total_ventes=Coalesce(
+            Sum(F("quantite") * F("prix_unitaire"), output_field=models.DecimalField(max_digits=12, decimal_places=2)),
+            Decimal("0.00"),
+        ),
+        nb_ventes=Count("pk"),
+        ventes_payees=Count("pk", filter=Q(commande__statut=Commande.Statut.PAYEE)),
+        ventes_en_cours=Count("pk", filter=Q(commande__statut=Commande.Statut.EN_COURS)),
     )
 
-    # Calculer le total des ventes
-    total_ventes = 0
-    for vente in ventes:
-        total_ventes += vente.sous_total
-
-    # Compter les ventes par statut
-    ventes_payees = ventes.filter(commande__statut="payee").count()
-    ventes_en_cours = ventes.filter(commande__statut="en_cours").count()
+    # Pagination par clé : ?apres=<commande_id>-<id> de la dernière ligne affichée
+    curseur = lire_curseur(request.GET.get("apres"))
+    page = ventes
+    if curseur:
+        commande_id, pk = curseur
+        page = page.filter(Q(commande_id__lt=commande_id) | Q(commande_id=commande_id, pk__lt=pk))
+    page = list(
+        page.select_related("oeuvre", "commande", "commande__utilisateur")[:VENTES_PAR_PAGE + 1]
+    )
+    suivant = None
+    if len(page) > VENTES_PAR_PAGE:
+        page = page[:VENTES_PAR_PAGE]
+        suivant = f"{page[-1].commande_id}-{page[-1].pk}"
 
     return render(
         request,
         "galerie/orders/artiste_sales.html",
         {
             "artiste": artiste,
-            "ventes": ventes,
-            "total_ventes": total_ventes,
-            "ventes_payees": ventes_payees,
-            "ventes_en_cours": ventes_en_cours,
+            "ventes": page,
+            "curseur": curseur,
+            "suivant": suivant,
+            **totaux,
         },
     )
 
 
+class Tampon:
+    """Pseudo-fichier pour csv.writer : retourne la ligne au lieu de l'écrire"""
+
+    def write(self, valeur):
+        return valeur
+
+
+COLONNES_EXPORT_VENTES = (
+    ("commande", "commande_id"),
+    ("date", "commande__date_commande"),
+    ("oeuvre", "oeuvre__titre"),
+    ("quantite", "quantite"),
+    ("prix_unitaire", "prix_unitaire"),
+    ("client", "commande__utilisateur__username"),
+    ("email", "commande__utilisateur__email"),
+    ("statut", "commande__statut"),
+)
+
+
+@login_required
+def artiste_sales_export(request):
+    """
+    Export des ventes de l'artiste (?format=csv ou jsonl) en flux : les lignes
+    sont lues par lots avec un curseur serveur, la mémoire reste constante.
+    """
+    try:
+        artiste = request.user.artiste
+    except Artiste.DoesNotExist:
+        messages.warning(request, "Vous n'êtes pas enregistré comme artiste.")
+        return redirect("galerie:home")
+
+    format_export = request.GET.get("format", "csv")
+    if format_export not in ("csv", "jsonl"):
+        raise Http404("Format d'export inconnu")
+
+    noms = [nom for nom, _ in COLONNES_EXPORT_VENTES]
+    lignes = (
+        ventes_artiste(artiste)
+        .values_list(*(champ for _, champ in COLONNES_EXPORT_VENTES))
+        .iterator(chunk_size=2000)
+    )
+
+    def valeurs(ligne):
+        ligne = dict(zip(noms, ligne))
+        ligne["date"] = ligne["date"].isoformat()
+        ligne["sous_total"] = str(ligne["quantite"] * ligne["prix_unitaire"])
+        ligne["prix_unitaire"] = str(ligne["prix_unitaire"])
+        return ligne
+
+    if format_export == "csv":
+        ecrivain = csv.writer(Tampon())
+        entete = noms + ["sous_total"]
+
+        def contenu():
+            yield ecrivain.writerow(entete)
+            for ligne in lignes:
+                ligne = valeurs(ligne)
+                yield ecrivain.writerow([ligne[nom] for nom in entete])
+
+        type_contenu = "text/csv; charset=utf-8"
+    else:
+        def contenu():
+            for ligne in lignes:
+                yield json.dumps(valeurs(ligne), ensure_ascii=False) + "\n"
+
+        type_contenu = "application/x-ndjson; charset=utf-8"
+
+    response = StreamingHttpResponse(contenu(), content_type=type_contenu)
+    nom_fichier = f"ventes-{artiste.pk}-{timezone.localdate():%Y%m%d}.{format_export}"
+    response["Content-Disposition"] = f'attachment; filename="{nom_fichier}"'
+    return response
+
+
 # ======================
 # ADMIN : Dashboard
 # ======================
+# Œuvres et artistes : la modération faite depuis le tableau de bord s'y voit
+# tout de suite. Commandes et inscriptions, qui changent à chaque passage en
+# caisse ou connexion, suivent DASHBOARD_CACHE_TTL.
+ESPACES_DASHBOARD = ("catalogue", "artistes")
+
+
 @login_required
 def admin_dashboard(request):
     if not (request.user.is_staff or request.user.is_superuser):
         messages.error(request, "Accès refusé : réservé aux administrateurs.")
         return redirect("galerie:home")
 
-    # Statistiques générales
-    total_oeuvres = Oeuvre.objects.count()
-    total_artistes = Artiste.objects.count()
-    total_utilisateurs = Utilisateur.objects.count()
-    total_commandes = Commande.objects.count()
-    
-    # Revenu total
-    total_revenue = sum(cmd.montant_total for cmd in Commande.objects.all()) if Commande.objects.exists() else 0
-    
-    # Oeuvres en attente
-    oeuvres_attente = (
-        Oeuvre.objects.filter(statut=Oeuvre.Statut.EN_ATTENTE)
-        .select_related("artiste")
-        .order_by("-date_soumission")
+    # La clé change à chaque écriture d'une œuvre ou d'un artiste
+    context = memoiser(
+        cle_versionnee("admin_dashboard", ESPACES_DASHBOARD),
+        getattr(settings, "DASHBOARD_CACHE_TTL", 300),
+        statistiques_admin,
+        nom="admin_dashboard",
+    ).copy()
+    # Dernières commandes : toujours à jour, une requête sur l'index de date
+    context["dernieres_commandes"] = Commande.objects.select_related("utilisateur").order_by("-date_commande")[:5]
+    return render(request, "galerie/dashboard/admin_dashboard.html", context)
+
+
+def statistiques_admin():
+    """
+    Compteurs du tableau de bord en quelques requêtes (agrégation conditionnelle).
+    Valeurs simples uniquement : le résultat est mis en cache.
+    """
+    commandes = Commande.objects.order_by().aggregate(
+        total_commandes=Count("pk"),
+        total_revenue=Coalesce(Sum("montant_total"), Decimal("0.00")),
+        commandes_en_cours=Count("pk", filter=Q(statut=Commande.Statut.EN_COURS)),
+        commandes_payees=Count("pk", filter=Q(statut=Commande.Statut.PAYEE)),
+        commandes_validees=Count("pk", filter=Q(statut=Commande.Statut.VALIDEE)),
     )
-    oeuvres_attente_count = oeuvres_attente.count()
-    
-    # Top 5 artistes par nombre d'oeuvres
-    top_artistes = (
-        Artiste.objects.annotate(nb_oeuvres=models.Count('oeuvres'))
-        .order_by('-nb_oeuvres')[:5]
+    oeuvres = Oeuvre.objects.order_by().aggregate(
+        total_oeuvres=Count("pk"),
+        oeuvres_attente_count=Count("pk", filter=Q(statut=Oeuvre.Statut.EN_ATTENTE)),
     )
-    
+    utilisateurs = Utilisateur.objects.order_by().aggregate(
+        total_utilisateurs=Count("pk"),
+        new_users_count=Count("pk", filter=Q(date_joined__gte=timezone.now() - timedelta(days=30))),
+    )
+
+    # Top 5 artistes par nombre d'oeuvres
+    top_artistes = list(Artiste.objects.order_by("-nb_oeuvres").values("pk", "nom", "nb_oeuvres")[:5])
     # Top 5 oeuvres les plus vendues
-    top_oeuvres = (
-        Oeuvre.objects.annotate(nb_ventes=Count('lignes_commande'))
-        .order_by('-nb_ventes')[:5]
+    top_oeuvres = list(
+        Oeuvre.objects.annotate(nb_ventes=Count("lignes_commande"))
+        .order_by("-nb_ventes")
+        .values("pk", "titre", "nb_ventes")[:5]
     )
-    
-    # Statut des commandes
-    commandes_en_cours = Commande.objects.filter(statut=Commande.Statut.EN_COURS).count()
-    commandes_payees = Commande.objects.filter(statut=Commande.Statut.PAYEE).count()
-    commandes_validees = Commande.objects.filter(statut=Commande.Statut.VALIDEE).count()
-    
-    # Dernières commandes
-    dernieres_commandes = Commande.objects.order_by('-date_commande')[:5]
-    
-    # Statistiques utilisateurs
-    new_users_count = Utilisateur.objects.filter(
-        date_joined__gte=timezone.now() - timedelta(days=30)
-    ).count()
-    
-    context = {
-        "oeuvres_attente": oeuvres_attente,
-        "total_oeuvres": total_oeuvres,
-        "total_artistes": total_artistes,
-        "total_utilisateurs": total_utilisateurs,
-        "total_commandes": total_commandes,
-        "total_revenue": total_revenue,
-        "oeuvres_attente_count": oeuvres_attente_count,
+
+    return {
+        **commandes,
+        **oeuvres,
+        **utilisateurs,
+        # Séries temporelles : agrégats journaliers (commande rollup_ventes)
+        "ventes_30_jours": rollups.serie_journaliere(30),
+        "agregats_a_jour_le": rollups.filigrane(),
+        "total_artistes": Artiste.objects.count(),
         "top_artistes": top_artistes,
         "top_oeuvres": top_oeuvres,
-        "commandes_en_cours": commandes_en_cours,
-        "commandes_payees": commandes_payees,
-        "commandes_validees": commandes_validees,
-        "dernieres_commandes": dernieres_commandes,
-        "new_users_count": new_users_count,
     }
-    return render(request, "galerie/dashboard/admin_dashboard.html", context)
 
 
 def admin_validation_list(request):
@@ -297,14 +423,32 @@ def admin_validation_list(request):
         messages.error(request, "Accès refusé : réservé aux administrateurs.")
         return redirect("galerie:home")
 
-    oeuvres_attente = (
+    oeuvres_attente = list(
         Oeuvre.objects.filter(statut=Oeuvre.Statut.EN_ATTENTE)
-        .select_related("artiste")
+        .select_related("artiste__user", "categorie")
         .order_by("-date_soumission")
     )
+    signaler_doublons(oeuvres_attente)
     return render(request, "galerie/orders/admin_validation_list.html", {"oeuvres_attente": oeuvres_attente})
 
 
+def signaler_doublons(oeuvres):
+    """
+    Ajoute `oeuvre.doublons` = [(autre_oeuvre, distance), ...] pour chaque œuvre
+    dont l'image ressemble à une œuvre déjà soumise (empreinte perceptuelle).
+    """
+    voisins = {
+        oeuvre.pk: empreintes.voisins(oeuvre.phash, exclure=oeuvre.pk) if oeuvre.phash is not None else []
+        for oeuvre in oeuvres
+    }
+    pks = {pk for liste in voisins.values() for pk, _ in liste}
+    autres = Oeuvre.objects.select_related("artiste").in_bulk(pks) if pks else {}
+    for oeuvre in oeuvres:
+        oeuvre.doublons = [
+            (autres[pk], distance) for pk, distance in voisins[oeuvre.pk] if pk in autres
+        ]
+
+
 # ======================
 # Oeuvres (visiteur) - CBV
 # ======================
@@ -354,8 +498,10 @@ def oeuvres_list(request):
     prix_min = request.GET.get("prix_min", "").strip()
     prix_max = request.GET.get("prix_max", "").strip()
     tri = request.GET.get("tri", "recent").strip()
+    couleur = request.GET.get("couleur", "").strip()
 
-    oeuvres = Oeuvre.objects.filter(statut=Oeuvre.Statut.VALIDE)
+    # Artiste et catégorie affichés sur chaque carte : une jointure, pas une requête par œuvre
+    oeuvres = Oeuvre.objects.filter(statut=Oeuvre.Statut.VALIDE).select_related("categorie", "artiste")
 
     if q:
         oeuvres = oeuvres.filter(
@@ -385,6 +531,12 @@ def oeuvres_list(request):
         except ValueError:
             pass
 
+    if couleur:
+        try:
+            oeuvres = oeuvres.filter(pk__in=couleurs.proches(hex_vers_lab(couleur)))
+        except ValueError:
+            couleur = ""
+
     # Tri
     if tri == "prix_croissant":
         oeuvres = oeuvres.order_by("prix")
@@ -421,13 +573,56 @@ def oeuvres_list(request):
             "prix_min": prix_min,
             "prix_max": prix_max,
             "tri": tri,
+            "couleur": couleur,
         },
     )
 
 
 def oeuvre_detail(request, pk):
-    oeuvre = get_object_or_404(Oeuvre, pk=pk)
-    return render(request, "galerie/shop/oeuvre_detail.html", {"oeuvre": oeuvre})
+    oeuvre = get_object_or_404(Oeuvre.objects.select_related("artiste__user", "categorie"), pk=pk)
+
+    # Recommandations précalculées (commande calculer_similarites) : une seule requête indexée
+    similaires = [
+        lien.similaire
+        for lien in OeuvreSimilaire.objects.filter(
+            oeuvre=oeuvre,
+            similaire__statut=Oeuvre.Statut.VALIDE,
+        ).select_related("similaire__artiste")
+    ]
+    aussi_achetees = [
+        lien.associee
+        for lien in OeuvreAchatConjoint.objects.filter(
+            oeuvre=oeuvre,
+            associee__statut=Oeuvre.Statut.VALIDE,
+        ).select_related("associee__artiste")[:NB_AUSSI_ACHETEES]
+    ]
+    return render(
+        request,
+        "galerie/shop/oeuvre_detail.html",
+        {"oeuvre": oeuvre, "similaires": similaires, "aussi_achetees": aussi_achetees},
+    )
+
+
+NB_AUSSI_ACHETEES = 6
+
+
+def aussi_achetees_panier(oeuvre_ids):
+    """Œuvres souvent achetées avec celles du panier (hors panier), meilleur lift d'abord"""
+    if not oeuvre_ids:
+        return []
+    liens = (
+        OeuvreAchatConjoint.objects.filter(
+            oeuvre_id__in=oeuvre_ids,
+            associee__statut=Oeuvre.Statut.VALIDE,
+        )
+        .exclude(associee_id__in=oeuvre_ids)
+        .select_related("associee__artiste")
+        .order_by("-lift")[:NB_AUSSI_ACHETEES * 3]
+    )
+    resultat = {}
+    for lien in liens:
+        resultat.setdefault(lien.associee_id, lien.associee)
+    return list(resultat.values())[:NB_AUSSI_ACHETEES]
 
 
 # ======================
@@ -441,36 +636,202 @@ class ExpositionListView(ListView):
     ordering = ["-date_debut"]
 
 
+def lire_date(valeur):
+    """'AAAA-MM-JJ' -> date, None si absente ou invalide"""
+    try:
+        return date.fromisoformat(valeur)
+    except (TypeError, ValueError):
+        return None
+
+
+EXPOSITIONS_PAR_PAGE = 12
+OEUVRES_APERCU = 3
+
+
 def expositions_list(request):
-    qs = Exposition.objects.all()
+    # Nombre d'œuvres et statut calculés par la requête de la page ; les trois
+    # premières œuvres de chaque carte arrivent en une requête (ROW_NUMBER)
+    qs = (
+        Exposition.objects.avec_etat()
+        .select_related("lieu")
+        .annotate(nb_oeuvres=Count("oeuvres", distinct=True))
+        .prefetch_related(Prefetch(
+            "oeuvres",
+            queryset=Oeuvre.objects.only("pk", "titre").order_by("pk")[:OEUVRES_APERCU],
+            to_attr="apercu_oeuvres",
+        ))
+        .order_by("-date_debut", "-pk")
+    )
     q = request.GET.get("q", "").strip()
     lieu = request.GET.get("lieu", "").strip()
     date_from = request.GET.get("date_from", "").strip()
     date_to = request.GET.get("date_to", "").strip()
+    etat = request.GET.get("statut", "").strip()
+    ville = request.GET.get("ville", "").strip()
 
     if q:
         qs = qs.filter(Q(nom_exposition__icontains=q) | Q(description__icontains=q))
     if lieu:
-        qs = qs.filter(lieu__icontains=lieu)
-    if date_from:
-        qs = qs.filter(date_debut__gte=date_from)
-    if date_to:
-        qs = qs.filter(date_fin__lte=date_to)
+        qs = qs.filter(Q(lieu__nom_lieu__icontains=lieu) | Q(lieu__ville__icontains=lieu))
+    if ville:
+        qs = qs.filter(lieu__ville=ville)
+    # Ce qui est à voir entre date_from et date_to : chevauchement de périodes
+    qs = qs.chevauchant(lire_date(date_from), lire_date(date_to))
+    if etat in ExpositionQuerySet.ETATS:
+        qs = qs.filtrer_etat(etat)
+
+    page_obj = Paginator(qs, EXPOSITIONS_PAR_PAGE).get_page(request.GET.get("page"))
+    parametres = request.GET.copy()
+    parametres.pop("page", None)
+
+    return render(request, "galerie/shop/expositions_list.html", {
+        "expositions": page_obj.object_list,
+        "page_obj": page_obj,
+        "parametres": parametres.urlencode(),
+        "etats": ExpositionQuerySet.ETATS,
+        "villes": Lieu.objects.order_by("ville").values_list("ville", flat=True).distinct(),
+    })
+
+
+def expositions_calendrier(request, annee, mois):
+    """JSON : expositions ouvertes au moins un jour du mois, en une requête"""
+    if not (1 <= mois <= 12 and date.min.year <= annee <= date.max.year):
+        raise Http404("Mois invalide")
+    debut = date(annee, mois, 1)
+    fin = date(annee, mois, calendar.monthrange(annee, mois)[1])
+    qs = Exposition.objects.chevauchant(debut, fin)
+    ville = request.GET.get("ville", "").strip()
+    if ville:
+        qs = qs.filter(lieu__ville=ville)
+
+    expositions = [
+        {
+            "id": expo["pk"],
+            "nom": expo["nom_exposition"],
+            "date_debut": expo["date_debut"].isoformat(),
+            "date_fin": expo["date_fin"].isoformat(),
+            "lieu": expo["lieu__nom_lieu"],
+            "ville": expo["lieu__ville"],
+            "url": reverse("galerie:exposition_detail", args=[expo["pk"]]),
+        }
+        for expo in qs.order_by("date_debut", "pk").values(
+            "pk", "nom_exposition", "date_debut", "date_fin", "lieu__nom_lieu", "lieu__ville",
+        )
+    ]
+    return JsonResponse({
+        "annee": annee,
+        "mois": mois,
+        "debut": debut.isoformat(),
+        "fin": fin.isoformat(),
+        "expositions": expositions,
+    })
+
+
+RAYON_DEFAUT_KM = 25
+RAYON_MAX_KM = 500
+LIEUX_PROCHES_MAX = 50
+
+
+def lire_position(request):
+    """(latitude, longitude, erreur) depuis ?lat=&lon="""
+    try:
+        latitude, longitude = float(request.GET["lat"]), float(request.GET["lon"])
+    except (KeyError, ValueError):
+        return None, None, "Paramètres lat et lon (degrés décimaux) requis."
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None, None, "Coordonnées hors limites."
+    return latitude, longitude, None
+
+
+def lieux_proches(request):
+    """JSON : lieux géocodés les plus proches de ?lat=&lon= (?limite=)"""
+    latitude, longitude, erreur = lire_position(request)
+    if erreur:
+        return JsonResponse({"erreur": erreur}, status=400)
+    try:
+        limite = min(max(int(request.GET.get("limite", 10)), 1), LIEUX_PROCHES_MAX)
+    except ValueError:
+        limite = 10
 
-    return render(request, "galerie/shop/expositions_list.html", {"expositions": qs})
+    distances = dict(lieux.proches(latitude, longitude, limite=limite))
+    trouves = Lieu.objects.in_bulk(distances)
+    return JsonResponse({"lieux": [
+        {
+            "id": pk,
+            "nom": trouves[pk].nom_lieu,
+            "ville": trouves[pk].ville,
+            "pays": trouves[pk].pays,
+            "distance_km": round(distance, 2),
+        }
+        for pk, distance in distances.items()
+        if pk in trouves
+    ]})
+
+
+def expositions_proches(request):
+    """JSON : expositions en cours dans un rayon de ?rayon= km (25 par défaut) autour de ?lat=&lon="""
+    latitude, longitude, erreur = lire_position(request)
+    if erreur:
+        return JsonResponse({"erreur": erreur}, status=400)
+    try:
+        rayon = min(max(float(request.GET.get("rayon", RAYON_DEFAUT_KM)), 0), RAYON_MAX_KM)
+    except ValueError:
+        rayon = RAYON_DEFAUT_KM
+
+    # L'index donne les lieux du rayon, la base les expositions en cours : une requête
+    distances = dict(lieux.proches(latitude, longitude, rayon_km=rayon, limite=None))
+    expositions = []
+    if distances:
+        qs = (
+            Exposition.objects.filtrer_etat("en_cours")
+            .filter(lieu_id__in=distances)
+            .values("pk", "nom_exposition", "date_debut", "date_fin", "lieu_id", "lieu__nom_lieu", "lieu__ville")
+        )
+        expositions = sorted(
+            (
+                {
+                    "id": expo["pk"],
+                    "nom": expo["nom_exposition"],
+                    "date_debut": expo["date_debut"].isoformat(),
+                    "date_fin": expo["date_fin"].isoformat(),
+                    "lieu": expo["lieu__nom_lieu"],
+                    "ville": expo["lieu__ville"],
+                    "distance_km": round(distances[expo["lieu_id"]], 2),
+                    "url": reverse("galerie:exposition_detail", args=[expo["pk"]]),
+                }
+                for expo in qs
+            ),
+            key=lambda expo: (expo["distance_km"], expo["date_fin"]),
+        )
+    return JsonResponse({"rayon_km": rayon, "expositions": expositions})
 
 
 def exposition_detail(request, pk):
-    """Affiche les détails d'une exposition"""
-    exposition = get_object_or_404(Exposition, pk=pk)
-    oeuvres = exposition.oeuvres.all()
-    tickets = exposition.tickets.all() if hasattr(exposition, 'tickets') else []
-    
+    """
+    Affiche les détails d'une exposition. Œuvres (avec leur artiste) et
+    tickets sont des requêtes paresseuses, une chacune : pour les visiteurs
+    anonymes, le corps de page est un fragment en cache ({% cache %}, clé
+    versionnée par l'espace "exposition:<pk>") et elles ne sont alors pas
+    exécutées.
+    """
+    exposition = get_object_or_404(Exposition.objects.select_related("lieu"), pk=pk)
+    oeuvres = (
+        exposition.oeuvres.select_related("artiste")
+        .only("pk", "titre", "image", "prix", "artiste__nom")
+        .order_by("pk")
+    )
+    tickets = exposition.tickets.order_by("prix", "pk")
+
     context = {
         "exposition": exposition,
         "oeuvres": oeuvres,
         "tickets": tickets,
+        "cache_ttl": getattr(settings, "EXPOSITION_CACHE_TTL", 600),
+        "jour": timezone.localdate().isoformat(),  # le statut change à minuit
     }
+    if not request.user.is_authenticated:
+        # Seul le fragment anonyme est en cache : pas de lecture de version sinon
+        context["version"] = versions([f"exposition:{pk}"])[f"exposition:{pk}"]
     return render(request, "galerie/shop/exposition_detail.html", context)
 
 
@@ -490,7 +851,8 @@ def oeuvre_create(request):
         if form.is_valid():
             oeuvre = form.save(commit=False)
             oeuvre.artiste = artiste
-            oeuvre.save()
+            with transaction.atomic():  # compteurs de l'artiste et de la catégorie avec l'œuvre
+                oeuvre.save()
             messages.success(request, "Œuvre soumise avec succès ! En attente de validation.")
             return redirect("galerie:artiste_dashboard")
     else:
@@ -517,7 +879,8 @@ def oeuvre_update(request, pk):
     if request.method == "POST":
         form = OeuvreForm(request.POST, request.FILES, instance=oeuvre)
         if form.is_valid():
-            form.save()
+            with transaction.atomic():
+                form.save()
             messages.success(request, "Œuvre modifiée avec succès.")
             return redirect("galerie:artiste_dashboard")
     else:
@@ -539,10 +902,13 @@ def oeuvre_valider(request, pk):
         messages.error(request, "Accès refusé.")
         return redirect("galerie:home")
 
-    oeuvre = get_object_or_404(Oeuvre, pk=pk)
-    oeuvre.valider()
-    messages.success(request, f"Œuvre '{oeuvre.titre}' validée avec succès.")
-    return redirect("galerie:admin_dashboard")
+    oeuvre = get_object_or_404(Oeuvre.objects.only("pk", "titre"), pk=pk)
+    if moderation.moderer([oeuvre.pk], "valider"):
+        messages.success(request, f"Œuvre '{oeuvre.titre}' validée avec succès.")
+    else:
+        messages.info(request, f"Œuvre '{oeuvre.titre}' déjà modérée.")
+    # Retour à la file d'attente plutôt qu'au tableau de bord (qui recalcule ses statistiques)
+    return redirect("galerie:admin_validation_list")
 
 
 @login_required
@@ -551,10 +917,92 @@ def oeuvre_refuser(request, pk):
         messages.error(request, "Accès refusé.")
         return redirect("galerie:home")
 
-    oeuvre = get_object_or_404(Oeuvre, pk=pk)
-    oeuvre.refuser()
-    messages.warning(request, f"Œuvre '{oeuvre.titre}' refusée.")
-    return redirect("galerie:admin_dashboard")
+    oeuvre = get_object_or_404(Oeuvre.objects.only("pk", "titre"), pk=pk)
+    if moderation.moderer([oeuvre.pk], "refuser"):
+        messages.warning(request, f"Œuvre '{oeuvre.titre}' refusée.")
+    else:
+        messages.info(request, f"Œuvre '{oeuvre.titre}' déjà modérée.")
+    return redirect("galerie:admin_validation_list")
+
+
+FILE_MODERATION_TAILLE = 50
+FILE_MODERATION_MAX = 200
+
+
+def file_moderation(limite):
+    """Tête de la file des œuvres en attente, sérialisée pour l'API"""
+    oeuvres = (
+        Oeuvre.objects.filter(statut=Oeuvre.Statut.EN_ATTENTE)
+        .select_related("artiste", "categorie")
+        .order_by("-date_soumission", "-pk")[:limite]
+    )
+    return [
+        {
+            "id": oeuvre.pk,
+            "titre": oeuvre.titre,
+            "artiste": oeuvre.artiste.nom,
+            "categorie": oeuvre.categorie.nom_categorie if oeuvre.categorie else None,
+            "prix": str(oeuvre.prix),
+            "stock": oeuvre.stock,
+            "date_soumission": oeuvre.date_soumission.isoformat(),
+            "image": oeuvre.image.url if oeuvre.image else None,
+            "url": reverse("galerie:oeuvre_detail", args=[oeuvre.pk]),
+        }
+        for oeuvre in oeuvres
+    ]
+
+
+@login_required
+def oeuvres_moderation(request):
+    """
+    API JSON de modération par lots.
+    GET : tête de la file d'attente (?limite=, 50 par défaut).
+    POST {"ids": [...], "decision": "valider" | "refuser"} (JSON ou formulaire) :
+    modère le lot puis renvoie la suite de la file.
+    """
+    if not (request.user.is_staff or request.user.is_superuser):
+        return JsonResponse({"erreur": "Accès refusé : réservé aux administrateurs."}, status=403)
+    if request.method not in ("GET", "POST"):
+        return JsonResponse({"erreur": "Méthode non autorisée."}, status=405)
+
+    try:
+        limite = min(max(int(request.GET.get("limite", FILE_MODERATION_TAILLE)), 1), FILE_MODERATION_MAX)
+    except ValueError:
+        limite = FILE_MODERATION_TAILLE
+
+    reponse = {}
+    if request.method == "POST":
+        if request.content_type == "application/json":
+            try:
+                donnees = json.loads(request.body)
+            except ValueError:
+                return JsonResponse({"erreur": "JSON invalide."}, status=400)
+        else:
+            donnees = {"ids": request.POST.getlist("ids"), "decision": request.POST.get("decision")}
+        decision = donnees.get("decision") if isinstance(donnees, dict) else None
+        if decision not in moderation.DECISIONS:
+            return JsonResponse({"erreur": "Décision attendue : valider ou refuser."}, status=400)
+        ids = donnees.get("ids") or []
+        # Une chaîne serait parcourue caractère par caractère : "123" -> {1, 2, 3}
+        if not isinstance(ids, (list, tuple)):
+            return JsonResponse({"erreur": "ids doit être une liste d'identifiants."}, status=400)
+        try:
+            ids = {int(pk) for pk in ids}
+        except (TypeError, ValueError):
+            return JsonResponse({"erreur": "ids doit être une liste d'identifiants."}, status=400)
+        if len(ids) > moderation.MAX_LOT:
+            return JsonResponse({"erreur": f"{moderation.MAX_LOT} œuvres au plus par lot."}, status=400)
+
+        moderees = moderation.moderer(ids, decision)
+        reponse.update({
+            "decision": decision,
+            "moderees": moderees,
+            "ignorees": sorted(ids - set(moderees)),
+        })
+
+    reponse["en_attente"] = Oeuvre.objects.filter(statut=Oeuvre.Statut.EN_ATTENTE).count()
+    reponse["file"] = file_moderation(limite)
+    return JsonResponse(reponse)
 
 
 # ======================
@@ -592,6 +1040,7 @@ def cart_detail(request):
         "shipping": shipping,
         "tax": tax,
         "total": total,
+        "aussi_achetees": aussi_achetees_panier([item.oeuvre_id for item in items]),
     }
     
     return render(request, "galerie/cart/cart_detail.html", context)
@@ -602,6 +1051,7 @@ def cart_add(request, oeuvre_id):
     oeuvre = get_object_or_404(Oeuvre, pk=oeuvre_id)
 
     if oeuvre.stock <= 0:
+        metriques.incrementer("galerie_conflits_stock_total", etape="panier")
         messages.error(request, "Stock insuffisant pour cette œuvre.")
         return redirect("galerie:oeuvre_detail", pk=oeuvre.id)
 
@@ -610,6 +1060,7 @@ def cart_add(request, oeuvre_id):
 
     if not created:
         if item.quantite + 1 > oeuvre.stock:
+            metriques.incrementer("galerie_conflits_stock_total", etape="panier")
             messages.error(request, "Quantité demandée > stock disponible.")
             return redirect("galerie:cart_detail")
         item.quantite += 1
@@ -653,12 +1104,15 @@ def checkout(request):
     items = panier.items.all()
     
     if not items.exists():
+        metriques.incrementer("galerie_checkouts_total", resultat="panier_vide")
         messages.error(request, "Votre panier est vide.")
         return redirect("galerie:cart_detail")
     
     # Vérifier les stocks
     for item in items:
         if item.quantite > item.oeuvre.stock:
+            metriques.incrementer("galerie_checkouts_total", resultat="stock_insuffisant")
+            metriques.incrementer("galerie_conflits_stock_total", etape="checkout")
             error_msg = f"Stock insuffisant pour: {item.oeuvre.titre}"
             messages.error(request, error_msg)
             return redirect("galerie:cart_detail")
@@ -689,14 +1143,48 @@ def checkout(request):
     # Vider le panier
     panier.items.all().delete()
     
+    metriques.incrementer("galerie_checkouts_total", resultat="commande_creee")
     messages.success(request, f"Commande #{commande.id} créée. Procédez au paiement.")
     return redirect("galerie:order_pay", order_id=commande.id)
 
 
+COMMANDES_PAR_PAGE = 20
+
+
 @login_required
 def orders_list(request):
-    commandes = Commande.objects.filter(utilisateur=request.user).order_by("-date_commande")
-    return render(request, "galerie/orders/orders_list.html", {"commandes": commandes})
+    # Commandes de la page + paiement (jointure), puis lignes + titres des
+    # œuvres (une requête) : nombre de requêtes fixe quel que soit l'historique
+    commandes = (
+        Commande.objects.filter(utilisateur=request.user)
+        .select_related("paiement")
+        .prefetch_related(Prefetch(
+            "lignes",
+            queryset=LigneCommande.objects.select_related("oeuvre")
+            .only("pk", "commande_id", "quantite", "prix_unitaire", "oeuvre__titre")
+            .order_by("pk"),
+        ))
+        .order_by("-pk")  # suit date_commande (auto_now_add), clé de pagination
+    )
+
+    # Pagination par clé : ?apres=<id> de la dernière commande affichée
+    try:
+        curseur = int(request.GET["apres"])
+    except (KeyError, ValueError):
+        curseur = None
+    if curseur:
+        commandes = commandes.filter(pk__lt=curseur)
+    commandes = list(commandes[:COMMANDES_PAR_PAGE + 1])
+    suivant = None
+    if len(commandes) > COMMANDES_PAR_PAGE:
+        commandes = commandes[:COMMANDES_PAR_PAGE]
+        suivant = commandes[-1].pk
+
+    return render(request, "galerie/orders/orders_list.html", {
+        "commandes": commandes,
+        "curseur": curseur,
+        "suivant": suivant,
+    })
 
 
 @login_required
@@ -714,23 +1202,27 @@ def order_pay(request, order_id):
         if form.is_valid():
             # Sauvegarder les détails du paiement
             try:
-                Paiement.objects.update_or_create(
-                    commande=commande,
-                    defaults={
-                        "methode": Paiement.Methode.CARTE_BANCAIRE,
-                        "statut": Paiement.Statut.SUCCES,
-                        "montant": commande.montant_total,
-                        "reference": f"PAIEMENT-{commande.id}-{request.user.id}",
-                    },
-                )
-                
-                # Marquer la commande comme payée
-                commande.statut = Commande.Statut.PAYEE
-                commande.save(update_fields=["statut"])
+                # Paiement, statut et compteurs de ventes (signal) dans la même transaction
+                with transaction.atomic():
+                    Paiement.objects.update_or_create(
+                        commande=commande,
+                        defaults={
+                            "methode": Paiement.Methode.CARTE_BANCAIRE,
+                            "statut": Paiement.Statut.SUCCES,
+                            "montant": commande.montant_total,
+                            "reference": f"PAIEMENT-{commande.id}-{request.user.id}",
+                        },
+                    )
+
+                    # Marquer la commande comme payée
+                    commande.statut = Commande.Statut.PAYEE
+                    commande.save(update_fields=["statut", "date_modification"])
                 
+                metriques.incrementer("galerie_paiements_total", statut=Paiement.Statut.SUCCES)
                 messages.success(request, "✅ Paiement accepté! Votre commande a été confirmée.")
                 return redirect("galerie:payment_success", order_id=commande.id)
             except Exception as e:
+                metriques.incrementer("galerie_paiements_total", statut=Paiement.Statut.ECHEC)
                 messages.error(request, f"Erreur lors de l'enregistrement du paiement: {str(e)}")
                 return redirect("galerie:orders_list")
     else:
@@ -748,13 +1240,14 @@ def order_pay(request, order_id):
 
 
 @login_required
+@transaction.atomic
 def payment_success(request, order_id):
     """Page de succès après paiement"""
     commande = get_object_or_404(Commande, pk=order_id, utilisateur=request.user)
     
     # Mettre à jour le statut de la commande
     commande.statut = Commande.Statut.PAYEE
-    commande.save(update_fields=["statut"])
+    commande.save(update_fields=["statut", "date_modification"])
     
     # Mettre à jour le statut du paiement
     paiement = Paiement.objects.filter(commande=commande).first()
@@ -780,7 +1273,7 @@ def order_cancel(request, order_id):
         return redirect("galerie:orders_list")
 
     commande.statut = Commande.Statut.ANNULEE
-    commande.save(update_fields=["statut"])
+    commande.save(update_fields=["statut", "date_modification"])
 
     messages.success(request, "Commande annulée (en attente de règlement par admin).")
     return redirect("galerie:orders_list")
@@ -896,3 +1389,83 @@ def notification_send(request):
         "expositions": expositions,
     }
     return render(request, "galerie/notifications/notification_send.html", context)
+
+
+# ======================
+# ADMIN : Profilage des requêtes
+# ======================
+@login_required
+def profilage_list(request):
+    """Requêtes profilées les plus lentes (tampon circulaire de ProfilageMiddleware)"""
+    if not (request.user.is_staff or request.user.is_superuser):
+        messages.error(request, "Accès refusé : réservé aux administrateurs.")
+        return redirect("galerie:home")
+
+    profils = profilage.profils_lents(limite=100)
+    for profil in profils:
+        profil["date"] = datetime.fromtimestamp(profil["date"], tz=dt_timezone.utc)
+    return render(request, "galerie/dashboard/profilage_list.html", {"profils": profils})
+
+
+@login_required
+def profilage_piles(request, identifiant):
+    """Piles repliées d'un profil (format flamegraph.pl / speedscope)"""
+    if not (request.user.is_staff or request.user.is_superuser):
+        messages.error(request, "Accès refusé : réservé aux administrateurs.")
+        return redirect("galerie:home")
+
+    chemin = profilage.chemin_piles(identifiant)
+    if chemin is None:
+        raise Http404("Profil introuvable (supprimé du tampon ?)")
+    return FileResponse(
+        open(chemin, "rb"),
+        content_type="text/plain; charset=utf-8",
+        as_attachment="telecharger" in request.GET,
+        filename=chemin.name,
+    )
+
+
+# ======================
+# ADMIN : Statistiques SQL
+# ======================
+@login_required
+def sql_stats(request):
+    """Empreintes SQL les plus coûteuses et requêtes SQL par vue (tous workers confondus)"""
+    if not (request.user.is_staff or request.user.is_superuser):
+        messages.error(request, "Accès refusé : réservé aux administrateurs.")
+        return redirect("galerie:home")
+
+    tri = request.GET.get("tri", "total")
+    if tri not in instrumentation.TRIS:
+        tri = "total"
+    vue = request.GET.get("vue", "").strip() or None
+
+    instrumentation.stats.ecrire()  # inclut les requêtes récentes de ce worker
+    vues, empreintes = instrumentation.top(limite=50, tri=tri, vue=vue)
+    return render(request, "galerie/dashboard/sql_stats.html", {
+        "vues": vues,
+        "empreintes": empreintes,
+        "tri": tri,
+        "vue": vue or "",
+        "tris": list(instrumentation.TRIS),
+        "seuil_n_plus_un": instrumentation.SEUIL_N_PLUS_UN,
+    })
+
+
+# ======================
+# Métriques Prometheus
+# ======================
+def metrics(request):
+    """
+    Format d'exposition Prometheus, agrégé sur tous les workers. Réservé au
+    jeton METRIQUES_JETON, aux comptes staff et aux METRIQUES_IPS (vide par défaut)
+    """
+    jeton = getattr(settings, "METRIQUES_JETON", "")
+    autorise = (
+        request.META.get("REMOTE_ADDR") in getattr(settings, "METRIQUES_IPS", [])
+        or (jeton and request.headers.get("Authorization") == f"Bearer {jeton}")
+        or (request.user.is_authenticated and request.user.is_staff)
+    )
+    if not autorise:
+        return HttpResponseForbidden("Accès aux métriques refusé.")
+    return HttpResponse(metriques.exposer(), content_type="text/plain; version=0.0.4; charset=utf-8")